@@ -0,0 +1,86 @@
+"""Micro-benchmark for parsing metadata and content blobs.
+
+Compares the previous parsing path (decode, split into lines, join, stdlib
+json) with :func:`rmapy.codec.loads` on the raw response bytes, for every
+available codec.
+
+Usage::
+
+    python benchmarks/bench_codec.py [--number 20000]
+"""
+import argparse
+import json
+import sys
+import timeit
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rmapy import codec  # noqa: E402
+
+
+def metadata_blob() -> bytes:
+    return json.dumps({
+        "createdTime": "1717880415503",
+        "lastModified": "1717880444891",
+        "lastOpened": "1712886248140",
+        "lastOpenedPage": 25,
+        "parent": str(uuid.uuid4()),
+        "pinned": False,
+        "type": "DocumentType",
+        "visibleName": "Production Twitter on One Machine? 100Gbps NICs and NVMe are fast",
+    }, indent=4).encode()
+
+
+def content_blob(pages: int = 40) -> bytes:
+    return json.dumps({
+        "coverPageNumber": 0,
+        "documentMetadata": {"authors": ["Someone"], "title": "A title"},
+        "extraMetadata": {"LastPen": "Ballpoint", "LastTool": "Ballpoint"},
+        "fileType": "pdf",
+        "fontName": "",
+        "lineHeight": -1,
+        "margins": 125,
+        "orientation": "portrait",
+        "pageCount": pages,
+        "cPages": {"pages": [
+            {"id": str(uuid.uuid4()), "idx": {"timestamp": "1:2", "value": f"b{i}"},
+             "template": {"timestamp": "1:1", "value": "Blank"}}
+            for i in range(pages)]},
+        "sizeInBytes": "1571729",
+        "tags": [],
+        "textAlignment": "left",
+        "textScale": 1,
+    }, indent=4).encode()
+
+
+def legacy(content: bytes):
+    return json.loads(''.join(content.decode('iso-8859-1').splitlines()))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    codecs = ["json"]
+    try:
+        codec.use("orjson")
+        codecs.append("orjson")
+    except ImportError:
+        pass
+    for label, blob in (("metadata", metadata_blob()), ("content", content_blob())):
+        baseline = min(timeit.repeat(lambda: legacy(blob), number=args.number, repeat=3))
+        print(f"{label} ({len(blob)} bytes)")
+        print(f"  {'splitlines+join json':>22}: {baseline / args.number * 1e6:7.2f} us")
+        for name in codecs:
+            codec.use(name)
+            elapsed = min(timeit.repeat(lambda: codec.loads(blob), number=args.number, repeat=3))
+            print(f"  {name:>22}: {elapsed / args.number * 1e6:7.2f} us "
+                  f"({baseline / elapsed:4.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
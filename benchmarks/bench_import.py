@@ -0,0 +1,102 @@
+"""Import and construction time benchmark.
+
+Runs every measurement in a fresh interpreter and fails (exit status 1) when
+a heavy dependency is imported eagerly again, or when importing rmapy and
+constructing a Client costs more than ``--max-ms``. The time is taken inside
+the interpreter, so that its start-up, which varies far more than the
+imports, isn't part of it, and the median of ``--repeat`` runs is compared
+with the budget.
+
+Usage::
+
+    python benchmarks/bench_import.py [--repeat 15] [--max-ms 60]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that must only be imported once they are actually used.
+DEFERRED = ("requests", "urllib3", "dataclasses_json", "marshmallow", "yaml", "orjson",
+            "gzip", "hashlib", "email.utils",
+            "concurrent.futures")
+
+SNIPPETS = {
+    "import rmapy.types": "import rmapy.types",
+    "import rmapy.api": "import rmapy.api",
+    "Client()": "import rmapy.api; rmapy.api.Client(); rmapy.api.Client()",
+}
+
+CHECK_MODULES = """
+import sys, json
+import rmapy.api, rmapy.types
+rmapy.api.Client()
+print(json.dumps(sorted(m for m in sys.modules)))
+"""
+
+
+TIMED = """
+import time
+start = time.perf_counter()
+{code}
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def run(code: str, home: str) -> float:
+    """Milliseconds code takes in a fresh interpreter."""
+    env = dict(os.environ, HOME=home, PYTHONPATH=str(ROOT))
+    out = subprocess.run([sys.executable, "-c", TIMED.format(code=code)], env=env,
+                         check=True, capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, default=60.0,
+                        help="budget for the median import + Client()")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        Path(home, ".rmapi").write_text("devicetoken: abc\nusertoken: def\n")
+
+        # Interleaved, so that a slow spell of the machine doesn't land on
+        # a single measurement.
+        samples = {name: [] for name in SNIPPETS}
+        for _ in range(args.repeat):
+            for name, code in SNIPPETS.items():
+                samples[name].append(run(code, home))
+        results = {name: statistics.median(times) for name, times in samples.items()}
+
+        env = dict(os.environ, HOME=home, PYTHONPATH=str(ROOT))
+        out = subprocess.run([sys.executable, "-c", CHECK_MODULES], env=env,
+                             check=True, capture_output=True, text=True).stdout
+        loaded = json.loads(out)
+
+    eager = sorted({d for d in DEFERRED for m in loaded
+                    if m == d or m.startswith(d + ".")})
+    overhead = results["Client()"]
+
+    for name, ms in results.items():
+        print(f"{name:>20}: {ms:8.1f} ms")
+    print(f"{'overhead':>20}: {overhead:8.1f} ms (budget {args.max_ms} ms)")
+
+    failed = False
+    if eager:
+        print(f"FAIL: eagerly imported: {', '.join(eager)}")
+        failed = True
+    if overhead > args.max_ms:
+        print("FAIL: import + construction overhead over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""End-to-end traversal benchmark against the local Tectonic stand-in.
+
+For every library size a fake server is started in a separate process and a
+fresh benchmark process measures:
+
+* ``traverse``: ``Client.get_root_folder()``
+* ``reconcile``: ``RootFolder.reconcile()`` after the server changed,
+  created and deleted some documents
+* ``get_blob``: fetching every file of a sample of documents
+
+and reports wall time, requests, bytes and the peak RSS of the client.
+
+Usage::
+
+    python benchmarks/bench_traversal.py --sizes 1000,10000 --latency 0.02 --jitter 0.01
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+ROOT = HERE.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(HERE))
+
+import fake_tectonic  # noqa: E402
+
+
+def _post(url: str) -> dict:
+    with urllib.request.urlopen(urllib.request.Request(url, method="POST")) as r:
+        return json.loads(r.read())
+
+
+def _get(url: str) -> dict:
+    with urllib.request.urlopen(url) as r:
+        return json.loads(r.read())
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenarios(url: str, args: argparse.Namespace) -> dict:
+    """Run every scenario against the server at url, in this process."""
+    # Keep the benchmark away from the user's ~/.rmapi.
+    os.environ["HOME"] = tempfile.mkdtemp()
+    from rmapy.api import Client
+
+    client = Client()
+    client.token_set = {"devicetoken": "bench", "usertoken": "bench"}
+    client.tectonic_url = url
+
+    results = {}
+
+    def measure(name, fn):
+        _post(f"{url}/_reset")
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        stats = _get(f"{url}/_stats")
+        results[name] = {
+            "seconds": round(elapsed, 4),
+            "requests": stats["requests"],
+            "bytes": stats["bytes"],
+            "errors": stats["errors"],
+            "requests_per_second": round(stats["requests"] / elapsed, 1) if elapsed else None,
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        }
+        return value
+
+    root = measure("traverse", client.get_root_folder)
+
+    _post(f"{url}/_mutate?changed={args.changed}&created={args.created}&deleted={args.deleted}")
+    measure("reconcile", root.reconcile)
+
+    documents = []
+
+    def _collect(nodes):
+        for node in nodes:
+            if node.type == "CollectionType":
+                _collect(node.contents)
+            else:
+                documents.append(node)
+    _collect(root.contents)
+
+    def fetch_blobs():
+        for document in documents[:args.sample]:
+            for file_meta in document.meta_list_blob.files:
+                client.get_blob(file_meta.hash)
+    measure("get_blob", fetch_blobs)
+    return results
+
+
+def run_size(size: int, args: argparse.Namespace) -> dict:
+    """Start a server for the given size and benchmark it in a child process."""
+    server_args = [
+        "--documents", str(size), "--depth", str(args.depth), "--fanout", str(args.fanout),
+        "--pages", str(args.pages), "--page-size", str(args.page_size),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+    ]
+    server = subprocess.Popen([sys.executable, str(HERE / "fake_tectonic.py")] + server_args,
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        line = server.stdout.readline()
+        url = line.strip().rsplit(" ", 1)[-1]
+        child = subprocess.run(
+            [sys.executable, __file__, "--url", url,
+             "--changed", str(args.changed), "--created", str(args.created),
+             "--deleted", str(args.deleted), "--sample", str(args.sample)],
+            check=True, capture_output=True, text=True)
+        return json.loads(child.stdout)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    fake_tectonic.add_arguments(parser)
+    parser.add_argument("--sizes", default="1000,10000,50000",
+                        help="comma separated library sizes")
+    parser.add_argument("--changed", type=int, default=20)
+    parser.add_argument("--created", type=int, default=5)
+    parser.add_argument("--deleted", type=int, default=5)
+    parser.add_argument("--sample", type=int, default=50,
+                        help="documents whose files are fetched in get_blob")
+    parser.add_argument("--json", action="store_true", help="print JSON only")
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.url:
+        print(json.dumps(run_scenarios(args.url, args)))
+        return 0
+
+    report = {}
+    for size in (int(s) for s in args.sizes.split(",")):
+        report[size] = run_size(size, args)
+        if not args.json:
+            for name, r in report[size].items():
+                print(f"{size:>7} {name:>10}: {r['seconds']:8.3f} s "
+                      f"{r['requests']:>7} req {r['bytes'] / 1e6:9.2f} MB "
+                      f"{r['requests_per_second'] or 0:>9} req/s "
+                      f"peak {r['peak_rss_mb']:7.1f} MB", flush=True)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
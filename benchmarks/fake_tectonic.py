@@ -0,0 +1,505 @@
+"""A local stand-in for the reMarkable Tectonic sync API.
+
+Serves a synthetic, content-addressed library over the same endpoints the
+:class:`rmapy.api.Client` uses:
+
+* ``POST /token/json/2/device/new`` and ``POST /token/json/2/user/new``
+* ``GET /sync/v4/root`` and ``PUT /sync/v3/root``
+* ``GET``, ``HEAD`` and ``PUT /sync/v3/files/{hash}``
+
+Latency, jitter and error rates can be injected to model a slow or degraded
+server. A few extra endpoints drive benchmarks:
+
+* ``GET /_stats``: request and byte counters since the last reset.
+* ``POST /_reset``: reset the counters.
+* ``POST /_mutate?changed=N&created=N&deleted=N``: edit the library and
+  publish a new root hash.
+
+It can be used in-process::
+
+    library = Library(documents=1000)
+    with FakeTectonic(library, latency=0.01) as server:
+        client.tectonic_url = server.url
+
+or standalone::
+
+    python benchmarks/fake_tectonic.py --documents 10000 --latency 0.02
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+JSON_TYPE = "text/plain; charset=UTF-8"
+BINARY_TYPE = "application/octet-stream"
+
+DOCUMENT_INDEX_TYPE = "0"
+ROOT_INDEX_TYPE = "80000000"
+SCHEMA_VERSION = "3"
+
+# A blob is either its content or a (seed, size) recipe which is expanded on
+# request, so that large libraries don't have to be held in memory.
+Blob = Tuple[str, Union[bytes, Tuple[bytes, int]]]
+
+
+def _expand(recipe: Tuple[bytes, int]) -> bytes:
+    seed, size = recipe
+    block = hashlib.sha256(seed).digest()
+    return (block * (size // len(block) + 1))[:size]
+
+
+class Library(object):
+    """A synthetic library of documents and collections.
+
+    Args:
+        documents: Number of documents.
+        depth: Depth of the collection tree; 0 puts everything at the root.
+        fanout: Number of sub-collections per collection.
+        pages: Pages per document.
+        page_size: Size of each .rm page blob in bytes.
+        pdf_ratio: Fraction of documents backed by a pdf.
+        pdf_size: Size of each pdf blob in bytes.
+        seed: Seed for the random generator.
+    """
+
+    def __init__(self, documents: int = 1000, depth: int = 2, fanout: int = 5,
+                 pages: int = 3, page_size: int = 2048, pdf_ratio: float = 0.3,
+                 pdf_size: int = 65536, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.pages = pages
+        self.page_size = page_size
+        self.pdf_size = pdf_size
+        self.lock = threading.Lock()
+
+        self.blobs: Dict[str, Blob] = {}
+        # uuid -> (index hash, number of files, total size)
+        self.entries: Dict[str, Tuple[str, int, int]] = {}
+        self.metadata: Dict[str, dict] = {}
+        self.files: Dict[str, List[Tuple[str, str, int]]] = {}
+        self.collections: List[str] = []
+        self.root_hash = ""
+        self.generation = 0
+
+        parents = [""]
+        for _ in range(depth):
+            level = []
+            for parent in parents:
+                for _ in range(fanout):
+                    level.append(self._add_collection(parent))
+            parents = level
+        for _ in range(documents):
+            self._add_document(self.rng.choice([""] + self.collections),
+                               self.rng.random() < pdf_ratio)
+        self._publish()
+
+    def _put(self, content_type: str, content: Union[bytes, Tuple[bytes, int]]) -> Tuple[str, int]:
+        data = _expand(content) if isinstance(content, tuple) else content
+        h = hashlib.sha256(data).hexdigest()
+        self.blobs[h] = (content_type, content)
+        return h, len(data)
+
+    def _put_json(self, obj) -> Tuple[str, int]:
+        return self._put(JSON_TYPE, json.dumps(obj, indent=4).encode())
+
+    def _timestamp(self) -> str:
+        return str(1700000000000 + self.rng.randrange(10 ** 10))
+
+    def _index(self, _uuid: str) -> None:
+        lines = [SCHEMA_VERSION] + [f"{h}:{DOCUMENT_INDEX_TYPE}:{name}:0:{size}"
+                                    for name, h, size in self.files[_uuid]]
+        h, _ = self._put(JSON_TYPE, "\n".join(lines).encode() + b"\n")
+        total = sum(size for _, _, size in self.files[_uuid])
+        self.entries[_uuid] = (h, len(self.files[_uuid]), total)
+
+    def _write_metadata(self, _uuid: str) -> None:
+        h, size = self._put_json(self.metadata[_uuid])
+        self.files[_uuid] = [f for f in self.files[_uuid] if not f[0].endswith(".metadata")]
+        self.files[_uuid].insert(0, (f"{_uuid}.metadata", h, size))
+        self._index(_uuid)
+
+    def _add_collection(self, parent: str) -> str:
+        _uuid = str(uuid.UUID(int=self.rng.getrandbits(128)))
+        self.metadata[_uuid] = {
+            "createdTime": self._timestamp(),
+            "lastModified": self._timestamp(),
+            "parent": parent,
+            "pinned": self.rng.random() < 0.05,
+            "type": "CollectionType",
+            "visibleName": f"Collection {len(self.collections)}",
+        }
+        self.files[_uuid] = []
+        self._write_metadata(_uuid)
+        self.collections.append(_uuid)
+        return _uuid
+
+    def _page(self, _uuid: str, page_id: str, revision: int = 0) -> Tuple[str, str, int]:
+        seed = f"{_uuid}/{page_id}/{revision}".encode()
+        h, size = self._put(BINARY_TYPE, (seed, self.page_size))
+        return f"{_uuid}/{page_id}.rm", h, size
+
+    def _add_document(self, parent: str, pdf: bool) -> str:
+        _uuid = str(uuid.UUID(int=self.rng.getrandbits(128)))
+        page_ids = [str(uuid.UUID(int=self.rng.getrandbits(128))) for _ in range(self.pages)]
+        files = []
+        content = {
+            "cPages": {"pages": [{"id": p, "idx": {"timestamp": "1:2", "value": f"b{i}"}}
+                                 for i, p in enumerate(page_ids)]},
+            "fileType": "pdf" if pdf else "notebook",
+            "pageCount": self.pages,
+            "sizeInBytes": str(self.pdf_size if pdf else 0),
+            "tags": [],
+        }
+        h, size = self._put_json(content)
+        files.append((f"{_uuid}.content", h, size))
+        h, size = self._put_json({})
+        files.append((f"{_uuid}.pagedata", h, size))
+        if pdf:
+            h, size = self._put("application/pdf", (_uuid.encode(), self.pdf_size))
+            files.append((f"{_uuid}.pdf", h, size))
+        for page_id in page_ids:
+            files.append(self._page(_uuid, page_id))
+            h, size = self._put("image/png", (f"thumb/{page_id}".encode(), 1024))
+            files.append((f"{_uuid}.thumbnails/{page_id}.png", h, size))
+
+        timestamp = self._timestamp()
+        self.metadata[_uuid] = {
+            "createdTime": timestamp,
+            "lastModified": timestamp,
+            "lastOpened": timestamp,
+            "lastOpenedPage": 0,
+            "parent": parent,
+            "pinned": self.rng.random() < 0.05,
+            "type": "DocumentType",
+            "visibleName": f"Document {len(self.metadata)}",
+        }
+        self.files[_uuid] = files
+        self._write_metadata(_uuid)
+        return _uuid
+
+    def _publish(self) -> None:
+        lines = [SCHEMA_VERSION] + [f"{h}:{ROOT_INDEX_TYPE}:{_uuid}:{count}:{size}"
+                                    for _uuid, (h, count, size) in self.entries.items()]
+        self.root_hash, _ = self._put(JSON_TYPE, "\n".join(lines).encode() + b"\n")
+        self.generation += 1
+
+    def documents(self) -> List[str]:
+        return [u for u, m in self.metadata.items() if m["type"] == "DocumentType"]
+
+    def mutate(self, changed: int = 0, created: int = 0, deleted: int = 0) -> Dict[str, List[str]]:
+        """Edit the library and publish a new root.
+
+        Changed documents get a new modification time and one rewritten page.
+
+        Returns:
+            The uuids of the changed, created and deleted documents.
+        """
+
+        with self.lock:
+            documents = self.documents()
+            result = {
+                "changed": self.rng.sample(documents, min(changed, len(documents))),
+                "deleted": [],
+                "created": [],
+            }
+            for _uuid in result["changed"]:
+                self.metadata[_uuid]["lastModified"] = self._timestamp()
+                pages = [i for i, f in enumerate(self.files[_uuid]) if f[0].endswith(".rm")]
+                if pages:
+                    i = self.rng.choice(pages)
+                    page_id = self.files[_uuid][i][0].split("/")[1][:-len(".rm")]
+                    self.files[_uuid][i] = self._page(_uuid, page_id, self.generation)
+                self._write_metadata(_uuid)
+            remaining = [u for u in documents if u not in result["changed"]]
+            for _uuid in self.rng.sample(remaining, min(deleted, len(remaining))):
+                del self.entries[_uuid]
+                del self.metadata[_uuid]
+                del self.files[_uuid]
+                result["deleted"].append(_uuid)
+            for _ in range(created):
+                result["created"].append(
+                    self._add_document(self.rng.choice([""] + self.collections), False))
+            self._publish()
+            return result
+
+    def put(self, h: str, content_type: str, data: bytes) -> bool:
+        """Store an uploaded blob; False if h isn't the sha256 of data."""
+        if hashlib.sha256(data).hexdigest() != h:
+            return False
+        with self.lock:
+            self.blobs[h] = (content_type, data)
+        return True
+
+    def set_root(self, h: str, generation: int) -> Optional[int]:
+        """Publish an uploaded root index if generation is still current.
+
+        Returns:
+            The new generation, or None on a conflict.
+        """
+
+        with self.lock:
+            if generation != self.generation or h not in self.blobs:
+                return None
+            entries = {}
+            for line in self.get(h)[1].decode().splitlines()[1:]:
+                entry_hash, _, _uuid, count, size = line.split(":")
+                entries[_uuid] = (entry_hash, int(count), int(size))
+            for _uuid in set(self.entries) - set(entries):
+                self.metadata.pop(_uuid, None)
+                self.files.pop(_uuid, None)
+            self.entries = entries
+            self.root_hash = h
+            self.generation += 1
+            return self.generation
+
+    def get(self, h: str) -> Optional[Tuple[str, bytes]]:
+        blob = self.blobs.get(h)
+        if blob is None:
+            return None
+        content_type, content = blob
+        return content_type, _expand(content) if isinstance(content, tuple) else content
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid delayed-ACK stalls.
+    disable_nagle_algorithm = True
+    server: '_Server'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = JSON_TYPE,
+              headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.fake._count(self.path, len(body), status)
+
+    def _delay(self) -> bool:
+        """Sleep for the injected latency; True if an error should be sent."""
+        fake = self.server.fake
+        delay = fake.latency + fake.rng.uniform(-fake.jitter, fake.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if fake.error_rate and fake.rng.random() < fake.error_rate:
+            self._send(fake.error_status, b"injected error")
+            return True
+        return False
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        if url.path == "/_stats":
+            return self._send(200, json.dumps(fake.stats()).encode())
+        if self._delay():
+            return
+        if not self.headers.get("Authorization"):
+            return self._send(401, b"missing token")
+
+        library = fake.library
+        if url.path == "/sync/v4/root":
+            with library.lock:
+                body = {"hash": library.root_hash, "generation": library.generation,
+                        "schemaVersion": int(SCHEMA_VERSION)}
+            etag = f'"{library.generation}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", headers={"ETag": etag})
+            return self._send(200, json.dumps(body).encode(), "application/json",
+                              headers={"ETag": etag})
+        if url.path.startswith("/sync/v3/files/"):
+            blob = library.get(url.path[len("/sync/v3/files/"):])
+            if blob is None:
+                return self._send(404, b"not found")
+            content_type, content = blob
+            return self._send(200, content, content_type)
+        self._send(404, b"not found")
+
+    def do_HEAD(self):
+        url = urlparse(self.path)
+        if self._delay():
+            return
+        if not url.path.startswith("/sync/v3/files/"):
+            return self._send(404, b"")
+        found = url.path[len("/sync/v3/files/"):] in self.server.fake.library.blobs
+        self._send(200 if found else 404, b"")
+
+    def do_PUT(self):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        body = self._read_body()
+        if self._delay():
+            return
+        if not self.headers.get("Authorization"):
+            return self._send(401, b"missing token")
+
+        library = fake.library
+        if url.path.startswith("/sync/v3/files/"):
+            content_type = self.headers.get("Content-Type") or BINARY_TYPE
+            if not library.put(url.path[len("/sync/v3/files/"):], content_type, body):
+                return self._send(400, b"hash mismatch")
+            return self._send(200, b"{}")
+        if url.path == "/sync/v3/root":
+            root = json.loads(body)
+            generation = library.set_root(root["hash"], root["generation"])
+            if generation is None:
+                return self._send(412, b"generation mismatch")
+            return self._send(200, json.dumps({"hash": root["hash"],
+                                               "generation": generation}).encode(),
+                              "application/json")
+        self._send(404, b"not found")
+
+    def do_POST(self):
+        fake = self.server.fake
+        url = urlparse(self.path)
+        self._read_body()
+        if url.path == "/_reset":
+            fake.reset()
+            return self._send(200, b"{}")
+        if url.path == "/_mutate":
+            query = {k: int(v[0]) for k, v in parse_qs(url.query).items()}
+            return self._send(200, json.dumps(fake.library.mutate(**query)).encode())
+        if self._delay():
+            return
+        if url.path == "/token/json/2/device/new":
+            return self._send(200, b"fake-device-token", "text/plain")
+        if url.path == "/token/json/2/user/new":
+            return self._send(200, b"fake-user-token", "text/plain")
+        self._send(404, b"not found")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+    fake: 'FakeTectonic'
+
+
+class FakeTectonic(object):
+    """Serves a :class:`Library` over HTTP on a background thread.
+
+    Args:
+        library: The library to serve.
+        latency: Mean delay added to every API request, in seconds.
+        jitter: Maximum deviation from ``latency``, in seconds.
+        error_rate: Fraction of API requests answered with ``error_status``.
+        error_status: Status code of injected errors.
+        host: Address to listen on.
+        port: Port to listen on; 0 picks a free port.
+    """
+
+    def __init__(self, library: Library, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.library = library
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random()
+        self._lock = threading.Lock()
+        self.reset()
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.fake = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.bytes = 0
+            self.errors = 0
+            self.paths: Dict[str, int] = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "bytes": self.bytes,
+                    "errors": self.errors, "paths": dict(self.paths)}
+
+    def _count(self, path: str, size: int, status: int) -> None:
+        if path.startswith("/_"):
+            return
+        key = "/".join(urlparse(path).path.split("/")[:4])
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+            self.errors += status >= 400
+            self.paths[key] = self.paths.get(key, 0) + 1
+
+    def configure(self, client) -> None:
+        """Point an rmapy Client at this server."""
+        client.tectonic_url = self.url
+        client.device_token_url = f"{self.url}/token/json/2/device/new"
+        client.user_token_url = f"{self.url}/token/json/2/user/new"
+
+    def start(self) -> 'FakeTectonic':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'FakeTectonic':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+
+
+def server_from_args(args: argparse.Namespace, port: int = 0) -> FakeTectonic:
+    library = Library(documents=args.documents, depth=args.depth, fanout=args.fanout,
+                      pages=args.pages, page_size=args.page_size, seed=args.seed)
+    return FakeTectonic(library, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, error_status=args.error_status,
+                        port=port)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Local Tectonic stand-in server")
+    add_arguments(parser)
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    server = server_from_args(args, args.port)
+    print(f"listening on {server.url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
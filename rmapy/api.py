@@ -1,13 +1,10 @@
-import requests
-import json
-from urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
+import threading
+import time
 from logging import getLogger
-from datetime import datetime
-from typing import Union, Optional, Dict, TypedDict, List
+from typing import Union, Optional, Dict, TypedDict, List, Iterator, Tuple, TYPE_CHECKING
 from dataclasses import dataclass, field
-from uuid import uuid4
 from .config import load, dump
+from . import codec
 from .types import (
     FileMetaBlob,
     FileMetaListBlob,
@@ -17,11 +14,15 @@ from .types import (
     Collection,
     RootFolder,
     AbstractBlob,
+    DocumentOrCollection,
+    THREADS,
 )
 from .exceptions import (
     AuthError,
     DocumentNotFound,
     ApiError,
+    CacheMiss,
+    CircuitOpenError,
     UnsupportedTypeError,)
 from .const import (RFC3339Nano,
                     USER_AGENT,
@@ -31,16 +32,45 @@ from .const import (RFC3339Nano,
                     TECTONIC_URL,
                     DEVICE,)
 
+if TYPE_CHECKING:
+    import requests
+    from .cache import BlobCache
+    from .metrics import Metrics
+    from .prefetch import Prefetcher
+    from .ratelimit import RateLimiter
+    from .retry import CircuitBreakers, RetryPolicy
+    from .scheduler import RequestScheduler
+    from .snapshot import Snapshot
+    from .document import ZipDocument
+    from .live import LiveRootFolder
+    from .upload import UploadResult
+    from .watch import RootChange
+
 log = getLogger("rmapy")
 
-def requests_session_with_retry():
+def requests_session_with_retry(pool_maxsize: int = THREADS, pool_block: bool = False):
+    import requests
+    from urllib3.util.retry import Retry
+    from requests.adapters import HTTPAdapter
+
     session = requests.Session()
-    retry = Retry(total=3, backoff_factor=0.5)
-    adapter = HTTPAdapter(max_retries=retry)
+    # Retries are handled by Client.retry_policy.
+    retry = Retry(total=0, redirect=3, raise_on_status=False)
+    # Keep a pooled connection for every traversal thread.
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize,
+                          pool_block=pool_block)
     session.mount('https://', adapter)
+    session.mount('http://', adapter)
 
     return session
 
+def _response_size(response: 'requests.Response', stream: bool) -> int:
+    """The body size of a response, without consuming a streamed body."""
+    if stream:
+        return int(response.headers.get('Content-Length') or 0)
+    return len(response.content)
+
+
 class Client(object):
     """API Client for Remarkable Cloud
 
@@ -48,25 +78,135 @@ class Client(object):
     and does all the heavy lifting for you.
     """
 
-    token_set = {
-        "devicetoken": "",
-        "usertoken": ""
-    }
-
     verify = True
 
-    def __init__(self):
-        config = load()
-        if "devicetoken" in config:
-            self.token_set["devicetoken"] = config["devicetoken"]
-        if "usertoken" in config:
-            self.token_set["usertoken"] = config["usertoken"]
-        self.session = requests_session_with_retry()
+    # Endpoints, overridable per instance e.g. to point at a local server.
+    base_url = BASE_URL
+    device_token_url = DEVICE_TOKEN_URL
+    user_token_url = USER_TOKEN_URL
+    tectonic_url = TECTONIC_URL
+
+    def __init__(self, transport=None,
+                 token_set: Optional[Dict[str, str]] = None,
+                 persist: Optional[bool] = None,
+                 session: Optional['requests.Session'] = None,
+                 blob_cache: Optional['BlobCache'] = None,
+                 executor=None,
+                 retry_policy: Optional['RetryPolicy'] = None,
+                 breakers: Optional['CircuitBreakers'] = None,
+                 metrics: Optional['Metrics'] = None,
+                 rate_limiter: Optional['RateLimiter'] = None,
+                 scheduler: Optional['RequestScheduler'] = None,
+                 prefetcher: Optional['Prefetcher'] = None,
+                 snapshot: Optional['Snapshot'] = None,
+                 offline: Union[bool, str] = False):
+        """
+        Args:
+            transport: Sends the HTTP requests, see :mod:`rmapy.transport`.
+                Defaults to a :class:`SessionTransport` over ``session``.
+            token_set: The devicetoken and usertoken of this client. Read
+                from ~/.rmapi if not given.
+            persist: Write renewed tokens to ~/.rmapi. Defaults to True
+                unless token_set is given.
+            session: A requests session, possibly shared with other clients.
+            blob_cache: A cache of raw blobs, possibly shared with other
+                clients.
+            executor: Runs the metadata fetches of a traversal. Each
+                traversal uses its own thread pool if not given.
+            retry_policy: When to retry failed requests.
+            breakers: The per-endpoint circuit breakers, possibly shared
+                with other clients.
+            metrics: Counts retries, failures and dropped blobs.
+            rate_limiter: Limits the request rate and bandwidth, possibly
+                shared with other clients and processes.
+            scheduler: Hands out request slots by priority, see
+                :mod:`rmapy.scheduler`. Possibly shared with other clients.
+            prefetcher: Fetches the pages of opened documents ahead of the
+                reader, see :mod:`rmapy.prefetch`. Requires a blob cache,
+                one is created if not given.
+            snapshot: Keeps the root hash and every fetched blob on disk,
+                see :mod:`rmapy.snapshot`.
+            offline: True to answer everything from the snapshot without
+                any request, "fallback" to use the snapshot only when the
+                cloud is unreachable or failing.
+        """
+        # Only what every client needs is imported up front, see
+        # benchmarks/bench_import.py.
+        from .metrics import Metrics
+        from .retry import CircuitBreakers, RetryPolicy
+
+        self.token_set = {
+            "devicetoken": "",
+            "usertoken": ""
+        }
+        if token_set is None:
+            config = load()
+            if "devicetoken" in config:
+                self.token_set["devicetoken"] = config["devicetoken"]
+            if "usertoken" in config:
+                self.token_set["usertoken"] = config["usertoken"]
+        else:
+            self.token_set.update(token_set)
+        self.persist = token_set is None if persist is None else persist
+        self._session = session
+        self._transport = transport
+        self.blob_cache = blob_cache
+        self.executor = executor
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breakers = breakers or CircuitBreakers()
+        self.metrics = metrics or Metrics()
+        self.rate_limiter = rate_limiter
+        self.scheduler = scheduler
+        self.prefetcher = prefetcher
+        if prefetcher is not None and blob_cache is None:
+            from .cache import BlobCache
+            self.blob_cache = BlobCache()
+        if offline not in (False, True, "fallback"):
+            raise ValueError(f"Unknown offline mode: {offline}")
+        self.offline = offline
+        self._falling_back = False
+        self._fallback_lock = threading.Lock()
+        # The last root hash and its ETag, for conditional polls.
+        self._root = (None, None)
+        # The generation of the last root hash, which an upload must name
+        # to replace it.
+        self._generation = None
+        if snapshot is None and offline:
+            from .snapshot import Snapshot
+            snapshot = Snapshot()
+        self.snapshot = snapshot
+
+    @property
+    def session(self) -> 'requests.Session':
+        """The HTTP session, created on first use."""
+        if self._session is None:
+            self._session = requests_session_with_retry()
+        return self._session
+
+    @session.setter
+    def session(self, session: 'requests.Session'):
+        from .transport import SessionTransport
+
+        self._session = session
+        if isinstance(self._transport, SessionTransport):
+            self._transport.session = session
+
+    @property
+    def transport(self):
+        """The transport requests are sent through."""
+        if self._transport is None:
+            from .transport import SessionTransport
+            self._transport = SessionTransport(self.session)
+        return self._transport
+
+    @transport.setter
+    def transport(self, transport):
+        self._transport = transport
 
     def request(self, method: str, path: str,
                 data=None,
                 body=None, headers=None,
-                params=None, stream=False, retry=True) -> requests.Response:
+                params=None, stream=False, retry=True) -> 'requests.Response':
         """Creates a request against the Remarkable Cloud API
 
         This function automatically fills in the blanks of base
@@ -90,7 +230,7 @@ class Client(object):
         if not path.startswith("http"):
             if not path.startswith('/'):
                 path = '/' + path
-            url = f"{BASE_URL}{path}"
+            url = f"{self.base_url}{path}"
         else:
             url = path
 
@@ -103,17 +243,17 @@ class Client(object):
             _headers["Authorization"] = f"Bearer {token}"
         for k in headers.keys():
             _headers[k] = headers[k]
-        log.debug(url, _headers)
-        r = self.session.request(method, url,
-                            json=body,
-                            data=data,
-                            headers=_headers,
-                            params=params,
-                            stream=stream,
-                            verify=self.verify)
+        log.debug(f"{method} {url}")
+        r = self._send(method, url,
+                       json=body,
+                       data=data,
+                       headers=_headers,
+                       params=params,
+                       stream=stream,
+                       verify=self.verify)
         if r.status_code == 401:
             if retry:
-                log.warn(f"Unauthorized, renewing token: {r.text}")
+                log.warning(f"Unauthorized, renewing token: {r.text}")
                 self.renew_token()
                 return self.request(method, path, data, body, headers, params, stream, retry=False)
             else:
@@ -121,6 +261,86 @@ class Client(object):
 
         return r
 
+    def _throttle(self, data) -> None:
+        size = len(data) if isinstance(data, (bytes, bytearray, str)) else 0
+        waited = self.rate_limiter.before_request(size)
+        if waited:
+            self.metrics.incr("ratelimit_wait_seconds", waited)
+
+    def _scheduled(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        from .scheduler import NAMES, current_priority
+
+        level = current_priority()
+        with self.scheduler.slot(level) as waited:
+            if waited:
+                self.metrics.incr(f"scheduler_wait_seconds.{NAMES.get(level, level)}", waited)
+            r = self.transport.request(method, url, **kwargs)
+        self.scheduler.after_response(level, _response_size(r, kwargs.get('stream')))
+        return r
+
+    def _send(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        """Send a request, retrying transient failures per retry_policy.
+
+        Raises:
+            CircuitOpenError: The endpoint keeps failing.
+        """
+
+        import requests
+        from .retry import endpoint
+
+        name = endpoint(url)
+        breaker = self.breakers[name]
+        attempt = 0
+        while True:
+            probe = breaker.before_request()
+            try:
+                if self.rate_limiter:
+                    self._throttle(kwargs.get('data'))
+                try:
+                    if self.scheduler:
+                        r = self._scheduled(method, url, **kwargs)
+                    else:
+                        r = self.transport.request(method, url, **kwargs)
+                    if self.rate_limiter:
+                        self.rate_limiter.after_response(_response_size(r, kwargs.get('stream')))
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    if breaker.record_failure():
+                        self.metrics.incr(f"circuit_open.{name}")
+                    delay = None
+                    if self.retry_policy.is_retryable(method):
+                        delay = self.retry_policy.delay(attempt)
+                    if delay is None:
+                        self.metrics.incr(f"failed.{name}")
+                        raise
+                    log.warning(f"{method} {url} failed ({e}), retrying in {delay:.2f}s")
+                except Exception:
+                    breaker.record_failure()
+                    raise
+                else:
+                    if r.status_code not in self.retry_policy.status_forcelist:
+                        breaker.record_success()
+                        return r
+                    # 429 throttles one account, it isn't an outage of the
+                    # endpoint; breakers may be shared by many accounts.
+                    if r.status_code != 429 and breaker.record_failure():
+                        self.metrics.incr(f"circuit_open.{name}")
+                    delay = None
+                    if self.retry_policy.is_retryable(method, r.status_code):
+                        delay = self.retry_policy.delay(attempt, r.headers.get('Retry-After'))
+                    if delay is None:
+                        self.metrics.incr(f"failed.{name}")
+                        return r
+                    log.warning(f"{method} {url} returned {r.status_code}, "
+                                f"retrying in {delay:.2f}s")
+                    r.close()
+            finally:
+                if probe:
+                    # Ends a probe without an outcome, e.g. on KeyboardInterrupt.
+                    breaker.end_probe()
+            self.metrics.incr(f"retry.{name}")
+            attempt += 1
+            time.sleep(delay)
+
     def register_device(self, code: str):
         """Registers a device on the Remarkable Cloud.
 
@@ -138,6 +358,8 @@ class Client(object):
                 Cloud.
         """
 
+        from uuid import uuid4
+
         uuid = str(uuid4())
         body = {
             "code": code,
@@ -145,10 +367,10 @@ class Client(object):
             "deviceID": uuid,
 
         }
-        response = self.request("POST", DEVICE_TOKEN_URL, body=body)
+        response = self.request("POST", self.device_token_url, body=body)
         if response.ok:
             self.token_set["devicetoken"] = response.text
-            dump(self.token_set)
+            self._save_tokens()
             return True
         else:
             raise AuthError("Can't register device")
@@ -170,17 +392,21 @@ class Client(object):
         if not self.token_set["devicetoken"]:
             raise AuthError("Please register a device first")
         token = self.token_set["devicetoken"]
-        response = self.request("POST", USER_TOKEN_URL, None, headers={
+        response = self.request("POST", self.user_token_url, None, headers={
                 "Authorization": f"Bearer {token}"
             })
         if response.ok:
             self.token_set["usertoken"] = response.text
-            dump(self.token_set)
+            self._save_tokens()
             return True
         else:
             raise AuthError("Can't renew token: {e}".format(
                 e=response.status_code))
 
+    def _save_tokens(self):
+        if self.persist:
+            dump(self.token_set)
+
     def is_auth(self) -> bool:
         """Is the client authenticated
 
@@ -193,34 +419,213 @@ class Client(object):
         else:
             return False
     
-    def get_root_folder(self) -> RootFolder:
+    def get_root_folder(self, lazy: bool = False, profile: bool = False) -> RootFolder:
         """Returns the root folder with caching.
-        
+
+        Args:
+            lazy: Don't traverse the tree yet. The caller is expected to
+                exhaust :meth:`RootFolder.iter_contents`, which fills in
+                ``contents`` once done.
+            profile: Time the phases of the traversal into the ``profile``
+                of the root folder and log a summary, see
+                :mod:`rmapy.profiler`.
+
         Returns:
             Folder
         """
 
-        hash = self.get_root_hash()
-        root_meta = self.get_blob(hash)
+        from .profiler import TraversalProfile, phase
+
+        traversal_profile = TraversalProfile() if profile else None
+        with phase(traversal_profile, "root_hash"):
+            hash = self.get_root_hash()
+        with phase(traversal_profile, "root_index"):
+            root_meta = self.get_blob(hash)
         return RootFolder(
             client = self,
             hash = hash,
-            list_blob = root_meta
+            list_blob = root_meta,
+            lazy = lazy,
+            profile = traversal_profile
         )
 
+    def iter_root(self) -> Iterator[DocumentOrCollection]:
+        """Yields every Document and Collection as soon as it is fetched.
+
+        Items are yielded in completion order, not in tree order, and only a
+        bounded number of fetches is in flight at any time. Use
+        ``get_root_folder(lazy=True)`` and iterate its ``iter_contents()``
+        to keep the assembled tree afterwards.
+
+        Returns:
+            An iterator of Document and Collection
+        """
+
+        yield from self.get_root_folder(lazy=True).iter_contents()
+
+    def live_root_folder(self, interval: float = 30.0, max_age: Optional[float] = None,
+                         on_change=None, start: bool = True) -> 'LiveRootFolder':
+        """Returns a root folder kept up to date in the background.
+
+        Args:
+            interval: Seconds between polls of the root hash.
+            max_age: Never serve a tree older than this many seconds.
+            on_change: Called with the new tree and the created and
+                removed items on every change.
+            start: Start polling right away. The first poll traverses the
+                tree.
+
+        Returns:
+            A :class:`rmapy.live.LiveRootFolder`.
+        """
+
+        from .live import LiveRootFolder
+        live = LiveRootFolder(self, interval=interval, max_age=max_age, on_change=on_change)
+        return live.start() if start else live
+
+    def watch(self, root: Optional[RootFolder] = None, min_interval: float = 2.0,
+              max_interval: float = 60.0, stop=None) -> Iterator['RootChange']:
+        """Yields the changes to the library as they happen.
+
+        Polls the root hash, every min_interval seconds after a change and
+        backing off to max_interval while idle, until stop is set.
+
+        Args:
+            root: A traversed tree to reconcile before each change is
+                yielded.
+            stop: A threading.Event ending the watch.
+
+        Returns:
+            An iterator of :class:`rmapy.watch.RootChange`
+        """
+
+        from .watch import Watcher
+        return Watcher(self, root, min_interval, max_interval).watch(stop)
+
+    def upload(self, doc: 'ZipDocument') -> 'UploadResult':
+        """Upload a document, creating it or replacing the version on the
+        server.
+
+        Only the blobs the server doesn't have are sent, so changing the
+        metadata of a large document uploads a few small blobs.
+
+        Args:
+            doc: The document to upload.
+
+        Returns:
+            A :class:`rmapy.upload.UploadResult`.
+
+        Raises:
+            ApiError: The client is offline or falling back to its snapshot,
+                or a blob or the root couldn't be written.
+            RootConflict: The root kept changing on the server.
+        """
+
+        from .upload import Uploader
+        return Uploader(self).upload(doc)
+
     def get_root_hash(self) -> str:
         """Returns the root hash ID.
 
+        If the server sent an ETag with the last root hash, the request is
+        conditional and an unchanged root costs no body to send or parse.
+
         Returns:
             str
+
+        Raises:
+            CacheMiss: Offline, and there is no snapshot.
         """
 
-        response = self.request("GET", f"{TECTONIC_URL}/sync/v4/root")
-        j = response.json()
-        log.debug(f"root data: {j}")
-        if not j or not j.get("hash"):
-            return None
-        return j.get("hash")
+        import requests
+
+        if self.offline is True:
+            return self._snapshot_root()
+        known_hash, etag = self._root
+        headers = {"If-None-Match": etag} if etag else None
+        try:
+            response = self.request("GET", f"{self.tectonic_url}/sync/v4/root",
+                                    headers=headers)
+            if not response.ok:
+                raise ApiError(f"Can't get root hash: {response.status_code}",
+                               response=response)
+        except (requests.ConnectionError, requests.Timeout, ApiError) as e:
+            if not self._fall_back(e):
+                raise
+            return self._snapshot_root()
+        if response.status_code == 304 and known_hash:
+            root_hash = known_hash
+        else:
+            j = codec.loads(response.content)
+            log.debug(f"root data: {j}")
+            if j:
+                # An empty account has a generation too, which its first
+                # upload must name.
+                self._generation = j.get("generation")
+            if not j or not j.get("hash"):
+                return None
+            root_hash = j["hash"]
+            self._root = (root_hash, response.headers.get("ETag"))
+        with self._fallback_lock:
+            recovered, self._falling_back = self._falling_back, False
+        if recovered:
+            log.info("Cloud reachable again")
+        return root_hash
+
+    @property
+    def snapshot_age(self) -> Optional[float]:
+        """Seconds since the snapshot was last updated, or None."""
+        return self.snapshot.age() if self.snapshot is not None else None
+
+    def _fall_back(self, e: Exception) -> bool:
+        """Whether to answer from the snapshot after a failed request.
+
+        Only an unavailable cloud falls back: a connection error, a timeout,
+        a 5xx response or an open circuit breaker. Any other error, e.g. a
+        4xx response, is the caller's to see.
+        """
+        if self.offline != "fallback" or self.snapshot is None:
+            return False
+        if isinstance(e, ApiError) and not isinstance(e, CircuitOpenError):
+            status = getattr(e.response, "status_code", None)
+            if status is None or status < 500:
+                return False
+        with self._fallback_lock:
+            first, self._falling_back = not self._falling_back, True
+        if first:
+            log.warning(f"Cloud unavailable ({e}), falling back to the snapshot")
+        else:
+            log.debug(f"Cloud unavailable ({e}), falling back to the snapshot")
+        self.metrics.incr("offline_fallback")
+        return True
+
+    def _snapshot_complete(self, root_hash: str) -> None:
+        """Record root_hash in the snapshot, once a traversal or reconcile
+        has stored every blob of its tree."""
+        if self.snapshot is None or self.offline is True:
+            return
+        with self._fallback_lock:
+            if self._falling_back:
+                return
+        # Only a root the cloud confirmed, not one read from the snapshot.
+        if root_hash == self._root[0]:
+            self.snapshot.record(root_hash)
+
+    def _snapshot_root(self) -> str:
+        hash, recorded = self.snapshot.root()
+        log.info(f"Using the snapshot of {time.ctime(recorded)} "
+                 f"({time.time() - recorded:.0f}s old)")
+        return hash
+
+    def _snapshot_blob(self, _hash: str) -> Tuple[str, bytes]:
+        try:
+            contentType, content = self.snapshot.get(_hash)
+        except CacheMiss:
+            self.metrics.incr("offline_miss")
+            raise
+        if self.blob_cache is not None:
+            self.blob_cache.put(_hash, contentType, content)
+        return contentType, content
 
     def get_blob(self, _hash: str) -> AbstractBlob:
         """
@@ -234,24 +639,94 @@ class Client(object):
         """
 
         log.debug(f"Getting blob {_hash}")
-        response = self.request("GET", f"{TECTONIC_URL}/sync/v3/files/{_hash}",
-                                params={})
+        if self.blob_cache is not None:
+            cached = self.blob_cache.get(_hash)
+            if cached is not None:
+                # The cache may be shared with a client without the
+                # snapshot, which must hold every blob of a root it records.
+                if self.snapshot is not None and _hash not in self.snapshot.store:
+                    self.snapshot.put(_hash, cached[1])
+                return self._parse_blob(*cached)
+        if self.prefetcher is not None:
+            pending = self.prefetcher.pending(_hash)
+            if pending is not None and not pending.cancelled():
+                try:
+                    return pending.result()
+                except Exception as e:
+                    log.debug(f"Prefetch of {_hash} failed ({e}), fetching again")
+        return self._fetch_blob(_hash)
+
+    def _fetch_blob(self, _hash: str) -> AbstractBlob:
+        """Fetch a blob from the server into the blob cache."""
+
+        raw = self._fetch_raw_blob(_hash)
+        return self._parse_blob(*raw) if raw is not None else None
+
+    def _fetch_raw_blob(self, _hash: str) -> Optional[Tuple[str, bytes]]:
+        import requests
+
+        # Blobs never change, so a stored one is as good as a fetched one.
+        if self.offline is True or (self.snapshot is not None and _hash in self.snapshot.store):
+            return self._snapshot_blob(_hash)
+        try:
+            response = self.request("GET", f"{self.tectonic_url}/sync/v3/files/{_hash}",
+                                    params={})
+        except (requests.ConnectionError, requests.Timeout, ApiError) as e:
+            if not self._fall_back(e):
+                raise
+            return self._snapshot_blob(_hash)
         log.debug(response.url)
 
         if response.status_code//100 == 4:
+            log.warning(f"Dropping blob {_hash}: {response.status_code}")
+            self.metrics.incr(f"blob_dropped.{response.status_code}")
             return None
+        if not response.ok:
+            e = ApiError(f"Can't get blob {_hash}: {response.status_code}",
+                         response=response)
+            if not self._fall_back(e):
+                raise e
+            return self._snapshot_blob(_hash)
 
         contentType = response.headers['content-type']
-        if contentType.startswith('text/'):
-            data_lines = response.text.splitlines()
+        content = response.content
+        if self.blob_cache is not None:
+            self.blob_cache.put(_hash, contentType, content)
+        if self.snapshot is not None:
+            self.snapshot.put(_hash, content)
+        return contentType, content
+
+    def get_raw_blob(self, _hash: str) -> Optional[bytes]:
+        """Get the content of a blob by ID, as stored on the server.
 
-            if data_lines[0].strip()[0] == '{':
+        Args:
+            _hash: The hash of the blob.
+
+        Returns:
+            The content, or None if the blob doesn't exist.
+        """
+
+        if self.blob_cache is not None:
+            cached = self.blob_cache.get(_hash)
+            if cached is not None:
+                return cached[1]
+        raw = self._fetch_raw_blob(_hash)
+        return raw[1] if raw is not None else None
+
+    def _parse_blob(self, contentType: str, content: bytes) -> AbstractBlob:
+        """Parse the raw content of a blob into the matching blob type."""
+
+        if contentType.startswith('text/'):
+            if content[:64].lstrip()[:1] == b'{':
                 # JSON
                 return RawJsonBlob(
                     client = self,
-                    json = json.loads(''.join(data_lines))
+                    json = codec.loads(content)
                 )
-            elif len(data_lines) > 1 and data_lines[1].count(':') >= 4:
+
+            # Indexes are ASCII; other files served as text keep their bytes.
+            data_lines = content.decode('utf-8', errors='replace').splitlines()
+            if len(data_lines) > 1 and data_lines[1].count(':') >= 4:
                 # List of files
                 items = []
                 for line in data_lines[1:]:
@@ -271,12 +746,11 @@ class Client(object):
                 return RawFileBlob(
                     client = self,
                     contentType = contentType,
-                    content = response.content
+                    content = content
                 )
         else:
             return RawFileBlob(
                 client = self,
                 contentType = contentType,
-                content = response.content
+                content = content
             )
-    
\ No newline at end of file
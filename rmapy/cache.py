@@ -0,0 +1,65 @@
+"""Content-addressed caches for raw blobs.
+
+Blobs on the sync API are addressed by the sha256 of their content, so a
+cached blob never goes stale and can safely be shared between clients.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+CachedBlob = Tuple[str, bytes]
+
+
+class BlobCache(object):
+    """Thread-safe LRU cache of raw blobs, bounded by their total size.
+
+    Args:
+        max_bytes: Total size of the cached blobs.
+        max_item_bytes: Larger blobs are not cached. Defaults to an eighth
+            of max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024,
+                 max_item_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes if max_item_bytes is not None else max_bytes // 8
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: 'OrderedDict[str, CachedBlob]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, _hash: str) -> Optional[CachedBlob]:
+        """Returns the (content type, content) of a blob, or None."""
+        with self._lock:
+            item = self._items.get(_hash)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(_hash)
+            self.hits += 1
+            return item
+
+    def put(self, _hash: str, content_type: str, content: bytes) -> None:
+        if len(content) > self.max_item_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(_hash, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._items[_hash] = (content_type, content)
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __contains__(self, _hash: str) -> bool:
+        return _hash in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
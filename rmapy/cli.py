@@ -0,0 +1,255 @@
+"""The ``rmapy`` command line tool.
+
+Bulk operations over the whole library, built on :class:`rmapy.api.Client`::
+
+    rmapy ls /Work
+    rmapy find '*/Invoices/*'
+    rmapy get /Work/Notes -o notes
+    rmapy --jobs 50 mirror /srv/remarkable
+    rmapy export /srv/pdfs '/Books/*'
+
+Every command uses an in-memory blob cache and the snapshot in
+``~/.cache/rmapy/blobs``, so it keeps working from local data with
+``--offline`` or ``--fallback``. When done, a line of JSON with the timing
+and throughput of the run is printed to stderr.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Iterator, List, Optional, Tuple
+
+from .api import Client, requests_session_with_retry
+from .cache import BlobCache
+from .exceptions import ApiError, AuthError, CacheMiss, DocumentNotFound, FolderNotFound
+from .mirror import export_document, mirror
+from .snapshot import Snapshot
+from .store import BlobStore
+from .types import (THREADS, Collection, Document, DocumentOrCollection, RootFolder, _iter_bounded,
+                    hydrate_contents)
+
+log = getLogger("rmapy")
+
+
+class CountingTransport(object):
+    """Counts the requests and response bytes going through a transport."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs):
+        response = self.inner.request(method, url, **kwargs)
+        size = int(response.headers.get('Content-Length') or 0) if kwargs.get('stream') \
+            else len(response.content)
+        with self._lock:
+            self.requests += 1
+            self.bytes += size
+        return response
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+def walk(nodes: List[DocumentOrCollection], prefix: str = "") -> Iterator[Tuple[str, DocumentOrCollection]]:
+    """Yields the path and node of everything under nodes."""
+    for node in sorted(nodes, key=lambda n: n.visibleName or ""):
+        path = f"{prefix}/{node.visibleName}"
+        yield path, node
+        if isinstance(node, Collection):
+            yield from walk(node.contents, path)
+
+
+def resolve(root: RootFolder, path: str) -> Optional[DocumentOrCollection]:
+    """The node at path, or None for the root."""
+    path = "/" + path.strip("/")
+    if path == "/":
+        return None
+    for candidate, node in walk(root.contents):
+        if candidate == path:
+            return node
+    raise DocumentNotFound(f"No such document or folder: {path}")
+
+
+def _line(path: str, node: DocumentOrCollection, long: bool) -> str:
+    if not long:
+        return path + ("/" if isinstance(node, Collection) else "")
+    if isinstance(node, Collection):
+        return f"d {node.uuid} {'':>8} {'':>5} {node.lastModified or '':>13} {path}"
+    return (f"- {node.uuid} {node.fileType or '':>8} {node.pageCount or 0:>5} "
+            f"{node.lastModified or '':>13} {path}")
+
+
+def _print_all(lines: List[Tuple[str, DocumentOrCollection]], long: bool) -> int:
+    if long:
+        # One parallel round for the .content of everything listed.
+        hydrate_contents(node for _, node in lines)
+    for path, node in lines:
+        print(_line(path, node, long))
+    return len(lines)
+
+
+def cmd_ls(client: Client, root: RootFolder, args) -> int:
+    node = resolve(root, args.path)
+    if node is not None and not isinstance(node, Collection):
+        raise FolderNotFound(f"Not a folder: {args.path}")
+    prefix = "/" + args.path.strip("/") if node is not None else ""
+    contents = node.contents if node is not None else root.contents
+    return _print_all([(path, child) for path, child in walk(contents, prefix)
+                       if args.recursive or path.count("/") == prefix.count("/") + 1], args.long)
+
+
+def cmd_find(client: Client, root: RootFolder, args) -> int:
+    return _print_all([(path, node) for path, node in walk(root.contents)
+                       if fnmatch.fnmatchcase(path, args.pattern)], args.long)
+
+
+def cmd_get(client: Client, root: RootFolder, args) -> int:
+    node = resolve(root, args.path)
+    if not isinstance(node, Document):
+        raise DocumentNotFound(f"Not a document: {args.path}")
+    dest = args.output or "."
+    try:
+        print(export_document(node, dest, args.store))
+        return 1
+    except DocumentNotFound:
+        pass
+    # Notebooks have no original; fetch all of their files instead.
+    count = 0
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        for path in _iter_bounded(lambda f: _get_file(args.store, f, dest),
+                                  node.meta_list_blob.files, executor=executor):
+            if path:
+                print(path)
+                count += 1
+    return count
+
+
+def _get_file(store: BlobStore, file_meta, dest: str) -> Optional[str]:
+    from .mirror import ensure
+    if ensure(store, file_meta) is None:
+        log.warning(f"Not getting {file_meta.name}: blob {file_meta.hash} is missing")
+        return None
+    path = os.path.join(dest, file_meta.name)
+    store.link(file_meta.hash, path)
+    return path
+
+
+def cmd_mirror(client: Client, root: RootFolder, args) -> int:
+    stats = mirror(root, args.dest, args.store, prune=args.prune, workers=args.jobs)
+    return stats.files
+
+
+def cmd_export(client: Client, root: RootFolder, args) -> int:
+    documents = [node for path, node in walk(root.contents)
+                 if isinstance(node, Document) and fnmatch.fnmatchcase(path, args.pattern)]
+
+    def export(document: Document) -> Optional[str]:
+        try:
+            return export_document(document, args.dest, args.store)
+        except DocumentNotFound:
+            return None
+
+    count = 0
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        for path in _iter_bounded(export, documents, executor=executor):
+            if path:
+                print(path)
+                count += 1
+    return count
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="rmapy", description="reMarkable Cloud client")
+    parser.add_argument("-j", "--jobs", type=int, default=THREADS,
+                        help="concurrent requests (default: %(default)s)")
+    parser.add_argument("--store", default=None,
+                        help="blob store and snapshot directory (default: ~/.cache/rmapy/blobs)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--offline", action="store_true",
+                      help="answer everything from the snapshot, without any request")
+    mode.add_argument("--fallback", action="store_true",
+                      help="use the snapshot when the cloud is unreachable")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ls = commands.add_parser("ls", help="list a folder")
+    ls.add_argument("path", nargs="?", default="/")
+    ls.add_argument("-l", "--long", action="store_true", help="show uuids, file types, page counts and modification times")
+    ls.add_argument("-R", "--recursive", action="store_true")
+    ls.set_defaults(run=cmd_ls)
+
+    find = commands.add_parser("find", help="find documents and folders by path")
+    find.add_argument("pattern", nargs="?", default="*", help="glob on the full path")
+    find.add_argument("-l", "--long", action="store_true")
+    find.set_defaults(run=cmd_find)
+
+    get = commands.add_parser("get", help="download a document")
+    get.add_argument("path")
+    get.add_argument("-o", "--output", help="destination directory")
+    get.set_defaults(run=cmd_get)
+
+    mirror_ = commands.add_parser("mirror", help="mirror the library into a directory")
+    mirror_.add_argument("dest")
+    mirror_.add_argument("--prune", action="store_true",
+                         help="delete every file in dest that isn't in the library")
+    mirror_.set_defaults(run=cmd_mirror)
+
+    export = commands.add_parser("export", help="export the PDFs and EPUBs of documents")
+    export.add_argument("dest")
+    export.add_argument("pattern", nargs="?", default="*", help="glob on the full path")
+    export.set_defaults(run=cmd_export)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import requests
+
+    args = parser().parse_args(argv)
+    args.store = BlobStore(args.store)
+    offline = True if args.offline else "fallback" if args.fallback else False
+    executor = ThreadPoolExecutor(max_workers=args.jobs)
+    client = Client(session=requests_session_with_retry(pool_maxsize=args.jobs),
+                    blob_cache=BlobCache(),
+                    executor=executor,
+                    snapshot=Snapshot(args.store),
+                    offline=offline)
+    counter = CountingTransport(client.transport)
+    client.transport = counter
+
+    start = time.perf_counter()
+    status = 0
+    items = 0
+    try:
+        root = client.get_root_folder()
+        items = args.run(client, root, args)
+    except (DocumentNotFound, FolderNotFound, ApiError, AuthError, CacheMiss,
+            requests.RequestException) as e:
+        print(f"rmapy: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        executor.shutdown()
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "command": args.command,
+        "status": status,
+        "seconds": round(seconds, 3),
+        "items": items,
+        "requests": counter.requests,
+        "bytes": counter.bytes,
+        "requests_per_second": round(counter.requests / seconds, 1) if seconds else None,
+        "bytes_per_second": round(counter.bytes / seconds) if seconds else None,
+        "snapshot_age": round(client.snapshot_age or 0, 1),
+        "jobs": args.jobs,
+    }), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
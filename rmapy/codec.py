@@ -0,0 +1,89 @@
+"""JSON codec for metadata, content and highlight blobs.
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Another codec can be plugged in with :func:`use`.
+"""
+import json
+from typing import Any, Optional, Union
+
+
+class StdlibCodec(object):
+    """Codec backed by the standard library json module."""
+
+    name = "json"
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+
+class OrjsonCodec(object):
+    """Codec backed by orjson.
+
+    Objects orjson refuses to encode (such as non-string keys or integers
+    wider than 64 bits) are encoded with the standard library instead.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        return self.orjson.loads(data)
+
+    def dumps(self, obj: Any) -> bytes:
+        try:
+            return self.orjson.dumps(obj)
+        except TypeError:
+            return json.dumps(obj).encode("utf-8")
+
+
+# Chosen on first use, so that importing this module doesn't import orjson.
+_codec: Optional[Any] = None
+
+
+def _default() -> Any:
+    global _codec
+    if _codec is None:
+        try:
+            _codec = OrjsonCodec()
+        except ImportError:
+            _codec = StdlibCodec()
+    return _codec
+
+
+def use(codec: Union[str, Any]) -> None:
+    """Select the codec used by :func:`loads` and :func:`dumps`.
+
+    Args:
+        codec: "json", "orjson" or any object with ``loads`` and ``dumps``
+            methods.
+    """
+
+    global _codec
+    if codec == "json":
+        _codec = StdlibCodec()
+    elif codec == "orjson":
+        _codec = OrjsonCodec()
+    else:
+        _codec = codec
+
+
+def name() -> str:
+    """The name of the codec in use."""
+    codec = _default()
+    return getattr(codec, "name", type(codec).__name__)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON straight from bytes or a string."""
+    return (_codec or _default()).loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize obj to UTF-8 encoded JSON."""
+    return (_codec or _default()).dumps(obj)
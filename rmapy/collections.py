@@ -1,25 +1,162 @@
 from .document import Document
 from .folder import Folder
-from typing import NoReturn, List, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Union, TYPE_CHECKING
 from .exceptions import FolderNotFound
 
+if TYPE_CHECKING:
+    from . import types
+
 DocumentOrFolder = Union[Document, Folder]
 
 
+def from_item(item: 'types.DocumentOrCollection') -> DocumentOrFolder:
+    """Convert a Document or Collection of the tree returned by
+    :meth:`rmapy.api.Client.get_root_folder` into a Document or Folder.
+
+    Fields of ``.content`` are only filled in if it was fetched already.
+    """
+
+    from .types import Collection as TreeCollection
+
+    content = getattr(item, '_content', None)
+    fields = {
+        "id": item.uuid,
+        "hash": item.hash,
+        "parent": item.parentUuid or "",
+        "pinned": bool(item.pinned),
+        "visibleName": item.visibleName or "",
+        "lastModified": item.lastModified or "",
+        "lastOpened": getattr(item, 'lastOpened', None) or "",
+        "fileType": content.get("fileType", "") if isinstance(content, dict) else "",
+    }
+    if isinstance(item, TreeCollection):
+        return Folder(**fields)
+    return Document(**fields)
+
+
+class _Items(list):
+    """A list of items indexed by id and by parent.
+
+    append() keeps the index up to date; any other change drops it and it
+    is rebuilt on the next lookup, so the list can still be changed in
+    place.
+    """
+
+    def __init__(self, items: Iterable[DocumentOrFolder] = ()):
+        super(_Items, self).__init__(items)
+        # The first item with each id, and parent id to children in order.
+        self._by_id: Optional[Dict[str, DocumentOrFolder]] = None
+        self._children: Optional[Dict[str, List[DocumentOrFolder]]] = None
+
+    def append(self, item: DocumentOrFolder) -> None:
+        super(_Items, self).append(item)
+        if self._by_id is not None:
+            self._by_id.setdefault(item.id, item)
+            self._children.setdefault(item.parent, []).append(item)
+
+    def remove(self, item: DocumentOrFolder) -> None:
+        super(_Items, self).remove(item)
+        if self._by_id is not None:
+            self._children[item.parent].remove(item)
+            if self._by_id.get(item.id) is item:
+                del self._by_id[item.id]
+                # Only scan when another item may have the same id.
+                if len(self) > len(self._by_id):
+                    duplicate = next((i for i in self if i.id == item.id), None)
+                    if duplicate is not None:
+                        self._by_id[item.id] = duplicate
+
+    def by_id(self) -> Dict[str, DocumentOrFolder]:
+        if self._by_id is None:
+            self._build()
+        return self._by_id
+
+    def children(self) -> Dict[str, List[DocumentOrFolder]]:
+        if self._children is None:
+            self._build()
+        return self._children
+
+    def _build(self) -> None:
+        by_id: Dict[str, DocumentOrFolder] = {}
+        children: Dict[str, List[DocumentOrFolder]] = {}
+        for item in self:
+            by_id.setdefault(item.id, item)
+            children.setdefault(item.parent, []).append(item)
+        self._by_id, self._children = by_id, children
+
+
+def _drops_index(method):
+    def wrapper(self, *args, **kwargs):
+        self._by_id = self._children = None
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+for _name in ("__setitem__", "__delitem__", "__iadd__", "__imul__", "clear", "extend",
+              "insert", "pop", "reverse", "sort"):
+    setattr(_Items, _name, _drops_index(getattr(list, _name)))
+
+
 class Collection(object):
     """A collection of meta items
 
     This is basically the content of the Remarkable Cloud.
 
+    Items are indexed by id and by parent, so looking up an item, its parent
+    or the children of a folder doesn't scan the collection. Items keep the
+    order they were added in, and adding an item whose id is already present
+    keeps both.
+
     Attributes:
         items: A list containing the items.
     """
 
     def __init__(self, *items: List[DocumentOrFolder]):
-        self.items: List[DocumentOrFolder] = []
-
-        for i in items:
-            self.items.append(i)
+        self.items = items
+
+    @property
+    def items(self) -> List[DocumentOrFolder]:
+        return self._items
+
+    @items.setter
+    def items(self, items: Iterable[DocumentOrFolder]) -> None:
+        self._items = _Items(items)
+
+    @classmethod
+    def from_root(cls, root: 'types.RootFolder') -> 'Collection':
+        """A collection of every item in a tree returned by
+        :meth:`rmapy.api.Client.get_root_folder`."""
+
+        from .types import Collection as TreeCollection
+
+        collection = cls()
+        nodes = list(root.contents)
+        items = []
+        while nodes:
+            node = nodes.pop()
+            items.append(from_item(node))
+            if isinstance(node, TreeCollection):
+                nodes.extend(node.contents)
+        collection.add_all(items)
+        return collection
+
+    def add_item(self, item: Union[DocumentOrFolder, 'types.DocumentOrCollection']) -> None:
+        """Add a Document or Folder, or an item of the tree returned by
+        :meth:`rmapy.api.Client.get_root_folder`."""
+
+        if not isinstance(item, (Document, Folder)):
+            item = from_item(item)
+        self.items.append(item)
+
+    def add_all(self, items: Iterable[Union[dict, DocumentOrFolder, 'types.DocumentOrCollection']]) -> None:
+        """Add many items at once, see add() and add_item()."""
+
+        for item in items:
+            if isinstance(item, dict):
+                self.add(item)
+            else:
+                self.add_item(item)
 
     def add(self, doc_dict: dict) -> None:
         """Add an item to the collection.
@@ -56,6 +193,19 @@ class Collection(object):
 
         self.items.append(Folder(**dir_dict))
 
+    def remove(self, doc_or_folder: DocumentOrFolder) -> None:
+        """Remove an item from the collection.
+
+        Raises:
+            ValueError: The item isn't in the collection.
+        """
+
+        self.items.remove(doc_or_folder)
+
+    def get(self, _id: str) -> DocumentOrFolder:
+        """The first item with the given id, or None."""
+        return self.items.by_id().get(_id)
+
     def parent(self, doc_or_folder: DocumentOrFolder) -> Folder:
         """Returns the paren of a Document or Folder
 
@@ -66,9 +216,9 @@ class Collection(object):
             The parent folder.
         """
 
-        results = [i for i in self.items if i.id == doc_or_folder.id]
-        if len(results) > 0 and isinstance(results[0], Folder):
-            return results[0]
+        result = self.items.by_id().get(doc_or_folder.parent)
+        if isinstance(result, Folder):
+            return result
         else:
             raise FolderNotFound("Could not found the parent of the document.")
 
@@ -82,10 +232,13 @@ class Collection(object):
             a list of documents an folders.
         """
 
-        if folder:
-            return [i for i in self.items if i.parent == folder.id]
-        else:
-            return [i for i in self.items if i.parent == ""]
+        return list(self.items.children().get(folder.id if folder else "", ()))
+
+    def __contains__(self, doc_or_folder: DocumentOrFolder) -> bool:
+        return doc_or_folder in self.items.children().get(doc_or_folder.parent, ())
+
+    def __iter__(self) -> Iterator[DocumentOrFolder]:
+        return iter(self.items)
 
     def __len__(self) -> int:
         return len(self.items)
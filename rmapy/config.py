@@ -1,18 +1,61 @@
+import re
 from pathlib import Path
-from yaml import BaseLoader
-from yaml import load as yml_load
-from yaml import dump as yml_dump
-from typing import Dict
+from typing import Dict, Optional, Tuple
+
+# A line of a flat ``key: value`` file with a plain (unquoted) scalar value,
+# which is what rmapi and :func:`dump` write. The value doesn't start with a
+# yaml indicator (``-``, ``?`` and ``:`` only count before a space or the end
+# of the line), and lines with tabs are left to yaml.
+_PLAIN_LINE = re.compile(
+    r"^([A-Za-z0-9_]+):(?: +((?:[^\s'\"\[\]{}|>&*!%@`#,?:-]|[?:-]\S)[^#\t]*?)?)? *$")
+
+# Parsed config keyed by path, along with the (mtime, size) it was parsed at.
+_cache: Dict[Path, Tuple[Tuple[int, int], Dict[str, str]]] = {}
+
+
+def _stamp(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse_flat(text: str) -> Optional[Dict[str, str]]:
+    """Parse a flat ``key: value`` file without importing yaml.
+
+    Returns None if the file uses any other yaml syntax.
+    """
+    config = {}
+    for line in text.splitlines():
+        if not line.strip() or line.startswith('#'):
+            continue
+        match = _PLAIN_LINE.match(line)
+        value = match and match.group(2) or ''
+        if not match or ': ' in value or value.endswith(':'):
+            return None
+        config[match.group(1)] = value
+    return config
 
 
 def load() -> dict:
-    """Load the .rmapy config file"""
+    """Load the .rmapy config file
+
+    The parsed file is cached until it changes on disk.
+    """
 
     config_file_path = Path.joinpath(Path.home(), ".rmapi")
     config: Dict[str, str] = {}
     if Path.exists(config_file_path):
+        stamp = _stamp(config_file_path)
+        cached = _cache.get(config_file_path)
+        if cached and cached[0] == stamp:
+            return dict(cached[1])
         with open(config_file_path, 'r') as config_file:
-            config = dict(yml_load(config_file.read(), Loader=BaseLoader))
+            text = config_file.read()
+        config = _parse_flat(text)
+        if config is None:
+            from yaml import BaseLoader
+            from yaml import load as yml_load
+            config = dict(yml_load(text, Loader=BaseLoader))
+        _cache[config_file_path] = (stamp, dict(config))
 
     return config
 
@@ -25,9 +68,10 @@ def dump(config: dict) -> None:
             config file.
     """
 
+    from yaml import dump as yml_dump
+
     config_file_path = Path.joinpath(Path.home(), ".rmapi")
 
     with open(config_file_path, 'w') as config_file:
         config_file.write(yml_dump(config))
-
-
+    _cache.pop(config_file_path, None)
@@ -3,11 +3,13 @@ from io import BytesIO
 from zipfile import ZipFile, ZIP_DEFLATED
 import shutil
 from uuid import uuid4
-import json
-from typing import TypeVar, List, Tuple
+from typing import TypeVar, List, Tuple, TYPE_CHECKING
 from logging import getLogger
-from requests import Response
 from .meta import Meta
+from . import codec
+
+if TYPE_CHECKING:
+    from requests import Response
 
 log = getLogger("rmapy")
 BytesOrString = TypeVar("BytesOrString", BytesIO, str)
@@ -60,7 +62,7 @@ class Highlight(object):
 
     def __init__(self, page_id: str, highlight_data: str):
         self.page_id = page_id
-        self.highlight_data = json.loads(highlight_data)
+        self.highlight_data = codec.loads(highlight_data)
 
     def __str__(self) -> str:
         """String representation of this object"""
@@ -269,7 +271,7 @@ class ZipDocument(object):
         """
         with ZipFile(file, "w", ZIP_DEFLATED) as zf:
             zf.writestr(f"{self.ID}.content",
-                        json.dumps(self.content))
+                        codec.dumps(self.content))
             zf.writestr(f"{self.ID}.pagedata",
                         self.pagedata)
 
@@ -283,7 +285,7 @@ class ZipDocument(object):
 
             for highlight in self.highlights:
                 zf.writestr(f"{self.ID}.highlights/{highlight.page_id}.json",
-                            json.dumps(highlight.highlight_data))
+                            codec.dumps(highlight.highlight_data))
 
             for page in self.rm:
 
@@ -291,7 +293,7 @@ class ZipDocument(object):
                             page.page.read())
 
                 zf.writestr(f"{self.ID}/{page.order}-metadata.json",
-                            json.dumps(page.metadata))
+                            codec.dumps(page.metadata))
                 page.page.seek(0)
                 try:
                     zf.writestr(f"{self.ID}.thumbnails/{page.order}.jpg",
@@ -324,10 +326,10 @@ class ZipDocument(object):
             raise Exception("Unsupported file type.")
         with ZipFile(self.zipfile, 'r') as zf:
             with zf.open(f"{self.ID}.content", 'r') as content:
-                self.content = json.load(content)
+                self.content = codec.loads(content.read())
             try:
                 with zf.open(f"{self.ID}.metadata", 'r') as metadata:
-                    self.metadata = json.load(metadata)
+                    self.metadata = codec.loads(metadata.read())
             except KeyError:
                 pass
             try:
@@ -369,7 +371,7 @@ class ZipDocument(object):
                 p_meta = p.replace(".rm", "-metadata.json")
                 try:
                     with zf.open(p_meta, 'r') as md:
-                        metadata = json.load(md)
+                        metadata = codec.loads(md.read())
                 except KeyError:
                     log.debug(f"missing metadata: {p_meta}")
                     metadata = None
@@ -404,7 +406,7 @@ def from_zip(_id: str, file: str) -> ZipDocument:
     return ZipDocument(_id, file=file)
 
 
-def from_request_stream(_id: str, stream:  Response) -> ZipDocument:
+def from_request_stream(_id: str, stream: 'Response') -> ZipDocument:
     """Return a ZipDocument from a request stream containing a zipfile.
 
     This is used with the BlobGETUrl from a :class:`rmapy.document.Document`.
@@ -27,3 +27,34 @@ class ApiError(Exception):
     def __init__(self, msg, response=None):
         self.response = response
         super(ApiError, self).__init__(msg)
+
+
+class ReplayError(Exception):
+    """A request could not be served from a recorded cassette"""
+    def __init__(self, msg):
+        super(ReplayError, self).__init__(msg)
+
+
+class CircuitOpenError(ApiError):
+    """An endpoint keeps failing, requests to it fail fast for a while"""
+    def __init__(self, msg, response=None):
+        super(CircuitOpenError, self).__init__(msg, response)
+
+
+class CacheMiss(Exception):
+    """A blob or root hash isn't available locally in offline mode"""
+    def __init__(self, msg, hash=None):
+        self.hash = hash
+        super(CacheMiss, self).__init__(msg)
+
+
+class SerializationError(Exception):
+    """Serialized data is corrupt or from an incompatible version"""
+    def __init__(self, msg):
+        super(SerializationError, self).__init__(msg)
+
+
+class RootConflict(ApiError):
+    """The root kept changing on the server while it was being replaced"""
+    def __init__(self, msg, response=None):
+        super(RootConflict, self).__init__(msg, response)
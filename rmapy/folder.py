@@ -0,0 +1,27 @@
+from uuid import uuid4
+from .meta import Meta
+
+
+class Folder(Meta):
+    """ Folder represents a CollectionType of the legacy API
+
+    Attributes:
+        name: The name of the folder, set as visibleName.
+        id: ID of the folder, a new uuid if not given.
+    """
+
+    def __init__(self, name: str = None, **kwargs) -> None:
+        super(Folder, self).__init__(**kwargs)
+        self.type = "CollectionType"
+        if name:
+            self.visibleName = name
+        if not self.id:
+            self.id = str(uuid4())
+
+    def __str__(self):
+        """String representation of this object"""
+        return f"<rmapy.folder.Folder {self.id}>"
+
+    def __repr__(self):
+        """String representation of this object"""
+        return self.__str__()
@@ -0,0 +1,155 @@
+"""A root folder kept up to date in the background.
+
+:class:`LiveRootFolder` serves the current tree without blocking and polls
+the root hash on a background thread. When the hash changes, a copy of the
+tree is reconciled off to the side and swapped in, so readers always see
+either the old or the new tree in full, never one being updated::
+
+    live = client.live_root_folder(interval=30, on_change=notify)
+    ...
+    root = live.root    # never waits for a traversal once loaded
+"""
+import threading
+import time
+from logging import getLogger
+from typing import Callable, List, Optional, TYPE_CHECKING
+
+from .scheduler import BACKGROUND, priority
+from .types import DocumentOrCollection, RootFolder
+
+if TYPE_CHECKING:
+    from .api import Client
+
+log = getLogger("rmapy")
+
+# Called with the new tree and the items created and removed by an update.
+ChangeCallback = Callable[[RootFolder, List[DocumentOrCollection], List[DocumentOrCollection]], None]
+
+
+class LiveRootFolder(object):
+    """A RootFolder refreshed by polling the root hash.
+
+    Args:
+        client: The client to poll with.
+        root: The tree to start from. Fetched on first use if not given.
+        interval: Seconds between polls.
+        max_age: If set, the tree is never served older than this many
+            seconds: when the last successful poll is older, e.g. because
+            the cloud is unreachable, :attr:`root` polls before returning.
+        on_change: Called with the new tree and the created and removed
+            items every time the tree changes.
+    """
+
+    def __init__(self, client: 'Client', root: Optional[RootFolder] = None,
+                 interval: float = 30.0, max_age: Optional[float] = None,
+                 on_change: Optional[ChangeCallback] = None):
+        self.client = client
+        self.interval = interval
+        self.max_age = max_age
+        self._root = root
+        self._checked = time.monotonic() if root is not None else None
+        self._callbacks: List[ChangeCallback] = [on_change] if on_change else []
+        # Serializes updates; readers never take it.
+        self._update_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def root(self) -> RootFolder:
+        """The current tree. Waits only for the first traversal, or when the
+        tree is older than max_age."""
+        max_age = self.max_age if self.max_age is not None else float("inf")
+        if self._root is None or self.age > max_age:
+            # Whoever updated the tree while we waited may have done it.
+            self.refresh(max_age)
+        return self._root
+
+    @property
+    def age(self) -> float:
+        """Seconds since the tree was last known to be current."""
+        if self._checked is None:
+            return float("inf")
+        return time.monotonic() - self._checked
+
+    def subscribe(self, callback: ChangeCallback) -> None:
+        """Call callback on every change, see on_change."""
+        self._callbacks.append(callback)
+
+    def refresh(self, max_age: Optional[float] = None) -> bool:
+        """Poll the root hash now and swap in the updated tree if it
+        changed.
+
+        Args:
+            max_age: Don't poll if the tree was checked fewer than this
+                many seconds ago.
+
+        Returns:
+            Whether the tree changed.
+        """
+
+        with self._update_lock:
+            current = self._root
+            if current is not None and max_age is not None and self.age <= max_age:
+                return False
+            if current is None:
+                self._root = self.client.get_root_folder()
+                self._checked = time.monotonic()
+                return True
+            root_hash = self.client.get_root_hash()
+            if root_hash == current.hash:
+                self._checked = time.monotonic()
+                return False
+            start = time.perf_counter()
+            root = current.copy()
+            created, removed = root.reconcile(root_hash=root_hash)
+            self._root = root
+            self._checked = time.monotonic()
+        log.info(f"Root folder updated to {root_hash} in {time.perf_counter() - start:.2f}s: "
+                 f"{len(created)} created, {len(removed)} removed")
+        for callback in self._callbacks:
+            try:
+                callback(root, created, removed)
+            except Exception:
+                log.exception(f"Root folder change callback {callback} failed")
+        return True
+
+    def _run(self) -> None:
+        metrics = getattr(self.client, 'metrics', None)
+        with priority(BACKGROUND):
+            while not self._stopped.is_set():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep serving the last tree and try again later.
+                    log.warning(f"Root folder refresh failed: {e}")
+                    if metrics:
+                        metrics.incr("live_refresh_errors")
+                self._wake.wait(self.interval)
+                self._wake.clear()
+
+    def start(self) -> 'LiveRootFolder':
+        """Start polling on a background thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="rmapy-live-root",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def poll_now(self) -> None:
+        """Make the background thread poll without waiting for the interval."""
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'LiveRootFolder':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
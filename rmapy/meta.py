@@ -19,6 +19,10 @@ class Meta(object):
         fileType: The file extension of the object, e.g. 'pdf', 'epub', 'notebook'
     """
 
+    # The attributes set from keyword arguments and returned by to_dict().
+    FIELDS = ("id", "hash", "parent", "fileType", "pinned", "type", "visibleName",
+              "lastOpened", "lastModified")
+
     id = ""
     hash = ""
     type = ""
@@ -30,9 +34,9 @@ class Meta(object):
     fileType = ""
 
     def __init__(self, **kwargs):
-        k_keys = self.to_dict().keys()
-        for k in k_keys:
-            setattr(self, k, kwargs.get(k, getattr(self, k)))
+        for k in self.FIELDS:
+            if k in kwargs:
+                setattr(self, k, kwargs[k])
 
     def to_dict(self) -> dict:
         """Return a dict representation of this object.
@@ -43,15 +47,5 @@ class Meta(object):
             a dict of the current object.
         """
 
-        return {
-            "id": self.id,
-            "hash": self.hash,
-            "parent": self.parent,
-            "fileType": self.fileType,
-            "pinned": self.pinned,
-            "type": self.type,
-            "visibleName": self.visibleName,
-            "lastOpened": self.lastOpened,
-            "lastModified": self.lastModified
-        }
+        return {k: getattr(self, k) for k in self.FIELDS}
 
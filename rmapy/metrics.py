@@ -0,0 +1,35 @@
+"""Counters for retries, dropped items and other client events."""
+import threading
+from typing import Callable, Dict, Optional
+
+
+class Metrics(object):
+    """Thread-safe named counters.
+
+    Args:
+        callback: Called as ``callback(name, value)`` on every increment,
+            e.g. to forward the events to statsd or prometheus.
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, float], None]] = None):
+        self.callback = callback
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        if self.callback:
+            self.callback(name, value)
+
+    def get(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        """A copy of all counters."""
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
@@ -0,0 +1,166 @@
+"""Local mirrors and exports backed by a :class:`rmapy.store.BlobStore`.
+
+:func:`mirror` lays out the files of a library the way the tablet stores
+them (``<uuid>.metadata``, ``<uuid>.content``, ``<uuid>/<page>.rm``, ...).
+Every file is fetched into the store once and linked into place, so blobs
+shared by several documents, or by several mirrors, take up disk space
+once, and a file that is already in place costs nothing::
+
+    store = BlobStore()
+    stats = mirror(client.get_root_folder(), "/srv/remarkable", store)
+    store.gc(root.live_hashes())
+
+:func:`export_document` links the original PDF or EPUB of a document.
+"""
+import os
+from dataclasses import dataclass
+from logging import getLogger
+from threading import Lock
+from typing import Iterator, List, Optional, Set, Tuple
+
+from . import codec
+from .store import BlobStore
+from .types import (Collection, Document, DocumentOrCollection, FileMetaBlob, RootFolder,
+                    THREADS, _iter_bounded)
+from .exceptions import DocumentNotFound
+
+log = getLogger("rmapy")
+
+
+@dataclass
+class MirrorStats:
+    files: int = 0
+    fetched: int = 0
+    fetched_bytes: int = 0
+    linked: int = 0
+    unchanged: int = 0
+    removed: int = 0
+
+
+def _write_if_changed(path: str, content: bytes) -> None:
+    try:
+        with open(path, "rb") as f:
+            if f.read() == content:
+                return
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def ensure(store: BlobStore, file_meta: FileMetaBlob) -> Optional[int]:
+    """Fetch a file into store unless it is there already.
+
+    Returns:
+        The number of bytes fetched, 0 if the file was stored already or
+        None if it doesn't exist.
+    """
+
+    if file_meta.hash in store:
+        return 0
+    content = file_meta.client.get_raw_blob(file_meta.hash)
+    if content is None:
+        return None
+    store.put(file_meta.hash, content)
+    return len(content)
+
+
+def _walk(nodes: List[DocumentOrCollection]) -> Iterator[DocumentOrCollection]:
+    for node in nodes:
+        yield node
+        if isinstance(node, Collection):
+            yield from _walk(node.contents)
+
+
+def mirror(root: RootFolder, dest: str, store: Optional[BlobStore] = None,
+           mode: str = "auto", prune: bool = False, workers: int = THREADS) -> MirrorStats:
+    """Mirror the files of every document under root into dest.
+
+    Args:
+        root: A traversed root folder.
+        dest: The mirror directory.
+        store: Where blobs are kept and linked from. Defaults to
+            ``~/.cache/rmapy/blobs``.
+        mode: How files are linked, see :meth:`BlobStore.link`.
+        prune: Remove every file in dest that isn't part of the library,
+            including files mirror didn't write. Off by default.
+        workers: Number of concurrent fetches.
+    """
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = store or BlobStore()
+    stats = MirrorStats()
+    lock = Lock()
+    wanted: Set[str] = set()
+    files: List[Tuple[FileMetaBlob, str]] = []
+    for node in _walk(root.contents):
+        if isinstance(node, Document):
+            for file_meta in node.meta_list_blob.files:
+                files.append((file_meta, os.path.join(dest, file_meta.name)))
+        else:
+            # Collections only have metadata, which the traversal parsed
+            # already.
+            path = os.path.join(dest, f"{node.uuid}.metadata")
+            _write_if_changed(path, codec.dumps(node.meta_blob.json))
+            wanted.add(path)
+    wanted.update(path for _, path in files)
+
+    def place(item: Tuple[FileMetaBlob, str]) -> None:
+        file_meta, path = item
+        fetched = ensure(store, file_meta)
+        if fetched is None:
+            log.warning(f"Not mirroring {file_meta.name}: blob {file_meta.hash} is missing")
+            return
+        unchanged = store.in_place(file_meta.hash, path)
+        if not unchanged:
+            store.link(file_meta.hash, path, mode)
+        with lock:
+            stats.files += 1
+            stats.fetched += bool(fetched)
+            stats.fetched_bytes += fetched
+            stats.unchanged += unchanged
+            stats.linked += not unchanged
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in _iter_bounded(place, files, executor=executor):
+            pass
+
+    if prune and os.path.isdir(dest):
+        for dirpath, _, filenames in os.walk(dest, topdown=False):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if path not in wanted:
+                    os.unlink(path)
+                    stats.removed += 1
+            if dirpath != dest and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+    log.info(f"Mirrored {stats.files} files into {dest}: {stats.fetched} fetched "
+             f"({stats.fetched_bytes} bytes), {stats.linked} linked, "
+             f"{stats.unchanged} unchanged, {stats.removed} removed")
+    return stats
+
+
+def export_document(document: Document, dest: str, store: Optional[BlobStore] = None,
+                    mode: str = "auto") -> str:
+    """Export the original PDF or EPUB of a document into the dest directory.
+
+    Returns:
+        The path of the exported file, named after the document.
+
+    Raises:
+        DocumentNotFound: The document has no PDF or EPUB.
+    """
+
+    store = store or BlobStore()
+    for extension in ("pdf", "epub"):
+        file_meta = document.file(f".{extension}")
+        if file_meta is None:
+            continue
+        if ensure(store, file_meta) is None:
+            break
+        name = (document.visibleName or document.uuid).replace(os.sep, "_")
+        path = os.path.join(dest, f"{name}.{extension}")
+        store.link(file_meta.hash, path, mode)
+        return path
+    raise DocumentNotFound(f"No PDF or EPUB for {document.uuid}")
@@ -0,0 +1,189 @@
+"""Serve many reMarkable accounts from one process.
+
+A :class:`ClientPool` hands out one :class:`rmapy.api.Client` per account.
+Every client keeps its own credentials, but they share:
+
+* one HTTP session with a bounded connection pool,
+* one content-addressed :class:`rmapy.cache.BlobCache`,
+* one set of per-endpoint circuit breakers, which 429 responses to one
+  account don't open for the others,
+* one set of worker threads, which picks traversal work from the accounts in
+  round-robin order so that one huge library cannot starve the others.
+
+.. code-block:: python
+
+    pool = ClientPool(max_connections=50)
+    alice = pool.client("alice", {"devicetoken": "...", "usertoken": "..."})
+    bob = pool.client("bob", {"devicetoken": "...", "usertoken": "..."})
+    root = alice.get_root_folder()
+
+Traversals must be started from threads outside the pool; its workers only
+run the individual metadata fetches.
+"""
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from logging import getLogger
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from .api import Client, requests_session_with_retry
+from .cache import BlobCache
+from .retry import CircuitBreakers
+from .ratelimit import RateLimiter
+from .scheduler import RequestScheduler
+
+log = getLogger("rmapy")
+
+Task = Tuple[Future, Callable[..., Any], tuple, dict]
+
+
+class FairExecutor(object):
+    """A thread pool that serves per-key queues in round-robin order.
+
+    Args:
+        workers: Number of worker threads.
+    """
+
+    def __init__(self, workers: int):
+        self._queues: 'OrderedDict[Hashable, Deque[Task]]' = OrderedDict()
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._threads: List[threading.Thread] = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._work, name=f"rmapy-pool-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) on the queue of key."""
+        future: Future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot submit after shutdown")
+            self._queues.setdefault(key, deque()).append((future, fn, args, kwargs))
+            self._cond.notify()
+        return future
+
+    def view(self, key: Hashable) -> '_KeyedExecutor':
+        """An executor-like object that submits to the queue of key."""
+        return _KeyedExecutor(self, key)
+
+    def _next(self) -> Optional[Task]:
+        with self._cond:
+            while not self._queues:
+                if self._shutdown:
+                    return None
+                self._cond.wait()
+            key, queue = next(iter(self._queues.items()))
+            task = queue.popleft()
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            return task
+
+    def _work(self) -> None:
+        while True:
+            task = self._next()
+            if task is None:
+                return
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class _KeyedExecutor(object):
+    def __init__(self, executor: FairExecutor, key: Hashable):
+        self._executor = executor
+        self._key = key
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        return self._executor.submit(self._key, fn, *args, **kwargs)
+
+
+class ClientPool(object):
+    """Clients for many accounts over shared connections, cache and workers.
+
+    Args:
+        max_connections: Connections kept per host. Requests block once all
+            of them are in use.
+        workers: Threads running metadata fetches for all accounts.
+        cache_bytes: Size of the shared blob cache.
+        rate_limiter: Limits the request rate and bandwidth of all accounts
+            together.
+        scheduler: Hands out request slots of all accounts by priority.
+    """
+
+    def __init__(self, max_connections: int = 50, workers: int = 50,
+                 cache_bytes: int = 256 * 1024 * 1024,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 scheduler: Optional[RequestScheduler] = None):
+        from http.cookiejar import DefaultCookiePolicy
+
+        self.session = requests_session_with_retry(pool_maxsize=max_connections,
+                                                   pool_block=True)
+        # Accounts share the session; don't let cookies leak between them.
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        self.blob_cache = BlobCache(cache_bytes)
+        self.breakers = CircuitBreakers()
+        self.rate_limiter = rate_limiter
+        self.scheduler = scheduler
+        self.executor = FairExecutor(workers)
+        self._clients: Dict[Hashable, Client] = {}
+        self._lock = threading.Lock()
+
+    def client(self, account: Hashable, token_set: Optional[Dict[str, str]] = None) -> Client:
+        """Returns the client of an account, creating it if needed.
+
+        Args:
+            account: Any key identifying the account.
+            token_set: The devicetoken and usertoken of the account. Required
+                the first time an account is used; replaces the tokens of an
+                existing client.
+        """
+
+        with self._lock:
+            client = self._clients.get(account)
+            if client is None:
+                if token_set is None:
+                    raise KeyError(f"Unknown account: {account}")
+                client = Client(token_set=token_set,
+                                session=self.session,
+                                blob_cache=self.blob_cache,
+                                breakers=self.breakers,
+                                rate_limiter=self.rate_limiter,
+                                scheduler=self.scheduler,
+                                executor=self.executor.view(account))
+                self._clients[account] = client
+            elif token_set is not None:
+                client.token_set.update(token_set)
+            return client
+
+    def remove(self, account: Hashable) -> None:
+        with self._lock:
+            self._clients.pop(account, None)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.session.close()
+
+    def __enter__(self) -> 'ClientPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,136 @@
+"""Background prefetching of the pages of opened documents.
+
+A :class:`Prefetcher` is told when a document is opened or a page is turned,
+and fetches ``.content``, the next few pages and their thumbnails at
+:data:`rmapy.scheduler.PREFETCH` priority into the blob cache of the client.
+A later :meth:`rmapy.types.Document.get_page` is then a cache read, or waits
+for the fetch already in flight instead of starting another one::
+
+    client = Client(prefetcher=Prefetcher(pages=3))
+    document.get_page(0)    # fetches page 0, prefetches pages 1 to 3
+    document.get_page(1)    # cache hit, prefetches page 4
+"""
+import threading
+from logging import getLogger
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from .scheduler import PREFETCH, priority
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+    from .types import AbstractBlob, Document, FileMetaBlob
+
+log = getLogger("rmapy")
+
+
+class Prefetcher(object):
+    """Prefetches the pages following the one being read.
+
+    Args:
+        pages: Number of pages to fetch ahead of the current one.
+        thumbnails: Also fetch the thumbnails of those pages.
+        workers: Threads running the prefetches.
+    """
+
+    def __init__(self, pages: int = 3, thumbnails: bool = True, workers: int = 4):
+        self.pages = pages
+        self.thumbnails = thumbnails
+        self.workers = workers
+        self._pool: Optional['ThreadPoolExecutor'] = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, 'Future'] = {}
+        # Hashes queued per document, cancelled when the reader moves on.
+        self._queued: Dict[str, List[str]] = {}
+        self._positions: Dict[str, int] = {}
+
+    def _submit(self, fn, *args) -> 'Future':
+        """Run fn on the prefetch threads. Called with the lock held."""
+        if self._pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="rmapy-prefetch")
+        return self._pool.submit(fn, *args)
+
+    def _fetch(self, file_meta: 'FileMetaBlob') -> Optional['AbstractBlob']:
+        try:
+            with priority(PREFETCH):
+                return file_meta.client._fetch_blob(file_meta.hash)
+        finally:
+            with self._lock:
+                self._pending.pop(file_meta.hash, None)
+
+    def _queue(self, file_meta: Optional['FileMetaBlob']) -> Optional[str]:
+        """Fetch a file in the background unless it is cached or in flight."""
+        if file_meta is None:
+            return None
+        cache = file_meta.client.blob_cache
+        with self._lock:
+            if file_meta.hash in self._pending:
+                return None
+            if cache is not None and file_meta.hash in cache:
+                return None
+            self._pending[file_meta.hash] = self._submit(self._fetch, file_meta)
+            return file_meta.hash
+
+    def pending(self, _hash: str) -> Optional['Future']:
+        """The prefetch of a blob that is queued or in flight, if any."""
+        with self._lock:
+            return self._pending.get(_hash)
+
+    def on_access(self, document: 'Document', page: Optional[int] = None) -> None:
+        """Note that page of document is being read and prefetch ahead of it.
+
+        Args:
+            document: The document being read.
+            page: The page being read. If None, the reader stays on its
+                current page, or starts on the last opened page of the
+                document.
+        """
+        with self._lock:
+            position = self._positions.get(document.uuid)
+            if page is None:
+                if position is not None:
+                    return
+                page = _last_opened_page(document)
+            if position == page:
+                return
+            self._positions[document.uuid] = page
+            for _hash in self._queued.pop(document.uuid, []):
+                future = self._pending.get(_hash)
+                if future is not None and future.cancel():
+                    del self._pending[_hash]
+        # The plan waits for the fetch of .content, so it is queued first.
+        self._queue(document.content_file())
+        with self._lock:
+            self._submit(self._plan, document, page)
+
+    def _plan(self, document: 'Document', page: int) -> None:
+        content_file = document.content_file()
+        if content_file is None:
+            return
+        with priority(PREFETCH):
+            blob = content_file.get_blob()
+        page_ids = document.page_ids(getattr(blob, 'json', None))
+        queued = []
+        for page_id in page_ids[page:page + self.pages + 1]:
+            queued.append(self._queue(document.page_file(page_id)))
+            if self.thumbnails:
+                queued.append(self._queue(document.thumbnail_file(page_id)))
+        queued = [_hash for _hash in queued if _hash is not None]
+        with self._lock:
+            if self._positions.get(document.uuid) == page:
+                self._queued[document.uuid] = queued
+        log.debug(f"Prefetching {len(queued)} blobs of {document.uuid} from page {page}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _last_opened_page(document: 'Document') -> int:
+    try:
+        return max(int(document.lastOpenedPage or 0), 0)
+    except (TypeError, ValueError):
+        return 0
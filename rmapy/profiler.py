@@ -0,0 +1,149 @@
+"""Phase timings of a traversal.
+
+``client.get_root_folder(profile=True)`` and ``root.reconcile(profile=True)``
+attach a :class:`TraversalProfile` to the root folder and log its summary::
+
+    root = client.get_root_folder(profile=True)
+    print(root.profile.summary())
+    json.dump(root.profile.to_dict(), f)
+
+Every phase records wall clock and CPU time of the thread running it. The
+per-item fetches run on worker threads; for those the profile records how
+long each item waited in the executor queue, how long its fetches took and
+how much of that was CPU time of the worker. Time that is neither CPU nor
+queueing is spent waiting on the network, the server or the GIL.
+"""
+import heapq
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+PHASES = ("root_hash", "root_index", "diff", "items", "organize")
+
+
+def phase(profile: Optional['TraversalProfile'], name: str) -> ContextManager[None]:
+    """``profile.phase(name)``, or a no-op if profile is None."""
+    return profile.phase(name) if profile is not None else nullcontext()
+
+
+class _Stats(object):
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"count": self.count, "total": round(self.total, 6), "max": round(self.max, 6)}
+
+
+class TraversalProfile(object):
+    """Timings of one traversal.
+
+    Args:
+        slowest: Number of slowest fetches to keep.
+    """
+
+    def __init__(self, slowest: int = 10):
+        self.slowest = slowest
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self.fetches: Dict[str, _Stats] = defaultdict(_Stats)
+        self.workers: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"items": 0, "queue_wait": 0.0, "busy": 0.0, "cpu": 0.0})
+        self._slowest: List[Tuple[float, str, str, str]] = []
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self.total = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the block as the named phase of the calling thread."""
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            timing = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+            timing["wall"] += time.perf_counter() - wall
+            timing["cpu"] += time.thread_time() - cpu
+
+    def fetch(self, kind: str, _hash: str, name: str, seconds: float) -> None:
+        """Record a blob fetch made by a worker."""
+        with self._lock:
+            self.fetches[kind].add(seconds)
+            entry = (seconds, kind, _hash, name)
+            if len(self._slowest) < self.slowest:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def item(self, queue_wait: float, busy: float, cpu: float) -> None:
+        """Record an item processed by the calling worker thread."""
+        with self._lock:
+            worker = self.workers[threading.current_thread().name]
+            worker["items"] += 1
+            worker["queue_wait"] += queue_wait
+            worker["busy"] += busy
+            worker["cpu"] += cpu
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self._start
+
+    def bound(self) -> str:
+        """Whether the workers mostly waited on I/O ("network", which
+        includes the server) or ran Python code ("cpu")."""
+        busy = sum(w["busy"] for w in self.workers.values())
+        cpu = sum(w["cpu"] for w in self.workers.values())
+        return "cpu" if cpu > busy - cpu else "network"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The profile as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "total": round(self.total, 6),
+                "bound": self.bound(),
+                "phases": {name: {k: round(v, 6) for k, v in timing.items()}
+                           for name, timing in self.phases.items()},
+                "fetches": {kind: stats.to_dict() for kind, stats in self.fetches.items()},
+                "slowest": [{"seconds": round(seconds, 6), "kind": kind, "hash": _hash, "name": name}
+                            for seconds, kind, _hash, name in sorted(self._slowest, reverse=True)],
+                "workers": {name: {k: round(v, 6) for k, v in worker.items()}
+                            for name, worker in sorted(self.workers.items())},
+            }
+
+    def to_json(self) -> str:
+        from . import codec
+        return codec.dumps(self.to_dict()).decode("utf-8")
+
+    def summary(self) -> str:
+        """A human readable summary of the profile."""
+        report = self.to_dict()
+        lines = [f"Traversal took {report['total']:.3f}s, {report['bound']} bound"]
+        for name in PHASES:
+            if name in report["phases"]:
+                timing = report["phases"][name]
+                lines.append(f"  {name:<12} {timing['wall']:8.3f}s wall {timing['cpu']:8.3f}s cpu")
+        for kind, stats in report["fetches"].items():
+            mean = stats["total"] / stats["count"] if stats["count"] else 0.0
+            lines.append(f"  {kind + ' blobs':<16} {stats['count']:6d} fetches, "
+                         f"mean {mean * 1000:.1f}ms, max {stats['max'] * 1000:.1f}ms")
+        workers = report["workers"].values()
+        if workers:
+            busy = sum(w["busy"] for w in workers)
+            cpu = sum(w["cpu"] for w in workers)
+            queue_wait = sum(w["queue_wait"] for w in workers)
+            lines.append(f"  {len(workers)} workers: {busy:.3f}s busy, of which {cpu:.3f}s cpu; "
+                         f"{queue_wait:.3f}s queued")
+        if report["slowest"]:
+            lines.append("  slowest fetches:")
+            for entry in report["slowest"]:
+                lines.append(f"    {entry['seconds'] * 1000:8.1f}ms {entry['kind']:<9} "
+                             f"{entry['name']} ({entry['hash']})")
+        return "\n".join(lines)
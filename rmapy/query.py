@@ -0,0 +1,168 @@
+"""Path glob and predicate queries over the document tree.
+
+:func:`query` matches the paths of a traversed
+:class:`rmapy.types.RootFolder` against a glob, one path component at a
+time: ``*``, ``?`` and ``[...]`` match within a component and ``**`` matches
+any number of them. Subtrees that the pattern can't match are never
+entered, and results are yielded as they are found::
+
+    week = timedelta(days=7)
+    for path, document in root.query("/Newspapers/**", fileType="pdf",
+                                     lastModified=after(week)):
+        ...
+
+Predicates are checked only on items whose path matches. Reading a field of
+``.content`` like fileType fetches it a folder at a time, see
+:func:`rmapy.types.hydrate_contents`.
+"""
+import fnmatch
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, List, Optional, Set, Tuple, Union
+
+from .types import Collection, Document, DocumentOrCollection, RootFolder
+from .views import timestamp
+
+GLOBSTAR = "**"
+# Fields read from .content, see rmapy.types.Document.
+CONTENT_FIELDS = {"fileType", "pageCount", "sizeInBytes", "tags"}
+
+Predicate = Callable[[DocumentOrCollection], bool]
+When = Union[datetime, timedelta, int, float]
+
+
+def _millis(when: When) -> int:
+    """when as milliseconds since the epoch; a timedelta counts back from
+    now, a number is in seconds."""
+    if isinstance(when, timedelta):
+        return int((time.time() - when.total_seconds()) * 1000)
+    if isinstance(when, datetime):
+        return int(when.timestamp() * 1000)
+    return int(when * 1000)
+
+
+def after(when: When) -> Callable[[Any], bool]:
+    """A predicate on a timestamp field: later than when."""
+    limit = _millis(when)
+    return lambda value: timestamp(value) > limit
+
+
+def before(when: When) -> Callable[[Any], bool]:
+    """A predicate on a timestamp field: earlier than when."""
+    limit = _millis(when)
+    return lambda value: 0 < timestamp(value) < limit
+
+
+def _field(name: str, expected: Any) -> Predicate:
+    if callable(expected):
+        return lambda node: expected(getattr(node, name, None))
+    if isinstance(expected, (list, tuple, set, frozenset)):
+        return lambda node: getattr(node, name, None) in expected
+    return lambda node: getattr(node, name, None) == expected
+
+
+class PathPattern(object):
+    """A glob over the components of a path, matched incrementally.
+
+    The state of a match is the set of positions in the pattern reached by
+    the components so far; an empty state can't match anything below.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.parts: List[Union[str, Callable[[str], bool]]] = []
+        for part in pattern.strip("/").split("/"):
+            if not part:
+                continue
+            if part == GLOBSTAR:
+                if not self.parts or self.parts[-1] != GLOBSTAR:
+                    self.parts.append(GLOBSTAR)
+            elif any(c in part for c in "*?["):
+                self.parts.append(re.compile(fnmatch.translate(part)).match)
+            else:
+                self.parts.append(part.__eq__)
+
+    def _closure(self, states: Set[int]) -> Set[int]:
+        # ** may match nothing, unless it ends the pattern: "/a/**" is
+        # everything under /a, but not /a itself.
+        for i in list(states):
+            while self.parts[i] == GLOBSTAR and i + 1 < len(self.parts):
+                i += 1
+                states.add(i)
+        return states
+
+    def start(self) -> Set[int]:
+        return self._closure({0}) if self.parts else set()
+
+    def step(self, states: Set[int], name: str) -> Tuple[Set[int], bool]:
+        """Advance by one path component.
+
+        Returns:
+            The new state and whether the path so far matches.
+        """
+        last = len(self.parts) - 1
+        following: Set[int] = set()
+        matched = False
+        for i in states:
+            part = self.parts[i]
+            if part == GLOBSTAR:
+                following.add(i)
+                matched = matched or i == last
+            elif part(name):
+                if i == last:
+                    matched = True
+                else:
+                    following.add(i + 1)
+        return self._closure(following), matched
+
+
+def query(root: RootFolder, pattern: str = "/**", where: Optional[Predicate] = None,
+          kind: Optional[str] = None, **fields) -> Iterator[Tuple[str, DocumentOrCollection]]:
+    """Yields the path and item of everything matching pattern and the
+    predicates, in tree order.
+
+    Args:
+        root: A traversed tree.
+        pattern: A glob on the full path, e.g. ``/Work/**/*.pdf``. The
+            default matches everything.
+        where: A predicate on the item.
+        kind: "document" or "collection" to match only those.
+        fields: Field names of the item with the value to match, a
+            collection of values, or a predicate on the value, e.g.
+            ``pinned=True``, ``fileType=("pdf", "epub")`` or
+            ``lastModified=after(timedelta(days=7))``.
+    """
+
+    if kind not in (None, "document", "collection"):
+        raise ValueError(f"Unknown kind: {kind}")
+    predicates: List[Predicate] = []
+    if kind is not None:
+        cls = Document if kind == "document" else Collection
+        predicates.append(lambda node: isinstance(node, cls))
+    # Metadata first, so that .content is only fetched for items that
+    # pass them.
+    names = sorted(fields, key=lambda name: name in CONTENT_FIELDS)
+    predicates.extend(_field(name, fields[name]) for name in names)
+    if where is not None:
+        predicates.append(where)
+
+    path_pattern = PathPattern(pattern)
+    start = path_pattern.start()
+    if not start:
+        return
+    stack: List[Tuple[List[DocumentOrCollection], int, Tuple[str, ...], Set[int]]] = [
+        (root.contents, 0, (), start)]
+    while stack:
+        nodes, i, components, states = stack.pop()
+        if i + 1 < len(nodes):
+            stack.append((nodes, i + 1, components, states))
+        if i >= len(nodes):
+            continue
+        node = nodes[i]
+        following, matched = path_pattern.step(states, node.visibleName or "")
+        path = components + (node.visibleName or "",)
+        if matched and all(predicate(node) for predicate in predicates):
+            yield "/" + "/".join(path), node
+        if following and isinstance(node, Collection) and node.contents:
+            stack.append((node.contents, 0, path, following))
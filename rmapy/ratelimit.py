@@ -0,0 +1,168 @@
+"""Client-side rate limiting of requests and bandwidth.
+
+A :class:`RateLimiter` is consulted by :meth:`rmapy.api.Client.request`
+before every request and after every response. It is thread-safe, so one
+instance can be shared by every client of a process. Passing a ``path``
+keeps the bucket state in a lock-protected file instead, which shares the
+budget with every process on the host using the same path (use a path on
+``/dev/shm`` to keep it in memory)::
+
+    limiter = RateLimiter(requests_per_second=20, bytes_per_second=5e6,
+                          path="/dev/shm/rmapy-ratelimit")
+    client = Client(rate_limiter=limiter)
+
+Buckets work by reservation: a caller takes its tokens right away, possibly
+going into debt, and then sleeps until the debt would have been refilled.
+Bandwidth is charged after the response, so a large download delays the
+requests that follow it.
+"""
+import os
+import struct
+import threading
+import time
+from typing import Optional, Tuple
+
+_STATE = struct.Struct("dd")
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket.
+
+    Args:
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens, i.e. the allowed burst.
+            Defaults to one second worth of tokens.
+
+    Raises:
+        ValueError: rate isn't positive.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if not rate > 0:
+            raise ValueError(f"Token bucket rate must be positive: {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._stamp = time.time()
+
+    def _load(self) -> Tuple[float, float]:
+        return self._tokens, self._stamp
+
+    def _store(self, tokens: float, stamp: float) -> None:
+        self._tokens, self._stamp = tokens, stamp
+
+    def _reserve(self, amount: float) -> float:
+        """Take amount tokens and return how long to wait for them."""
+        now = time.time()
+        tokens, stamp = self._load()
+        tokens = min(self.capacity, tokens + max(0.0, now - stamp) * self.rate)
+        tokens -= amount
+        self._store(tokens, now)
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def acquire(self, amount: float = 1) -> float:
+        """Take amount tokens, sleeping until the bucket can afford them.
+
+        Returns:
+            The number of seconds slept.
+        """
+        with self._lock:
+            wait = self._reserve(amount)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def consume(self, amount: float) -> None:
+        """Take amount tokens without waiting, possibly going into debt."""
+        with self._lock:
+            self._reserve(amount)
+
+
+class FileTokenBucket(TokenBucket):
+    """A token bucket whose state lives in a file shared between processes.
+
+    The file is locked with ``fcntl.flock`` for every update, so this is
+    only available on Unix.
+
+    Args:
+        path: The state file. Created if it doesn't exist.
+        rate: Tokens added per second.
+        capacity: Maximum number of tokens.
+    """
+
+    def __init__(self, path: str, rate: float, capacity: Optional[float] = None):
+        import fcntl
+
+        super(FileTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+        self._flock = fcntl.flock
+        self._LOCK_EX = fcntl.LOCK_EX
+        self._LOCK_UN = fcntl.LOCK_UN
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _load(self) -> Tuple[float, float]:
+        data = os.pread(self._fd, _STATE.size, 0)
+        if len(data) < _STATE.size:
+            return self.capacity, time.time()
+        return _STATE.unpack(data)
+
+    def _store(self, tokens: float, stamp: float) -> None:
+        os.pwrite(self._fd, _STATE.pack(tokens, stamp), 0)
+
+    def _reserve(self, amount: float) -> float:
+        self._flock(self._fd, self._LOCK_EX)
+        try:
+            return super(FileTokenBucket, self)._reserve(amount)
+        finally:
+            self._flock(self._fd, self._LOCK_UN)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class RateLimiter(object):
+    """Limits the request rate and bandwidth of one or more clients.
+
+    Args:
+        requests_per_second: Request budget, or None for no limit.
+        bytes_per_second: Bandwidth budget for request and response bodies,
+            or None for no limit.
+        burst: Bucket capacity as a number of seconds of budget.
+        path: Share the budget across processes through files with this
+            prefix.
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = None,
+                 bytes_per_second: Optional[float] = None,
+                 burst: float = 1.0, path: Optional[str] = None):
+        def bucket(rate, suffix):
+            if rate is None:
+                return None
+            if path:
+                return FileTokenBucket(f"{path}.{suffix}", rate, rate * burst)
+            return TokenBucket(rate, rate * burst)
+
+        self.requests = bucket(requests_per_second, "requests")
+        self.bytes = bucket(bytes_per_second, "bytes")
+
+    def before_request(self, size: int = 0) -> float:
+        """Wait for a request slot and for any bandwidth debt to be repaid.
+
+        Args:
+            size: Size of the request body.
+
+        Returns:
+            The number of seconds waited.
+        """
+        waited = 0.0
+        if self.requests:
+            waited += self.requests.acquire(1)
+        if self.bytes:
+            waited += self.bytes.acquire(size)
+        return waited
+
+    def after_response(self, size: int) -> None:
+        """Charge the size of a response body to the bandwidth budget."""
+        if self.bytes and size:
+            self.bytes.consume(size)
@@ -0,0 +1,197 @@
+"""Incremental refresh of changed documents.
+
+When a page of a document is edited, the hash of the document changes but
+most of its files don't. :func:`refresh_document` diffs the file lists of
+the old and new version by name and hash, fetches only the files that
+changed and patches a local copy in place: a mirror directory (see
+:mod:`rmapy.mirror`), a :class:`rmapy.document.ZipDocument`, or both::
+
+    document, diff = refresh_document(document, new_file_meta,
+                                      mirror_dest="/srv/remarkable", store=store)
+    log.info(f"{len(diff.changed)} files changed, {diff.fetched_bytes} bytes")
+"""
+import os
+from dataclasses import dataclass, field
+from io import BytesIO
+from logging import getLogger
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from . import codec
+from .store import BlobStore
+from .types import Document, FileMetaBlob, FileMetaListBlob, RawJsonBlob
+from .exceptions import UnsupportedTypeError
+
+if TYPE_CHECKING:
+    from .document import ZipDocument
+
+log = getLogger("rmapy")
+
+
+@dataclass
+class DocumentDiff:
+    added: List[FileMetaBlob] = field(default_factory=list)
+    changed: List[FileMetaBlob] = field(default_factory=list)
+    removed: List[FileMetaBlob] = field(default_factory=list)
+    unchanged: int = 0
+    fetched_bytes: int = 0
+
+    @property
+    def updated(self) -> List[FileMetaBlob]:
+        """The files that were added or changed."""
+        return self.added + self.changed
+
+
+def diff_files(old: List[FileMetaBlob], new: List[FileMetaBlob]) -> DocumentDiff:
+    """Compare two file lists of a document by name and hash."""
+    before = {f.name: f for f in old}
+    diff = DocumentDiff()
+    for f in new:
+        previous = before.pop(f.name, None)
+        if previous is None:
+            diff.added.append(f)
+        elif previous.hash != f.hash:
+            diff.changed.append(f)
+        else:
+            diff.unchanged += 1
+    diff.removed = list(before.values())
+    return diff
+
+
+def _relative(document: Document, name: str) -> str:
+    return name[len(document.uuid):].lstrip('/')
+
+
+def _write(path: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _patch_zip(zip_document: 'ZipDocument', old: Document, new: Document,
+               diff: DocumentDiff, contents: Dict[str, bytes]) -> None:
+    from .document import Highlight, RmPage
+
+    old_ids = old.page_ids(zip_document.content)
+    pages = {page_id: page for page_id, page in zip(old_ids, sorted(zip_document.rm, key=lambda p: p.order))}
+    for f in diff.updated:
+        name = _relative(new, f.name)
+        content = contents[f.name]
+        if name == ".content":
+            zip_document.content = codec.loads(content)
+        elif name == ".metadata":
+            zip_document.metadata = codec.loads(content)
+        elif name == ".pagedata":
+            zip_document.pagedata = str(content)
+        elif name in (".pdf", ".epub"):
+            setattr(zip_document, name[1:], BytesIO(content))
+        elif name.startswith(".highlights/"):
+            page_id = name[len(".highlights/"):].rsplit(".", 1)[0]
+            zip_document.highlights = [h for h in zip_document.highlights if h.page_id != page_id]
+            zip_document.highlights.append(Highlight(page_id, content))
+        elif name.endswith(".rm"):
+            page_id = name[:-len(".rm")]
+            page = pages.get(page_id)
+            if page is None:
+                pages[page_id] = RmPage(BytesIO(content), _id=zip_document.ID)
+            else:
+                page.page = BytesIO(content)
+        elif name.startswith(".thumbnails/"):
+            page_id = name[len(".thumbnails/"):].rsplit(".", 1)[0]
+            if page_id in pages:
+                pages[page_id].thumbnail = BytesIO(content)
+
+    for f in diff.removed:
+        name = _relative(old, f.name)
+        if name.startswith(".highlights/"):
+            page_id = name[len(".highlights/"):].rsplit(".", 1)[0]
+            zip_document.highlights = [h for h in zip_document.highlights if h.page_id != page_id]
+
+    zip_document.rm = []
+    for order, page_id in enumerate(new.page_ids(zip_document.content)):
+        page = pages.get(page_id)
+        if page is not None:
+            page.order = order
+            zip_document.rm.append(page)
+
+
+def refresh_document(document: Document, file_meta: FileMetaBlob,
+                     store: Optional[BlobStore] = None,
+                     mirror_dest: Optional[str] = None,
+                     zip_document: Optional['ZipDocument'] = None,
+                     mode: str = "auto") -> Tuple[Document, DocumentDiff]:
+    """Update a document to a new version, fetching only what changed.
+
+    Args:
+        document: The stale document.
+        file_meta: The entry of the document in the current root index.
+        store: Keep fetched files in this store and link them into the
+            mirror from there.
+        mirror_dest: A mirror directory to patch, see
+            :func:`rmapy.mirror.mirror`.
+        zip_document: A ZipDocument of the stale version to patch.
+        mode: How files are linked into the mirror, see
+            :meth:`rmapy.store.BlobStore.link`.
+
+    Returns:
+        The new document and what changed.
+
+    Raises:
+        UnsupportedTypeError: file_meta isn't the index of a document.
+    """
+
+    client = file_meta.client
+    new_list = file_meta.get_blob()
+    if not isinstance(new_list, FileMetaListBlob):
+        raise UnsupportedTypeError(f"{file_meta.hash} is not the index of a document")
+
+    diff = diff_files(document.meta_list_blob.files, new_list.files)
+    # Unchanged files keep what was already fetched for them.
+    previous = {f.hash: f for f in document.meta_list_blob.files}
+    for f in new_list.files:
+        if f.hash in previous and not f._blob:
+            f._blob = previous[f.hash]._blob
+
+    contents: Dict[str, bytes] = {}
+    for f in diff.updated:
+        content = store.get(f.hash) if store is not None else None
+        if content is None:
+            content = client.get_raw_blob(f.hash)
+            if content is None:
+                log.warning(f"Can't refresh {f.name}: blob {f.hash} is missing")
+                continue
+            diff.fetched_bytes += len(content)
+            if store is not None:
+                store.put(f.hash, content)
+        contents[f.name] = content
+    diff.added = [f for f in diff.added if f.name in contents]
+    diff.changed = [f for f in diff.changed if f.name in contents]
+
+    meta_blob = document.meta_blob
+    for f in diff.updated:
+        if f.name.endswith('.metadata'):
+            meta_blob = RawJsonBlob(client=client, json=codec.loads(contents[f.name]))
+            new_list._metadata = meta_blob
+    new = Document(client=document.client, uuid=document.uuid, hash=file_meta.hash,
+                   meta_blob=meta_blob, meta_list_blob=new_list)
+
+    if mirror_dest is not None:
+        for f in diff.updated:
+            path = os.path.join(mirror_dest, f.name)
+            if store is not None:
+                store.link(f.hash, path, mode)
+            else:
+                _write(path, contents[f.name])
+        for f in diff.removed:
+            try:
+                os.unlink(os.path.join(mirror_dest, f.name))
+            except FileNotFoundError:
+                pass
+    if zip_document is not None:
+        _patch_zip(zip_document, document, new, diff, contents)
+
+    log.info(f"Refreshed {document.uuid}: {len(diff.added)} added, {len(diff.changed)} changed, "
+             f"{len(diff.removed)} removed, {diff.unchanged} unchanged "
+             f"({diff.fetched_bytes} bytes fetched)")
+    return new, diff
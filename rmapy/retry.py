@@ -0,0 +1,182 @@
+"""Retry policy and per-endpoint circuit breakers for :class:`rmapy.api.Client`.
+
+Transient failures (connection errors, 429 and 5xx responses) are retried
+with jittered exponential backoff, honouring ``Retry-After``. An endpoint
+that keeps failing trips its circuit breaker, after which requests to it
+fail fast with :class:`rmapy.exceptions.CircuitOpenError` until a probe
+request succeeds again. Only connection errors and 5xx responses count as
+failures: a 429 throttles one account, not the endpoint.
+"""
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+from urllib.parse import urlsplit
+
+from .exceptions import CircuitOpenError
+
+_HASH_SEGMENT = re.compile(r"^[0-9a-fA-F]{32,}$")
+
+
+def endpoint(url: str) -> str:
+    """The endpoint of a url, with content hashes replaced by ``{hash}``."""
+    parts = urlsplit(url)
+    path = "/".join("{hash}" if _HASH_SEGMENT.match(s) else s
+                    for s in parts.path.split("/"))
+    return f"{parts.netloc}{path}"
+
+
+@dataclass
+class RetryPolicy:
+    """When and how long to wait before retrying a request.
+
+    Attributes:
+        total: Maximum number of retries.
+        backoff_factor: Base of the exponential backoff, in seconds.
+        max_backoff: Upper bound of a single backoff.
+        max_retry_after: Longest ``Retry-After`` that is waited for. Longer
+            ones are not retried.
+        status_forcelist: Statuses that are retried.
+        allowed_methods: Methods retried on any of status_forcelist or on a
+            connection error. 429 is retried for every method, as the
+            server did not process the request.
+    """
+
+    total: int = 3
+    backoff_factor: float = 0.5
+    max_backoff: float = 30.0
+    max_retry_after: float = 120.0
+    status_forcelist: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+    allowed_methods: FrozenSet[str] = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+
+    def is_retryable(self, method: str, status: Optional[int] = None) -> bool:
+        """Is a failure (status None for connection errors) retryable."""
+        if status is not None and status not in self.status_forcelist:
+            return False
+        return status == 429 or method.upper() in self.allowed_methods
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """Seconds to wait before retry number attempt (counting from 0).
+
+        Returns None if the request shouldn't be retried anymore.
+        """
+        if attempt >= self.total:
+            return None
+        if retry_after:
+            wait = parse_retry_after(retry_after)
+            if wait is not None:
+                return wait if wait <= self.max_retry_after else None
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """Parse a ``Retry-After`` header, in seconds or as an HTTP date."""
+    from email.utils import parsedate_to_datetime
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker(object):
+    """Stops sending requests to an endpoint which keeps failing.
+
+    After ``threshold`` consecutive failures the circuit opens and requests
+    fail fast for ``reset_timeout`` seconds. Then a single probe request is
+    let through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name: str, threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._cond = threading.Condition()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_request(self) -> bool:
+        """Raises CircuitOpenError unless a request may be sent.
+
+        While a probe request is in flight, other requests wait for its
+        outcome.
+
+        Returns:
+            Whether the request is the probe. Its sender must call
+            end_probe() once it is done, whatever the outcome.
+        """
+        with self._cond:
+            while True:
+                state = self.state
+                if state == "closed":
+                    return False
+                if state == "open":
+                    break
+                if not self._probing:
+                    self._probing = True
+                    return True
+                self._cond.wait(self.reset_timeout)
+        raise CircuitOpenError(f"Circuit open for {self.name} after "
+                               f"{self.failures} consecutive failures")
+
+    def record_success(self) -> None:
+        with self._cond:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+            self._cond.notify_all()
+
+    def end_probe(self) -> None:
+        """Let another request probe if the probe ended without recording a
+        success or failure."""
+        with self._cond:
+            if self._probing:
+                self._probing = False
+                self._cond.notify_all()
+
+    def record_failure(self) -> bool:
+        """Record a failure. Returns True if this opened the circuit."""
+        with self._cond:
+            self.failures += 1
+            was_probing, self._probing = self._probing, False
+            if was_probing or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self._cond.notify_all()
+                return True
+            return False
+
+
+class CircuitBreakers(object):
+    """A circuit breaker per endpoint, created on first use."""
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(
+                    name, self.threshold, self.reset_timeout)
+            return breaker
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {name: b.state for name, b in self._breakers.items()}
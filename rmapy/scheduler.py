@@ -0,0 +1,120 @@
+"""Priority classes for requests sharing one client.
+
+A :class:`RequestScheduler` bounds the number of requests in flight and
+hands out free slots by priority, so a user opening a document isn't queued
+behind thousands of background metadata fetches::
+
+    client = Client(scheduler=RequestScheduler(slots=32))
+
+    # A traversal runs at BACKGROUND priority unless told otherwise
+    root = client.get_root_folder()
+
+    # Everything else defaults to INTERACTIVE
+    with priority(PREFETCH):
+        client.get_blob(page_hash)
+
+Each class can only use a limited number of slots, which keeps some slots
+free for interactive requests, and can be given its own bandwidth budget.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .ratelimit import TokenBucket
+
+INTERACTIVE = 0
+PREFETCH = 1
+BACKGROUND = 2
+
+NAMES = {INTERACTIVE: "interactive", PREFETCH: "prefetch", BACKGROUND: "background"}
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("rmapy_priority", default=None)
+
+
+def current_priority(default: int = INTERACTIVE) -> int:
+    """The priority set by the innermost :func:`priority` block, or default."""
+    level = _priority.get()
+    return default if level is None else level
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run the requests made in this block at the given priority."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RequestScheduler(object):
+    """Grants request slots in priority order.
+
+    Args:
+        slots: Requests in flight at once, over all classes.
+        reserved: Slots only interactive requests may use. By default
+            background requests may use the rest and prefetches half of it.
+        limits: Slots per class, overriding the defaults.
+        bytes_per_second: Bandwidth budget per class.
+    """
+
+    def __init__(self, slots: int = 32, reserved: int = 8,
+                 limits: Optional[Dict[int, int]] = None,
+                 bytes_per_second: Optional[Dict[int, float]] = None):
+        shared = max(1, slots - reserved)
+        self.slots = slots
+        self.limits = {
+            INTERACTIVE: slots,
+            PREFETCH: max(1, shared // 2),
+            BACKGROUND: shared,
+        }
+        self.limits.update(limits or {})
+        self.buckets = {level: TokenBucket(rate)
+                        for level, rate in (bytes_per_second or {}).items()}
+        self.in_flight = {level: 0 for level in self.limits}
+        self.waiting = {level: 0 for level in self.limits}
+        self._cond = threading.Condition()
+
+    def _can_run(self, level: int) -> bool:
+        if sum(self.in_flight.values()) >= self.slots:
+            return False
+        if self.in_flight[level] >= self.limits[level]:
+            return False
+        # Let waiting requests of a higher priority go first, unless they
+        # are held back by their own limit.
+        return not any(self.waiting[other] and self.in_flight[other] < self.limits[other]
+                       for other in self.limits if other < level)
+
+    @contextmanager
+    def slot(self, level: int) -> Iterator[float]:
+        """Hold a slot of the given class for the duration of the block.
+
+        Yields:
+            The number of seconds spent waiting for the slot.
+        """
+        start = time.monotonic()
+        bucket = self.buckets.get(level)
+        if bucket:
+            bucket.acquire(0)
+        with self._cond:
+            self.waiting[level] += 1
+            try:
+                while not self._can_run(level):
+                    self._cond.wait()
+            finally:
+                self.waiting[level] -= 1
+            self.in_flight[level] += 1
+        try:
+            yield time.monotonic() - start
+        finally:
+            with self._cond:
+                self.in_flight[level] -= 1
+                self._cond.notify_all()
+
+    def after_response(self, level: int, size: int) -> None:
+        """Charge the size of a response to the bandwidth budget of a class."""
+        bucket = self.buckets.get(level)
+        if bucket and size:
+            bucket.consume(size)
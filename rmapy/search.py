@@ -0,0 +1,302 @@
+"""Library-wide search over names, folder paths and highlights.
+
+A :class:`SearchIndex` is built from a traversed :class:`rmapy.types.RootFolder`.
+Names and paths come from the metadata the traversal already parsed; the
+text of highlights is read from the ``.highlights/<page>.json`` files listed
+in the index of every document, which are fetched in bulk without
+downloading anything else. Updates are incremental: documents whose hash
+didn't change are skipped, and highlight files are remembered by hash, so
+after a :meth:`rmapy.types.RootFolder.reconcile` only new highlights are
+fetched::
+
+    index = SearchIndex()
+    index.update(root)
+    index.search("mitochondria")    # full text, every word must match
+    index.search("mito", prefix=True)
+    root.reconcile()
+    index.update(root)
+"""
+import bisect
+import heapq
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from logging import getLogger
+from threading import Lock
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import codec
+from .store import BlobStore
+from .types import (Collection, Document, DocumentOrCollection, FileMetaBlob, RootFolder,
+                    THREADS, _iter_bounded)
+
+log = getLogger("rmapy")
+
+_WORD = re.compile(r"\w+")
+
+# Fields in the order results are ranked by.
+FIELDS = ("name", "path", "highlights")
+_BITS = {name: 1 << i for i, name in enumerate(FIELDS)}
+
+
+def tokenize(text: str) -> List[str]:
+    """The lowercased words of text."""
+    return _WORD.findall(text.casefold())
+
+
+def highlight_text(data: Any) -> List[str]:
+    """The highlighted passages in the parsed JSON of a highlights file."""
+    texts = []
+    if isinstance(data, dict):
+        text = data.get("text")
+        if isinstance(text, str):
+            texts.append(text)
+        for key, value in data.items():
+            if key != "text":
+                texts.extend(highlight_text(value))
+    elif isinstance(data, list):
+        for value in data:
+            texts.extend(highlight_text(value))
+    return texts
+
+
+@dataclass
+class SearchResult:
+    node: DocumentOrCollection
+    path: str
+    # The fields that matched, see FIELDS.
+    fields: List[str] = field(default_factory=list)
+    # The highlighted passages that matched.
+    highlights: List[str] = field(default_factory=list)
+
+
+@dataclass
+class _Entry:
+    node: DocumentOrCollection
+    hash: str
+    path: str
+    # Hashes of the highlight files of the document.
+    highlight_hashes: List[str]
+    # The words of the item and the fields they occur in, as bits of _BITS.
+    words: Dict[str, int]
+
+
+class SearchIndex(object):
+    """An inverted index over the whole library.
+
+    Args:
+        store: Keep fetched highlight files in this store, so that an index
+            rebuilt later doesn't fetch them again.
+        workers: Number of concurrent fetches.
+    """
+
+    def __init__(self, store: Optional[BlobStore] = None, workers: int = THREADS):
+        self.store = store
+        self.workers = workers
+        self._entries: Dict[str, _Entry] = {}
+        # Word to the uuids of the items containing it and the fields it
+        # occurs in.
+        self._postings: Dict[str, Dict[str, int]] = {}
+        # Highlighted passages by the hash of their file.
+        self._highlights: Dict[str, List[str]] = {}
+        # All words in sorted order, for prefix queries. Rebuilt on the
+        # first query after a change.
+        self._words: Optional[List[str]] = None
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _walk(self, nodes: List[DocumentOrCollection],
+              prefix: str = "") -> Iterator[Tuple[str, DocumentOrCollection]]:
+        for node in nodes:
+            path = f"{prefix}/{node.visibleName}"
+            yield path, node
+            if isinstance(node, Collection):
+                yield from self._walk(node.contents, path)
+
+    def _highlight_files(self, node: DocumentOrCollection) -> List[FileMetaBlob]:
+        if not isinstance(node, Document):
+            return []
+        prefix = f"{node.uuid}.highlights/"
+        return [f for f in node.meta_list_blob.files
+                if f.name.startswith(prefix) and f.name.endswith(".json")]
+
+    def _fetch(self, file_meta: FileMetaBlob) -> Tuple[str, List[str]]:
+        content = self.store.get(file_meta.hash) if self.store is not None else None
+        if content is None:
+            content = file_meta.client.get_raw_blob(file_meta.hash)
+            if content is None:
+                log.warning(f"Not indexing {file_meta.name}: blob {file_meta.hash} is missing")
+                return file_meta.hash, []
+            if self.store is not None:
+                self.store.put(file_meta.hash, content)
+        try:
+            return file_meta.hash, highlight_text(codec.loads(content))
+        except ValueError as e:
+            log.warning(f"Not indexing {file_meta.name}: {e}")
+            return file_meta.hash, []
+
+    def _add(self, entry: _Entry) -> None:
+        uuid = entry.node.uuid
+        for word, fields in entry.words.items():
+            self._postings.setdefault(word, {})[uuid] = fields
+        self._entries[uuid] = entry
+
+    def _remove(self, uuid: str) -> None:
+        entry = self._entries.pop(uuid)
+        for word in entry.words:
+            uuids = self._postings[word]
+            del uuids[uuid]
+            if not uuids:
+                del self._postings[word]
+
+    def update(self, root: RootFolder) -> Tuple[int, int]:
+        """Bring the index up to date with a traversed tree.
+
+        Items whose hash and path are unchanged are left alone. Highlight
+        files already indexed under the same hash are not fetched again.
+
+        Returns:
+            The number of items (re)indexed and removed.
+        """
+
+        stale: List[Tuple[str, DocumentOrCollection, List[FileMetaBlob]]] = []
+        seen: Set[str] = set()
+        for path, node in self._walk(root.contents):
+            seen.add(node.uuid)
+            entry = self._entries.get(node.uuid)
+            if entry is not None and entry.hash == node.hash and entry.path == path:
+                entry.node = node
+                continue
+            stale.append((path, node, self._highlight_files(node)))
+
+        missing = {f.hash: f for _, _, files in stale for f in files
+                   if f.hash not in self._highlights}
+        if missing:
+            log.debug(f"Fetching {len(missing)} highlight files")
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as executor:
+                for _hash, texts in _iter_bounded(self._fetch, missing.values(),
+                                                  executor=executor):
+                    self._highlights[_hash] = texts
+
+        removed = [uuid for uuid in self._entries if uuid not in seen]
+        with self._lock:
+            for uuid in removed:
+                self._remove(uuid)
+            for path, node, files in stale:
+                if node.uuid in self._entries:
+                    self._remove(node.uuid)
+                hashes = [f.hash for f in files]
+                words: Dict[str, int] = {}
+                for name, text in (("name", node.visibleName or ""), ("path", path)):
+                    for word in tokenize(text):
+                        words[word] = words.get(word, 0) | _BITS[name]
+                for _hash in hashes:
+                    for text in self._highlights.get(_hash, []):
+                        for word in tokenize(text):
+                            words[word] = words.get(word, 0) | _BITS["highlights"]
+                self._add(_Entry(node=node, hash=node.hash, path=path,
+                                 highlight_hashes=hashes, words=words))
+            # Forget the highlights of replaced versions.
+            live = {_hash for entry in self._entries.values() for _hash in entry.highlight_hashes}
+            for _hash in [h for h in self._highlights if h not in live]:
+                del self._highlights[_hash]
+            if stale or removed:
+                self._words = None
+        log.info(f"Search index: {len(stale)} items indexed, {len(removed)} removed, "
+                 f"{len(missing)} highlight files fetched, {len(self._entries)} items total")
+        return len(stale), len(removed)
+
+    def _matching(self, word: str, prefix: bool) -> Dict[str, int]:
+        if not prefix:
+            return self._postings.get(word, {})
+        if self._words is None:
+            self._words = sorted(self._postings)
+        uuids: Dict[str, int] = {}
+        for i in range(bisect.bisect_left(self._words, word), len(self._words)):
+            if not self._words[i].startswith(word):
+                break
+            for uuid, fields in self._postings[self._words[i]].items():
+                uuids[uuid] = uuids.get(uuid, 0) | fields
+        return uuids
+
+    def search(self, query: str, prefix: bool = False,
+               fields: Tuple[str, ...] = FIELDS, limit: Optional[int] = None) -> List[SearchResult]:
+        """Find the items containing every word of query.
+
+        Args:
+            query: Words to look for, in any order and case.
+            prefix: Match the last word of the query as a prefix, for
+                search as you type.
+            fields: Only match in these fields, see FIELDS.
+            limit: Return at most this many results.
+
+        Returns:
+            The results, items matching by name first, then by path, then
+            by highlights, each by path.
+        """
+
+        words = tokenize(query)
+        if not words:
+            return []
+        last = len(words) - 1
+        wanted = 0
+        for name in fields:
+            wanted |= _BITS[name]
+
+        with self._lock:
+            # Every word must match, though not necessarily in the same field.
+            # The rarest words go first to keep the candidates few, and a
+            # prefix is checked against the candidates left, if any.
+            order = sorted(range(len(words)), key=lambda i: (
+                prefix and i == last, len(self._postings.get(words[i], ()))))
+            candidates: Optional[Dict[str, int]] = None
+            for i in order:
+                word = words[i]
+                if candidates is not None and prefix and i == last:
+                    uuids = {uuid: self._prefix_fields(self._entries[uuid], word)
+                             for uuid in candidates}
+                else:
+                    uuids = self._matching(word, prefix and i == last)
+                if candidates is None:
+                    candidates = {uuid: f & wanted for uuid, f in uuids.items() if f & wanted}
+                else:
+                    candidates = {uuid: matched | (uuids[uuid] & wanted)
+                                  for uuid, matched in candidates.items() if uuids.get(uuid, 0) & wanted}
+                if not candidates:
+                    return []
+
+            def rank(item: Tuple[str, int]) -> Tuple[int, str]:
+                uuid, matched = item
+                return (matched & -matched, self._entries[uuid].path)
+
+            ranked = sorted(candidates.items(), key=rank) if limit is None \
+                else heapq.nsmallest(limit, candidates.items(), key=rank)
+            results = []
+            for uuid, matched in ranked:
+                entry = self._entries[uuid]
+                result = SearchResult(node=entry.node, path=entry.path,
+                                      fields=[name for name in FIELDS if matched & _BITS[name]])
+                if matched & _BITS["highlights"]:
+                    result.highlights = [
+                        text for _hash in entry.highlight_hashes
+                        for text in self._highlights.get(_hash, [])
+                        if any(self._contains(tokenize(text), word, prefix and i == last)
+                               for i, word in enumerate(words))]
+                results.append(result)
+        return results
+
+    @staticmethod
+    def _prefix_fields(entry: _Entry, prefix: str) -> int:
+        fields = 0
+        for word, found in entry.words.items():
+            if word.startswith(prefix):
+                fields |= found
+        return fields
+
+    @staticmethod
+    def _contains(words: List[str], word: str, prefix: bool) -> bool:
+        if not prefix:
+            return word in words
+        return any(w.startswith(word) for w in words)
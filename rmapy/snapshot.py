@@ -0,0 +1,100 @@
+"""Local snapshots of a library, for working offline.
+
+A :class:`Snapshot` keeps the last root hash seen by a client and, in a
+:class:`rmapy.store.BlobStore`, every blob it fetched. A client with a
+snapshot writes through to it while online, reads blobs from it before
+asking the server (a hash always names the same content), and can answer
+:meth:`rmapy.api.Client.get_root_hash` and :meth:`rmapy.api.Client.get_blob`
+from it alone::
+
+    # Online, every complete traversal refreshes the snapshot.
+    client = Client(snapshot=Snapshot())
+    client.get_root_folder()
+
+    # Never touch the network; blobs missing locally raise CacheMiss.
+    client = Client(snapshot=Snapshot(), offline=True)
+
+    # Use the network, but fall back to the snapshot when the cloud is
+    # unreachable or failing.
+    client = Client(snapshot=Snapshot(), offline="fallback")
+
+The snapshot stores blob contents only. Content types are inferred again
+when a blob is read back: JSON and index files are text, everything else is
+binary.
+"""
+import os
+import threading
+import time
+from typing import Optional, Tuple
+
+from . import codec
+from .store import BlobStore
+from .exceptions import CacheMiss
+
+
+def sniff_content_type(content: bytes) -> str:
+    """A content type for a blob that makes it parse as it did online."""
+    head = content[:64].lstrip()
+    if head[:1] == b'{':
+        return 'text/plain; charset=UTF-8'
+    lines = content[:512].split(b'\n', 2)
+    if len(lines) > 1 and lines[0].strip().isdigit() and lines[1].count(b':') >= 4:
+        return 'text/plain; charset=UTF-8'
+    return 'application/octet-stream'
+
+
+class Snapshot(object):
+    """The root hash and blobs of a library, on disk.
+
+    Args:
+        store: Where blobs are kept. Defaults to ``~/.cache/rmapy/blobs``,
+            which is shared with mirrors.
+        name: Name of the root record, to keep several accounts in one
+            store.
+    """
+
+    def __init__(self, store: Optional[BlobStore] = None, name: str = "root"):
+        self.store = store or BlobStore()
+        self.record_path = os.path.join(self.store.path, f"{name}.json")
+
+    def root(self) -> Tuple[str, float]:
+        """The last recorded root hash and when it was recorded.
+
+        Raises:
+            CacheMiss: No root hash was recorded yet.
+        """
+        try:
+            with open(self.record_path, "rb") as f:
+                record = codec.loads(f.read())
+        except FileNotFoundError:
+            raise CacheMiss(f"No snapshot in {self.store.path}")
+        return record["hash"], record["recorded"]
+
+    def record(self, _hash: str) -> None:
+        """Record the current root hash."""
+        os.makedirs(self.store.path, exist_ok=True)
+        tmp = f"{self.record_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(codec.dumps({"hash": _hash, "recorded": time.time()}))
+        os.replace(tmp, self.record_path)
+
+    def age(self) -> Optional[float]:
+        """Seconds since the root hash was recorded, or None."""
+        try:
+            return time.time() - self.root()[1]
+        except CacheMiss:
+            return None
+
+    def put(self, _hash: str, content: bytes) -> None:
+        self.store.put(_hash, content)
+
+    def get(self, _hash: str) -> Tuple[str, bytes]:
+        """The (content type, content) of a blob.
+
+        Raises:
+            CacheMiss: The blob isn't in the snapshot.
+        """
+        content = self.store.get(_hash)
+        if content is None:
+            raise CacheMiss(f"Blob {_hash} is not in the snapshot", hash=_hash)
+        return sniff_content_type(content), content
@@ -0,0 +1,186 @@
+"""Content-addressed blob storage on disk.
+
+Blobs are stored under their hash in sharded directories
+(``<path>/<first two characters>/<hash>``). Since a hash always names the
+same content, a stored blob never needs to be refreshed and can be shared
+by everything that references it: :meth:`BlobStore.link` places a blob in a
+mirror or export by reflink or hardlink instead of writing another copy,
+and :meth:`BlobStore.gc` removes the blobs no longer referenced::
+
+    store.gc(root.live_hashes())
+"""
+import errno
+import os
+import shutil
+import threading
+from logging import getLogger
+from typing import Iterable, Iterator, Optional, Tuple
+
+log = getLogger("rmapy")
+
+# ioctl number of FICLONE on Linux, see ioctl_ficlone(2).
+FICLONE = 0x40049409
+LINK_MODES = ("auto", "reflink", "hardlink", "copy")
+# Errors meaning the filesystem can't link this way at all, as opposed to a
+# failure of one link, e.g. a missing blob or a full disk.
+_UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY, errno.EPERM,
+                errno.EMLINK}
+# ioctl_ficlone(2) also reports a filesystem without reflinks with EINVAL.
+_REFLINK_UNSUPPORTED = _UNSUPPORTED | {errno.EINVAL}
+
+
+def _reflink(src: str, dest: str) -> None:
+    import fcntl
+
+    with open(src, "rb") as s, open(dest, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def default_path(name: str) -> str:
+    """A directory for name under the user cache directory."""
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache, "rmapy", name)
+
+
+class BlobStore(object):
+    """Blobs on disk, addressed by hash.
+
+    Args:
+        path: The root directory of the store. Defaults to
+            ``~/.cache/rmapy/blobs``.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = os.path.expanduser(path or default_path("blobs"))
+        # Link modes that failed on this filesystem, not retried.
+        self._unsupported = set()
+
+    def path_of(self, _hash: str) -> str:
+        """Where the blob with the given hash is, or would be, stored."""
+        return os.path.join(self.path, _hash[:2], _hash)
+
+    def __contains__(self, _hash: str) -> bool:
+        return os.path.exists(self.path_of(_hash))
+
+    def get(self, _hash: str) -> Optional[bytes]:
+        """The content of a blob, or None if it isn't stored."""
+        try:
+            with open(self.path_of(_hash), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, _hash: str, content: bytes) -> str:
+        """Store a blob and return its path.
+
+        Writes go to a temporary file that is renamed into place, so
+        concurrent writers and readers never see a partial blob.
+        """
+        path = self.path_of(_hash)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+        return path
+
+    def __iter__(self) -> Iterator[str]:
+        """The hashes of all stored blobs."""
+        if not os.path.isdir(self.path):
+            return
+        for shard in os.scandir(self.path):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if not entry.name.endswith(".tmp"):
+                        yield entry.name
+
+    def link(self, _hash: str, dest: str, mode: str = "auto") -> str:
+        """Place a stored blob at dest, replacing any file there.
+
+        Reflinks share the data until either copy is written to. Hardlinks
+        share the file itself, so a hardlinked copy must not be modified
+        in place. The placed file gets the modification time of the blob,
+        so that it can be recognized later, see :meth:`in_place`.
+
+        Args:
+            _hash: A stored blob.
+            dest: The path to create.
+            mode: "reflink", "hardlink" or "copy"; "auto" tries them in that
+                order.
+
+        Returns:
+            The mode that was used.
+
+        Raises:
+            OSError: The blob isn't stored, or dest can't be written. In
+                auto mode, a mode the filesystem doesn't support falls back
+                to the next one instead.
+        """
+
+        if mode not in LINK_MODES:
+            raise ValueError(f"Unknown link mode: {mode}")
+        src = self.path_of(_hash)
+        modes = ("reflink", "hardlink", "copy") if mode == "auto" else (mode,)
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        tmp = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        for candidate in modes:
+            if mode == "auto" and candidate in self._unsupported:
+                continue
+            try:
+                if candidate == "reflink":
+                    _reflink(src, tmp)
+                elif candidate == "hardlink":
+                    os.link(src, tmp)
+                else:
+                    shutil.copyfile(src, tmp)
+            except OSError as e:
+                if os.path.lexists(tmp):
+                    os.unlink(tmp)
+                unsupported = _REFLINK_UNSUPPORTED if candidate == "reflink" else _UNSUPPORTED
+                if mode != "auto" or candidate == "copy" or e.errno not in unsupported:
+                    raise
+                log.debug(f"Can't {candidate} {src} to {dest}: {e}")
+                self._unsupported.add(candidate)
+                continue
+            if candidate != "hardlink":
+                st = os.stat(src)
+                os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp, dest)
+            return candidate
+
+    def in_place(self, _hash: str, path: str) -> bool:
+        """Whether path holds the blob as placed by link(): the same file,
+        or one of the same size and modification time."""
+        try:
+            blob, placed = os.stat(self.path_of(_hash)), os.stat(path)
+        except OSError:
+            return False
+        if (blob.st_dev, blob.st_ino) == (placed.st_dev, placed.st_ino):
+            return True
+        return blob.st_size == placed.st_size and blob.st_mtime_ns == placed.st_mtime_ns
+
+    def gc(self, live: Iterable[str]) -> Tuple[int, int]:
+        """Remove every blob whose hash isn't in live.
+
+        Files linked from the blobs elsewhere are unaffected.
+
+        Returns:
+            The number of blobs removed and their total size.
+        """
+
+        live = set(live)
+        removed = size = 0
+        for _hash in list(self):
+            if _hash in live:
+                continue
+            path = self.path_of(_hash)
+            try:
+                size += os.path.getsize(path)
+                os.unlink(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        log.info(f"Removed {removed} blobs ({size} bytes) from {self.path}")
+        return removed, size
@@ -0,0 +1,89 @@
+"""Bulk thumbnail fetching for folder views.
+
+:func:`fetch_thumbnails` looks up the thumbnail of the first page of every
+document, from its ``.content`` and the index the traversal already
+fetched, and fetches the missing ones in parallel into a
+:class:`rmapy.store.BlobStore`. Thumbnails are addressed by
+hash, so a repeated view of an unchanged folder is served from disk without
+any request::
+
+    store = BlobStore(default_path("thumbnails"))
+    images = fetch_thumbnails(folder.contents, store)
+"""
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Dict, Iterable, Optional, TYPE_CHECKING
+
+from .store import BlobStore, default_path
+from .types import Document, FileMetaBlob, RawFileBlob, THREADS, _iter_bounded, hydrate_contents
+
+if TYPE_CHECKING:
+    from .types import DocumentOrCollection
+
+log = getLogger("rmapy")
+
+
+def first_thumbnail(document: Document) -> Optional[FileMetaBlob]:
+    """The thumbnail of the first page of a document, if any.
+
+    The index lists files by hash, not in page order, so the first page is
+    looked up in ``.content``. Without a page list there, the first
+    thumbnail in the index is used.
+    """
+    page_ids = document.page_ids()
+    if page_ids:
+        return document.thumbnail_file(page_ids[0])
+    prefix = f"{document.uuid}.thumbnails/"
+    for f in document.meta_list_blob.files:
+        if f.name.startswith(prefix):
+            return f
+    return None
+
+
+def fetch_thumbnails(items: Iterable['DocumentOrCollection'],
+                     store: Optional[BlobStore] = None,
+                     workers: int = THREADS) -> Dict[str, Optional[bytes]]:
+    """Returns the first thumbnail of every document, by document uuid.
+
+    Thumbnails found in store are read from disk, all others are fetched
+    concurrently and added to it. Collections are skipped, documents
+    without a thumbnail map to None.
+
+    Args:
+        items: Documents, e.g. the contents of a Collection.
+        store: Where thumbnails are kept. Defaults to
+            ``~/.cache/rmapy/thumbnails``.
+        workers: Maximum number of concurrent fetches.
+    """
+
+    if store is None:
+        store = BlobStore(default_path("thumbnails"))
+    documents = [item for item in items if isinstance(item, Document)]
+    # The page order of all of them, in one parallel round.
+    hydrate_contents(documents)
+    thumbnails: Dict[str, Optional[bytes]] = {}
+    missing: Dict[str, FileMetaBlob] = {}
+    for document in documents:
+        file_meta = first_thumbnail(document)
+        content = store.get(file_meta.hash) if file_meta else None
+        thumbnails[document.uuid] = content
+        if file_meta and content is None:
+            missing[document.uuid] = file_meta
+    if not missing:
+        return thumbnails
+
+    def fetch(item):
+        uuid, file_meta = item
+        blob = file_meta.client.get_blob(file_meta.hash)
+        if not isinstance(blob, RawFileBlob):
+            log.warning(f"No thumbnail for {uuid}: {file_meta.hash} is {type(blob).__name__}")
+            return uuid, None
+        store.put(file_meta.hash, blob.content)
+        return uuid, blob.content
+
+    log.debug(f"Fetching {len(missing)} of {len(thumbnails)} thumbnails")
+    with ThreadPoolExecutor(max_workers=min(workers, len(missing))) as executor:
+        for uuid, content in _iter_bounded(fetch, missing.items(), window=len(missing),
+                                           executor=executor):
+            thumbnails[uuid] = content
+    return thumbnails
@@ -0,0 +1,185 @@
+"""HTTP transports used by :meth:`rmapy.api.Client.request`.
+
+A transport takes the same arguments as :meth:`requests.Session.request` and
+returns a :class:`requests.Response`. Besides the default
+:class:`SessionTransport`, exchanges can be recorded to a cassette file with
+:class:`RecordingTransport` and served back later with
+:class:`ReplayTransport`, so that a slow production run can be profiled
+locally against the same code path::
+
+    client.transport = RecordingTransport(client.transport, "slow.cassette")
+    client.get_root_folder()
+    client.transport.close()
+
+    offline = Client()
+    offline.transport = ReplayTransport("slow.cassette", latency=True)
+    offline.get_root_folder()
+
+Cassettes are gzipped JSON lines. Every response body is stored once, keyed
+by its sha256, and referenced by the exchanges that returned it. Response
+bodies of the token endpoints are not recorded.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from logging import getLogger
+from typing import Deque, Dict, Optional, Tuple, TYPE_CHECKING
+
+from . import codec
+from .exceptions import ReplayError
+
+if TYPE_CHECKING:
+    import requests
+
+log = getLogger("rmapy")
+
+CASSETTE_VERSION = 1
+
+
+def _key(method: str, url: str, params: Optional[dict]) -> str:
+    if params:
+        query = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        url = f"{url}{'&' if '?' in url else '?'}{query}"
+    return f"{method.upper()} {url}"
+
+
+class SessionTransport(object):
+    """Sends requests through a :class:`requests.Session`."""
+
+    def __init__(self, session: 'requests.Session'):
+        self.session = session
+
+    def request(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        return self.session.request(method, url, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+
+class RecordingTransport(object):
+    """Records every exchange sent through another transport.
+
+    Args:
+        inner: The transport that actually sends the requests.
+        path: Where to write the cassette.
+        redact: Don't record the bodies of the token endpoints.
+    """
+
+    def __init__(self, inner, path: str, redact: bool = True):
+        import gzip
+
+        self.inner = inner
+        self.path = path
+        self.redact = redact
+        self._lock = threading.Lock()
+        self._bodies = set()
+        self._start = time.perf_counter()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"version": CASSETTE_VERSION, "recorded": time.time()})
+
+    def _write(self, entry: dict) -> None:
+        self._file.write(codec.dumps(entry).decode("utf-8"))
+        self._file.write("\n")
+
+    def request(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        import base64
+        import hashlib
+
+        offset = time.perf_counter() - self._start
+        start = time.perf_counter()
+        response = self.inner.request(method, url, **kwargs)
+        body = response.content
+        elapsed = time.perf_counter() - start
+
+        if self.redact and "/token/" in url:
+            body = b""
+        digest = hashlib.sha256(body).hexdigest()
+        entry = {
+            "key": _key(method, url, kwargs.get("params")),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+            "body": digest,
+            "offset": round(offset, 6),
+            "elapsed": round(elapsed, 6),
+        }
+        with self._lock:
+            if digest not in self._bodies:
+                self._bodies.add(digest)
+                self._write({"id": digest, "data": base64.b64encode(body).decode("ascii")})
+            self._write(entry)
+        return response
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+        self.inner.close()
+
+    def __enter__(self) -> 'RecordingTransport':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ReplayTransport(object):
+    """Serves responses from a cassette written by :class:`RecordingTransport`.
+
+    Repeated requests are answered in recorded order; once the recorded
+    responses for a request run out, the last one is repeated.
+
+    Args:
+        path: The cassette to replay.
+        latency: Sleep for the recorded duration of each exchange. A float
+            scales the recorded durations.
+    """
+
+    def __init__(self, path: str, latency: float = False):
+        import base64
+        import gzip
+
+        self.latency = float(latency)
+        self._lock = threading.Lock()
+        self._exchanges: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._bodies: Dict[str, bytes] = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = codec.loads(f.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise ReplayError(f"Unsupported cassette version: {header.get('version')}")
+            for line in f:
+                entry = codec.loads(line)
+                if "id" in entry:
+                    self._bodies[entry["id"]] = base64.b64decode(entry["data"])
+                else:
+                    self._exchanges[entry["key"]].append(entry)
+
+    def _next(self, key: str) -> dict:
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if not exchanges:
+                raise ReplayError(f"No recorded response for {key}")
+            if len(exchanges) > 1:
+                return exchanges.popleft()
+            return exchanges[0]
+
+    def request(self, method: str, url: str, **kwargs) -> 'requests.Response':
+        from requests.models import Response
+        from requests.structures import CaseInsensitiveDict
+
+        entry = self._next(_key(method, url, kwargs.get("params")))
+        if self.latency:
+            time.sleep(entry["elapsed"] * self.latency)
+
+        response = Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.url = entry["key"].split(" ", 1)[1]
+        response.elapsed = timedelta(seconds=entry["elapsed"])
+        response._content = self._bodies[entry["body"]]
+        response._content_consumed = True
+        return response
+
+    def close(self) -> None:
+        pass
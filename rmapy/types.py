@@ -1,11 +1,14 @@
+import dataclasses
 from dataclasses import dataclass, field
-from dataclasses_json import dataclass_json
-from typing import Union, Optional, Dict, TypedDict, List, Tuple
-from .document import Document
+from typing import Union, Optional, Dict, TypedDict, List, Set, Tuple, Iterator, Iterable, Callable, Any
 from logging import getLogger
+from itertools import islice
 import logging
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+import time
+
+from .scheduler import BACKGROUND, current_priority, priority
+from .profiler import TraversalProfile, phase
+from .exceptions import CacheMiss
 
 log = getLogger("rmapy")
 log.setLevel(logging.INFO)
@@ -13,6 +16,106 @@ log.setLevel(logging.INFO)
 MetaBlob = Dict[str, str]
 
 THREADS = 25
+# Maximum number of metadata fetches submitted but not yet consumed during a
+# traversal. Bounds memory independently of the library size.
+WINDOW = THREADS * 4
+
+
+
+
+def dataclass_json(cls):
+    """Lazy stand-in for ``dataclasses_json.dataclass_json``.
+
+    dataclasses_json pulls in marshmallow, which dominates the import time of
+    this module. The real decorator is only applied the first time one of
+    its methods is used.
+    """
+
+    def materialize():
+        from dataclasses_json import dataclass_json as _dataclass_json
+        _dataclass_json(cls)
+
+    def method(name):
+        def stub(self, *args, **kwargs):
+            materialize()
+            return getattr(self, name)(*args, **kwargs)
+        stub.__name__ = name
+        return stub
+
+    def class_method(name):
+        def stub(klass, *args, **kwargs):
+            materialize()
+            return getattr(klass, name)(*args, **kwargs)
+        stub.__name__ = name
+        return classmethod(stub)
+
+    for name in ('to_json', 'to_dict'):
+        setattr(cls, name, method(name))
+    for name in ('from_json', 'from_dict', 'schema'):
+        setattr(cls, name, class_method(name))
+    return cls
+
+
+def _iter_bounded(fn: Callable[[Any], Any], items: Iterable[Any],
+                  window: int = WINDOW, executor=None) -> Iterator[Any]:
+    """Yield ``fn(item)`` for every item, in completion order.
+
+    At most ``window`` calls are submitted at once; a new item is only
+    submitted when a previous result completes. Calls run on ``executor``
+    if given (anything with a ``submit`` method returning a future), or on a
+    thread pool owned by this call.
+    """
+    import concurrent.futures
+    from concurrent.futures import ThreadPoolExecutor
+
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            yield from _iter_bounded(fn, items, window, executor)
+        return
+
+    items = iter(items)
+    pending = {executor.submit(fn, item) for item in islice(items, window)}
+    try:
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for item in islice(items, len(done)):
+                pending.add(executor.submit(fn, item))
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+def hydrate_contents(documents: Iterable['DocumentOrCollection'], executor=None) -> int:
+    """Fetch the ``.content`` of every document not fetched yet, concurrently.
+
+    Collections and documents whose content was fetched already are
+    skipped. The fetches go through the blob cache of the client and run on
+    its executor, at the priority of the calling thread.
+
+    Returns:
+        The number of documents fetched.
+    """
+    pending = list({id(d): d for d in documents
+                    if isinstance(d, Document) and d._content is _UNLOADED}.values())
+    if not pending:
+        return 0
+    if executor is None:
+        executor = getattr(pending[0]._client(), 'executor', None)
+    level = current_priority()
+
+    def load(document: 'Document') -> None:
+        with priority(level):
+            document._load_content()
+
+    for _ in _iter_bounded(load, pending, window=len(pending), executor=executor):
+        pass
+    log.debug(f"Fetched the content of {len(pending)} documents")
+    return len(pending)
+
+# Marks a document whose .content wasn't fetched yet; None means it has none.
+_UNLOADED = object()
 
 @dataclass_json
 @dataclass
@@ -96,7 +199,110 @@ class Document:
         self.pinned = self.meta_blob.json.get('pinned')
         self.type = self.meta_blob.json.get('type')
         self.visibleName = self.meta_blob.json.get('visibleName')
-    
+        self._content = _UNLOADED
+        # The contents of the parent folder, whose .content are fetched
+        # along with this one.
+        self._siblings: Optional[List['DocumentOrCollection']] = None
+
+    def _client(self) -> 'Client': # type: ignore
+        return self.client or self.meta_list_blob.client
+
+    def _prefetch(self, page: Optional[int]) -> None:
+        prefetcher = getattr(self._client(), 'prefetcher', None)
+        if prefetcher:
+            prefetcher.on_access(self, page)
+
+    def file(self, name: str) -> Optional[FileMetaBlob]:
+        """The file of this document with the given name, e.g. ``.content``
+        or ``<page id>.rm``, relative to the document."""
+        for f in self.meta_list_blob.files:
+            if f.name[len(self.uuid):].lstrip('/') == name:
+                return f
+        return None
+
+    def content_file(self) -> Optional[FileMetaBlob]:
+        return self.file('.content')
+
+    def _load_content(self) -> Optional[Dict]:
+        if self._content is _UNLOADED:
+            content_file = self.content_file()
+            blob = content_file.get_blob() if content_file else None
+            self._content = blob.json if isinstance(blob, RawJsonBlob) else None
+        return self._content
+
+    def _read_content(self, siblings: bool = True) -> Optional[Dict]:
+        if self._content is _UNLOADED and siblings and self._siblings:
+            hydrate_contents(self._siblings)
+        return self._load_content()
+
+    @property
+    def content(self) -> Optional[Dict]:
+        """The parsed ``.content`` file, or None."""
+        self._prefetch(None)
+        return self._read_content()
+
+    def page_ids(self, content: Optional[Dict] = None) -> List[str]:
+        """The ids of the pages, in document order."""
+        if content is None:
+            content = self._read_content()
+        if not content:
+            return []
+        if 'cPages' in content:
+            return [p['id'] for p in content['cPages'].get('pages', [])
+                    if not p.get('deleted')]
+        return list(content.get('pages') or [])
+
+    @property
+    def fileType(self) -> Optional[str]:
+        """"pdf", "epub" or "notebook", from ``.content``.
+
+        Reading this or any other field of ``.content`` fetches the
+        ``.content`` of all documents in the same folder, see
+        :func:`hydrate_contents`.
+        """
+        content = self._read_content()
+        return content.get('fileType') if content else None
+
+    @property
+    def pageCount(self) -> Optional[int]:
+        content = self._read_content()
+        if not content:
+            return None
+        if content.get('pageCount') is not None:
+            return int(content['pageCount'])
+        return len(self.page_ids(content))
+
+    @property
+    def sizeInBytes(self) -> Optional[int]:
+        """The size of the PDF or EPUB, from ``.content``."""
+        content = self._read_content()
+        if not content or content.get('sizeInBytes') in (None, ''):
+            return None
+        return int(content['sizeInBytes'])
+
+    @property
+    def tags(self) -> List[str]:
+        content = self._read_content()
+        if not content:
+            return []
+        return [t['name'] if isinstance(t, dict) else t for t in content.get('tags') or []]
+
+    def page_file(self, page_id: str) -> Optional[FileMetaBlob]:
+        return self.file(f'{page_id}.rm')
+
+    def thumbnail_file(self, page_id: str) -> Optional[FileMetaBlob]:
+        for f in self.meta_list_blob.files:
+            if f.name.startswith(f'{self.uuid}.thumbnails/{page_id}.'):
+                return f
+        return None
+
+    def get_page(self, index: int) -> Optional['AbstractBlob']:
+        """The ``.rm`` blob of a page, or None for pages without one."""
+        self._prefetch(index)
+        page_ids = self.page_ids(self._read_content(siblings=False))
+        page_file = self.page_file(page_ids[index])
+        return page_file.get_blob() if page_file else None
+
     def __eq__(self, other: 'Document'):
         return self.hash == other.hash and self.uuid == other.uuid
 
@@ -109,6 +315,8 @@ class Collection:
     uuid: str
     hash: str
     contents: List['DocumentOrCollection'] = field(default_factory=list)
+    # The index of the collection, listing its .metadata.
+    meta_list_blob: Optional[FileMetaListBlob] = field(default=None, repr=False)
 
     visibleName: str = field(init=False)
     type: str = field(init=False)
@@ -137,6 +345,17 @@ class Collection:
         self.deleted = self.meta_blob.json.get('deleted')
         self.metadataModified = self.meta_blob.json.get('metadatamodified')
     
+    def thumbnails(self, store=None) -> Dict[str, Optional[bytes]]:
+        """The first thumbnail of every document in this collection, by
+        uuid. See :func:`rmapy.thumbnails.fetch_thumbnails`."""
+        from .thumbnails import fetch_thumbnails
+        return fetch_thumbnails(self.contents, store)
+
+    def hydrate_contents(self) -> int:
+        """Fetch the ``.content`` of every document in this collection in one
+        parallel round. See :func:`hydrate_contents`."""
+        return hydrate_contents(self.contents)
+
     def __eq__(self, other: 'Collection'):
         return self.hash == other.hash and self.uuid == other.uuid
 
@@ -149,21 +368,82 @@ class RootFolder:
     list_blob: FileMetaListBlob = field(repr=False)
 
     contents: List['DocumentOrCollection'] = field(default_factory=list)
+    lazy: bool = field(default=False, repr=False)
+    profile: Optional[TraversalProfile] = field(default=None, repr=False)
+
+    def _executor(self):
+        return getattr(self.client, 'executor', None)
+
+    def _process_all(self, files: Iterable[FileMetaBlob]) -> Iterator[Any]:
+        """_process_file_meta over files on the executor, in completion order.
+
+        Runs at the priority of the calling thread; traversals are bulk work
+        and default to BACKGROUND priority.
+        """
+        level = current_priority(BACKGROUND)
+        profile = self.profile
+
+        def process(file_meta: FileMetaBlob):
+            with priority(level):
+                return self._process_file_meta(file_meta)
+
+        if profile is None:
+            return _iter_bounded(process, files, executor=self._executor())
+
+        def profiled(item: Tuple[float, FileMetaBlob]):
+            submitted, file_meta = item
+            start, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return process(file_meta)
+            finally:
+                profile.item(start - submitted, time.perf_counter() - start,
+                             time.thread_time() - cpu)
+
+        # Stamped as _iter_bounded pulls them, right before submission.
+        stamped = ((time.perf_counter(), file_meta) for file_meta in files)
+        return _iter_bounded(profiled, stamped, executor=self._executor())
+
+    def _timed(self, kind: str, file_meta: FileMetaBlob, fetch: Callable[[], Any]) -> Any:
+        if self.profile is None:
+            return fetch()
+        start = time.perf_counter()
+        try:
+            return fetch()
+        finally:
+            self.profile.fetch(kind, file_meta.hash, file_meta.name, time.perf_counter() - start)
+
+    def _dropped(self, file_meta: FileMetaBlob, reason: str) -> None:
+        log.warning(f"Skipping {file_meta.name} ({file_meta.hash}): {reason}")
+        metrics = getattr(self.client, 'metrics', None)
+        if metrics:
+            metrics.incr(f"traversal_dropped.{reason}")
 
     def _process_file_meta(self, file_meta: FileMetaBlob) -> Optional[Tuple[str, Union[Document, Collection]]]:
         """Process a single file metadata and return the appropriate object if valid."""
-        file_blob = file_meta.get_blob()
+        try:
+            return self._load_file_meta(file_meta)
+        except CacheMiss:
+            self._dropped(file_meta, "offline_miss")
+            return None
+
+    def _load_file_meta(self, file_meta: FileMetaBlob) -> Optional[Tuple[str, Union[Document, Collection]]]:
+        file_blob = self._timed("index", file_meta, file_meta.get_blob)
         if not file_blob:
+            self._dropped(file_meta, "missing")
             return None
-            
-        file_metadata = file_blob.metadata
+        if not isinstance(file_blob, FileMetaListBlob):
+            self._dropped(file_meta, "not_index")
+            return None
+
+        file_metadata = self._timed("metadata", file_meta, lambda: file_blob.metadata)
         if not file_metadata or not file_metadata.json:
+            self._dropped(file_meta, "no_metadata")
             return None
             
         if file_metadata.json.get('type') == 'DocumentType':
             return file_meta.name, Document(uuid=file_meta.name, hash=file_meta.hash, meta_blob=file_metadata, meta_list_blob=file_blob)
         elif file_metadata.json.get('type') == 'CollectionType':
-            return file_meta.name, Collection(uuid=file_meta.name, hash=file_meta.hash, meta_blob=file_metadata)
+            return file_meta.name, Collection(uuid=file_meta.name, hash=file_meta.hash, meta_blob=file_metadata, meta_list_blob=file_blob)
         return None
 
     def _organize_contents(self, documents: List[Document], collections: Dict[str, Collection]) -> None:
@@ -174,11 +454,16 @@ class RootFolder:
             collections['trash'] = Collection(uuid='trash', hash='', meta_blob=RawJsonBlob(json={}), client=None)
 
 
+        # Items in the trash or without a parent; not shown, but their
+        # blobs are still live.
+        detached = []
+
         # Place files inside folders
         for document in documents:
             if document.parentUuid:
                 if document.parentUuid not in collections:
                     log.warning(f"Orphaned file: {document=} parent uuid does not exist")
+                    detached.append(document)
                     continue
                 collections[document.parentUuid].contents.append(document)
         
@@ -187,73 +472,138 @@ class RootFolder:
             if collection.parentUuid:
                 if collection.parentUuid not in collections:
                     log.warning(f"Orphaned collection: {collection=} parent uuid does not exist")
+                    detached.append(collection)
                     continue
                 collections[collection.parentUuid].contents.append(collection)
         
         # Hide the trash
-        del collections['trash']
+        trash = collections.pop('trash')
+        if trash.hash:
+            detached.append(trash)
+        else:
+            detached.extend(trash.contents)
+        self._detached = detached
 
         root_collections = list(filter(lambda c: not c.parentUuid, collections.values()))
         root_files = list(filter(lambda f: not f.parentUuid, documents))
         self.contents = root_collections + root_files
 
-    def __post_init__(self):
+        for document in documents:
+            parent = collections.get(document.parentUuid) if document.parentUuid else None
+            document._siblings = parent.contents if parent else self.contents
+
+    def iter_contents(self) -> Iterator['DocumentOrCollection']:
+        """Traverse the root index, yielding each item as its metadata arrives.
+
+        Once the iterator is exhausted, the items are organized into
+        ``contents``.
+        """
         documents = []
         collections = {}
-        log.info(f"Root folder traversing {len(self.list_blob.files)} files")
-        
-        # Process files in parallel
-        with ThreadPoolExecutor(max_workers=THREADS) as executor:
-            future_to_file = {executor.submit(self._process_file_meta, file_meta): file_meta 
-                            for file_meta in self.list_blob.files}
-            
-            for i, future in enumerate(concurrent.futures.as_completed(future_to_file)):
+        total = len(self.list_blob.files)
+        log.info(f"Root folder traversing {total} files")
+
+        with phase(self.profile, "items"):
+            for i, result in enumerate(self._process_all(self.list_blob.files)):
                 if i % 20 == 0:
-                    log.info(f"Root folder traversal {int(i / len(self.list_blob.files) * 100)}% complete...")
-                
-                result = future.result()
+                    log.info(f"Root folder traversal {int(i / total * 100)}% complete...")
+
                 if result:
                     name, item = result
                     if isinstance(item, Document):
                         documents.append(item)
                     else:
                         collections[name] = item
+                    yield item
+
+        with phase(self.profile, "organize"):
+            self._organize_contents(documents, collections)
+        self._views = None
+        self._snapshot_complete()
+        self._profiled()
+
+    def _snapshot_complete(self) -> None:
+        complete = getattr(self.client, '_snapshot_complete', None)
+        if complete is not None:
+            complete(self.hash)
+
+    def _profiled(self) -> None:
+        if self.profile is not None:
+            self.profile.finish()
+            log.info(self.profile.summary())
+
+    def live_hashes(self) -> Set[str]:
+        """The hashes of every blob reachable from this tree: the root
+        index, the index of every item and the files of every item,
+        including those in the trash."""
+        live = {self.hash}
+        live.update(f.hash for f in self.list_blob.files)
+
+        def _walk(nodes: List['DocumentOrCollection']):
+            for node in nodes:
+                if node.meta_list_blob is not None:
+                    live.update(f.hash for f in node.meta_list_blob.files)
+                if isinstance(node, Collection):
+                    _walk(node.contents)
+        _walk(self.contents)
+        _walk(self._detached)
+        return live
 
-        self._organize_contents(documents, collections)
-
-    def reconcile(self):
-        new_hash = self.client.get_root_hash()
-        if hash == new_hash:
-            return
-        new_list_blob = self.client.get_blob(new_hash)
+    def __post_init__(self):
+        self._views = None
+        self._detached: List['DocumentOrCollection'] = []
+        if not self.lazy:
+            for _ in self.iter_contents():
+                pass
+
+    def reconcile(self, profile: bool = False, root_hash: Optional[str] = None
+                  ) -> Tuple[List['DocumentOrCollection'], List['DocumentOrCollection']]:
+        """Bring the tree up to date with the current root index.
+
+        Args:
+            profile: Time the phases of the update into ``profile``, see
+                :mod:`rmapy.profiler`.
+            root_hash: The current root hash, if the caller fetched it
+                already.
+
+        Returns:
+            The items that were created and removed. A changed item is
+            both: its new version is created and its old one removed.
+        """
+        self.profile = TraversalProfile() if profile else None
+        with phase(self.profile, "root_hash"):
+            new_hash = root_hash or self.client.get_root_hash()
+        if self.hash == new_hash:
+            return [], []
+        with phase(self.profile, "root_index"):
+            new_list_blob = self.client.get_blob(new_hash)
         all_hashes = set()
+        existing = []
         documents = []
         collections = {}
         
         def _traverse_tree(nodes: List[DocumentOrCollection]):
             for node in nodes:
                 all_hashes.add(node.hash)
+                existing.append(node)
                 if isinstance(node, Collection):
                     _traverse_tree(node.contents)
                     collections[node.uuid] = node
                 else:
                     documents.append(node)
-        _traverse_tree(self.contents)
-        
         new_hashes = set()
         creates = []
-        
-        for file_meta in new_list_blob.files:
-            new_hashes.add(file_meta.hash)
+
+        with phase(self.profile, "diff"):
+            _traverse_tree(self.contents)
+            for file_meta in new_list_blob.files:
+                new_hashes.add(file_meta.hash)
         
         # Process new files in parallel
-        with ThreadPoolExecutor(max_workers=THREADS) as executor:
-            future_to_file = {executor.submit(self._process_file_meta, file_meta): file_meta 
-                            for file_meta in new_list_blob.files 
-                            if file_meta.hash not in all_hashes}
-            
-            for future in concurrent.futures.as_completed(future_to_file):
-                result = future.result()
+        new_files = (file_meta for file_meta in new_list_blob.files
+                     if file_meta.hash not in all_hashes)
+        with phase(self.profile, "items"):
+            for result in self._process_all(new_files):
                 if result:
                     name, item = result
                     creates.append(item)
@@ -262,31 +612,78 @@ class RootFolder:
                     else:
                         collections[name] = item
 
-        self._organize_contents(documents, collections)
-
-        orphans = []
-        def _remove_orphans(parent: Optional[DocumentOrCollection], nodes: List[DocumentOrCollection]):
-            for node in nodes:
-                if isinstance(node, Collection):
-                    _remove_orphans(node, node.contents)
-                if node.hash not in new_hashes:
-                    log.info(f"Orphaned {node=}")
-                    orphans.append(node)
-                    if parent:
-                        parent.contents.remove(node)
-                    else:
-                        self.contents.remove(node)
+        # Items that were changed or deleted; changed ones were replaced
+        # by their new version above.
+        orphans = [node for node in existing if node.hash not in new_hashes]
+        documents = [d for d in documents if d.hash in new_hashes]
+        collections = {name: c for name, c in collections.items() if c.hash in new_hashes}
+        with phase(self.profile, "organize"):
+            # Placed again from scratch, so moves are picked up too.
+            for collection in collections.values():
+                collection.contents.clear()
+            self._organize_contents(documents, collections)
+        self.hash = new_hash
+        self.list_blob = new_list_blob
+        if self._views is not None:
+            self._views.update(creates, orphans)
 
-        _remove_orphans(None, self.contents)
         log.info(f"Reconcile complete: {creates=}, {orphans=}")
+        self._snapshot_complete()
+        self._profiled()
+        return creates, orphans
 
+    def copy(self) -> 'RootFolder':
+        """A copy of the tree that can be reconciled while this one stays in
+        use.
 
+        Documents are shared. Collections are copied, so that placing items
+        in the copy leaves the contents of this tree as they are.
+        """
+        replaced = []
 
+        def _copy(nodes: List[DocumentOrCollection]) -> List[DocumentOrCollection]:
+            result = []
+            for node in nodes:
+                if isinstance(node, Collection):
+                    copy = dataclasses.replace(node, contents=_copy(node.contents))
+                    replaced.append((node, copy))
+                    node = copy
+                result.append(node)
+            return result
+
+        root = RootFolder(client=self.client, hash=self.hash, list_blob=self.list_blob,
+                          contents=_copy(self.contents), lazy=True)
+        root._detached = self._detached
+        if self._views is not None:
+            root._views = self._views.copy()
+            root._views.update([copy for _, copy in replaced], [node for node, _ in replaced])
+        return root
+
+    def query(self, pattern: str = "/**", where=None, kind: Optional[str] = None,
+              **fields) -> Iterator[Tuple[str, 'DocumentOrCollection']]:
+        """Yields the path and item of everything in the tree matching a
+        path glob and predicates. See :func:`rmapy.query.query`."""
+        from .query import query
+        return query(self, pattern, where, kind, **fields)
 
+    @property
+    def views(self) -> 'SortedViews': # type: ignore
+        """Recent, pinned and per-folder orderings of the tree, built on
+        first use and kept up to date by :meth:`reconcile`. See
+        :class:`rmapy.views.SortedViews`."""
+        if self._views is None:
+            from .views import SortedViews
+            nodes = []
+
+            def _walk(items: List[DocumentOrCollection]):
+                for node in items:
+                    nodes.append(node)
+                    if isinstance(node, Collection):
+                        _walk(node.contents)
+            _walk(self.contents)
+            self._views = SortedViews(nodes)
+        return self._views
 
 
-
-            
-
 AbstractBlob = Union[FileMetaBlob, FileMetaListBlob, RawFileBlob, RawJsonBlob]
 DocumentOrCollection = Union[Document, Collection]
\ No newline at end of file
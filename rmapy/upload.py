@@ -0,0 +1,299 @@
+"""Uploading documents through the sync/v3 blob API.
+
+On the server a document is a set of blobs addressed by their sha256, its
+metadata, content, pages, pdf and so on, listed by an index blob that the
+root index points to. :class:`Uploader` splits a
+:class:`rmapy.document.ZipDocument` into those blobs and, on the upload
+threads, reads and hashes them chunk by chunk. Blobs listed by the current version of the document are
+skipped, large ones are first checked for on the server, and the rest are
+PUT concurrently. Only then are the document's index and a new root index
+written, and the root replaced at the generation it was based on::
+
+    result = client.upload(doc)
+    log.info(f"{len(result.uploaded)} blobs sent, {len(result.skipped)} skipped")
+
+So re-uploading a large pdf after a change to its metadata sends the new
+metadata, index and root index, and nothing else. If another device
+replaces the root in the meantime, the root index is rebuilt on top of its
+version and the upload retried.
+"""
+from dataclasses import dataclass, field
+from functools import partial
+from logging import getLogger
+from typing import IO, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from . import codec
+from .exceptions import ApiError, RootConflict
+from .scheduler import current_priority, priority
+from .types import _iter_bounded
+
+if TYPE_CHECKING:
+    from .api import Client
+    from .document import ZipDocument
+
+log = getLogger("rmapy")
+
+SCHEMA_VERSION = "3"
+DOCUMENT_INDEX_TYPE = "0"
+ROOT_INDEX_TYPE = "80000000"
+
+TEXT_TYPE = "text/plain; charset=UTF-8"
+BINARY_TYPE = "application/octet-stream"
+CHUNK_SIZE = 1 << 20
+
+
+@dataclass
+class Component:
+    """A blob of a document, given as data or as a stream to read it from."""
+    name: str
+    data: Optional[bytes] = field(default=None, repr=False)
+    content_type: str = BINARY_TYPE
+    hash: Optional[str] = None
+    stream: Optional[IO[bytes]] = field(default=None, repr=False)
+
+    @property
+    def size(self) -> int:
+        if self.data is None:
+            self.digest()
+        return len(self.data)
+
+    def digest(self) -> str:
+        """The sha256 of the blob; a stream is read, and hashed, a chunk at
+        a time."""
+        if self.hash is None:
+            import hashlib
+            sha256 = hashlib.sha256()
+            if self.stream is not None:
+                if self.stream.seekable():
+                    self.stream.seek(0)
+                chunks = []
+                for chunk in iter(partial(self.stream.read, CHUNK_SIZE), b""):
+                    sha256.update(chunk)
+                    chunks.append(chunk)
+                self.data = b"".join(chunks)
+                self.stream = None
+            else:
+                sha256.update(self.data)
+            self.hash = sha256.hexdigest()
+        return self.hash
+
+
+@dataclass
+class UploadResult:
+    uuid: str
+    # The hash of the document's index.
+    hash: str
+    root_hash: str
+    # The names of the blobs sent, and of those the server already had.
+    uploaded: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    bytes: int = 0
+
+
+def _metadata(doc: 'ZipDocument') -> dict:
+    metadata = dict(doc.metadata)
+    # ZipDocument spells it the way the old API did.
+    if "VissibleName" in metadata:
+        metadata.setdefault("visibleName", metadata.pop("VissibleName"))
+    return metadata
+
+
+def components(doc: 'ZipDocument') -> List[Component]:
+    """The blobs of doc, named the way :meth:`ZipDocument.dump` names the
+    files of the zip, not read from their streams or hashed yet."""
+
+    _id = doc.ID
+    parts = [
+        Component(f"{_id}.metadata", codec.dumps(_metadata(doc)), TEXT_TYPE),
+        Component(f"{_id}.content", codec.dumps(doc.content), TEXT_TYPE),
+        Component(f"{_id}.pagedata", doc.pagedata.encode("utf-8")
+                  if isinstance(doc.pagedata, str) else doc.pagedata, TEXT_TYPE),
+    ]
+    if doc.pdf:
+        parts.append(Component(f"{_id}.pdf", content_type="application/pdf", stream=doc.pdf))
+    if doc.epub:
+        parts.append(Component(f"{_id}.epub", content_type="application/epub+zip",
+                               stream=doc.epub))
+    for highlight in doc.highlights:
+        parts.append(Component(f"{_id}.highlights/{highlight.page_id}.json",
+                               codec.dumps(highlight.highlight_data), TEXT_TYPE))
+    for page in doc.rm:
+        parts.append(Component(f"{_id}/{page.order}.rm", stream=page.page))
+        parts.append(Component(f"{_id}/{page.order}-metadata.json",
+                               codec.dumps(page.metadata), TEXT_TYPE))
+        thumbnail = getattr(page, "thumbnail", None)
+        if thumbnail is not None:
+            parts.append(Component(f"{_id}.thumbnails/{page.order}.jpg",
+                                   content_type="image/jpeg", stream=thumbnail))
+    return parts
+
+
+def index_line(_hash: str, _type: str, name: str, count: int, size: int) -> str:
+    return f"{_hash}:{_type}:{name}:{count}:{size}"
+
+
+def build_index(lines: List[str]) -> bytes:
+    """An index blob of the given lines, sorted so that the same entries
+    always give the same hash."""
+    lines = sorted(lines, key=lambda line: line.split(":")[2])
+    return "\n".join([SCHEMA_VERSION] + lines).encode() + b"\n"
+
+
+class Uploader(object):
+    """Uploads documents, sending only the blobs the server doesn't have.
+
+    Args:
+        client: The client to upload with.
+        executor: Runs the hashing and the PUTs. Each upload uses its own
+            thread pool if not given.
+        probe_size: Blobs at least this many bytes that aren't listed by
+            the current version of the document are looked for on the
+            server before they are sent.
+        attempts: How many times the root is replaced before giving up
+            when other devices keep changing it.
+    """
+
+    def __init__(self, client: 'Client', executor=None, probe_size: int = 1 << 20,
+                 attempts: int = 5):
+        self.client = client
+        self.executor = executor if executor is not None else client.executor
+        self.probe_size = probe_size
+        self.attempts = attempts
+
+    def _url(self, path: str) -> str:
+        return f"{self.client.tectonic_url}/sync/v3/{path}"
+
+    def _root_entries(self) -> Tuple[str, Optional[int], Dict[str, str]]:
+        """The current root hash, its generation and the lines of its index
+        by uuid."""
+        root_hash = self.client.get_root_hash()
+        generation = self.client._generation
+        raw = self.client.get_raw_blob(root_hash) if root_hash else None
+        if raw is None:
+            return root_hash, generation, {}
+        lines = raw.decode("utf-8").splitlines()[1:]
+        return root_hash, generation, {line.split(":")[2]: line for line in lines if line}
+
+    def _known(self, entry: Optional[str]) -> Set[str]:
+        """The hashes of the blobs listed by the document's index on the
+        server."""
+        if entry is None:
+            return set()
+        raw = self.client.get_raw_blob(entry.split(":")[0])
+        if raw is None:
+            return set()
+        return {line.split(":")[0] for line in raw.decode("utf-8").splitlines()[1:] if line}
+
+    def _exists(self, _hash: str) -> bool:
+        response = self.client.request("HEAD", self._url(f"files/{_hash}"))
+        return response.ok
+
+    def _put(self, component: Component) -> None:
+        response = self.client.request("PUT", self._url(f"files/{component.hash}"),
+                                       data=component.data,
+                                       headers={"Content-Type": component.content_type,
+                                                "rm-filename": component.name})
+        if not response.ok:
+            raise ApiError(f"Can't upload {component.name}: {response.status_code}",
+                           response=response)
+        if self.client.blob_cache is not None and component.content_type == TEXT_TYPE:
+            # It's about to be read back by the next traversal.
+            self.client.blob_cache.put(component.hash, component.content_type, component.data)
+
+    def _send(self, component: Component, known: Set[str]) -> bool:
+        """Hash component and send it unless the server has it; whether it
+        was sent."""
+        component.digest()
+        if component.hash in known:
+            return False
+        if component.size >= self.probe_size and self._exists(component.hash):
+            return False
+        self._put(component)
+        return True
+
+    def upload(self, doc: 'ZipDocument') -> UploadResult:
+        """Upload doc, replacing the version on the server if there is one.
+
+        Raises:
+            ApiError: The client is offline, or a blob or the root couldn't
+                be written.
+            RootConflict: The root kept changing on the server.
+        """
+
+        if self.client.offline:
+            # A root read from the snapshot may be stale; replacing it would
+            # drop whatever changed since.
+            raise ApiError(f"Can't upload {doc.ID} in offline mode {self.client.offline!r}")
+        root_hash, generation, entries = self._root_entries()
+        known = self._known(entries.get(doc.ID))
+        parts = components(doc)
+        level = current_priority()
+
+        def send(component: Component) -> Tuple[Component, bool]:
+            with priority(level):
+                return component, self._send(component, known)
+
+        result = UploadResult(uuid=doc.ID, hash="", root_hash=root_hash)
+        for component, sent in _iter_bounded(send, parts, executor=self.executor):
+            if sent:
+                result.uploaded.append(component.name)
+                result.bytes += component.size
+            else:
+                result.skipped.append(component.name)
+
+        index = Component(f"{doc.ID}.index", build_index([
+            index_line(c.hash, DOCUMENT_INDEX_TYPE, c.name, 0, c.size) for c in parts]),
+            TEXT_TYPE)
+        result.hash = index.digest()
+        entry = index_line(index.hash, ROOT_INDEX_TYPE, doc.ID, len(parts),
+                           sum(c.size for c in parts))
+        if entries.get(doc.ID) == entry:
+            log.info(f"{doc.ID} is up to date")
+            return result
+
+        self._put(index)
+        root = self._replace_root(generation, entries, doc.ID, entry)
+        result.root_hash = root.hash
+        for blob in (index, root):
+            result.uploaded.append(blob.name)
+            result.bytes += blob.size
+        metrics = self.client.metrics
+        metrics.incr("upload_bytes", result.bytes)
+        metrics.incr("upload_skipped_blobs", len(result.skipped))
+        log.info(f"Uploaded {doc.ID}: {len(result.uploaded)} blobs, {result.bytes} bytes, "
+                 f"{len(result.skipped)} skipped")
+        return result
+
+    def _replace_root(self, generation: Optional[int], entries: Dict[str, str], _id: str,
+                      entry: str) -> Component:
+        """Point the root at entry for _id, rebuilding it on top of the
+        current root whenever another device replaced it first.
+
+        Returns:
+            The new root index.
+        """
+
+        for attempt in range(self.attempts):
+            if attempt:
+                _, generation, entries = self._root_entries()
+            entries[_id] = entry
+            root = Component("root.docSchema", build_index(list(entries.values())), TEXT_TYPE)
+            root.digest()
+            self._put(root)
+            response = self.client.request("PUT", self._url("root"), body={
+                "hash": root.hash,
+                "generation": generation,
+                "broadcast": True,
+            })
+            if response.status_code == 412:
+                log.info(f"Root changed while uploading {_id}, retrying")
+                self.client.metrics.incr("upload_root_conflicts")
+                continue
+            if not response.ok:
+                raise ApiError(f"Can't update the root: {response.status_code}",
+                               response=response)
+            j = codec.loads(response.content) if response.content else {}
+            self.client._root = (root.hash, None)
+            self.client._generation = j.get("generation")
+            return root
+        raise RootConflict(f"The root kept changing while uploading {_id}")
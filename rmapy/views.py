@@ -0,0 +1,175 @@
+"""Sorted views of a library, maintained incrementally.
+
+Screens like "recently opened" or a folder sorted by date need the items of
+the tree in some order. :class:`SortedViews` keeps them in sorted lists,
+with timestamps parsed once, so those screens cost a slice rather than a
+sort of the whole library. :meth:`rmapy.types.RootFolder.reconcile` updates
+them in place with the items that were created or removed::
+
+    root.views.recent(20)                       # recently opened documents
+    root.views.recent(20, by="lastModified")
+    root.views.pinned()
+    root.views.children(folder.uuid, by="lastModified")
+"""
+from bisect import bisect_left, insort
+from logging import getLogger
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .types import Collection, Document, DocumentOrCollection
+
+log = getLogger("rmapy")
+
+TIME_ORDERS = ("lastOpened", "lastModified")
+ORDERS = ("name",) + TIME_ORDERS
+
+# parentUuid of trashed items, which are not part of the tree.
+TRASH = "trash"
+
+Key = Tuple
+
+
+def timestamp(value) -> int:
+    """A timestamp field of the metadata as milliseconds since the epoch, 0
+    if it is missing."""
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _sort_key(node: DocumentOrCollection, order: str) -> Key:
+    """The key of node in children(), folders first, then by order.
+    Times sort newest first."""
+    folder = 0 if isinstance(node, Collection) else 1
+    if order == "name":
+        return (folder, (node.visibleName or "").casefold(), node.uuid)
+    return (folder, -timestamp(getattr(node, order)), node.uuid)
+
+
+class SortedViews(object):
+    """Documents by time, pinned items and the children of every folder,
+    each in a sorted list.
+
+    Args:
+        nodes: Every document and collection of the tree.
+    """
+
+    def __init__(self, nodes: Iterable[DocumentOrCollection] = ()):
+        self._lock = Lock()
+        self._nodes: Dict[str, DocumentOrCollection] = {}
+        # The keys a node was inserted with, to remove it by the same keys
+        # even if it changed since.
+        self._keys: Dict[str, Dict[str, Key]] = {}
+        self._recent: Dict[str, List[Key]] = {order: [] for order in TIME_ORDERS}
+        self._pinned: List[Key] = []
+        self._by_parent: Dict[str, Set[str]] = {}
+        # (parent uuid, order) to the sorted keys of its children. Built
+        # per folder on first use.
+        self._children: Dict[Tuple[str, str], List[Key]] = {}
+        for node in nodes:
+            self._add(node, sort=False)
+        for keys in self._recent.values():
+            keys.sort()
+        self._pinned.sort()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _add(self, node: DocumentOrCollection, sort: bool = True) -> None:
+        if node.parentUuid == TRASH:
+            return
+        if node.uuid in self._nodes:
+            self._remove(self._nodes[node.uuid])
+        keys: Dict[str, Key] = {order: _sort_key(node, order) for order in ORDERS}
+        keys["parent"] = (node.parentUuid or "",)
+        add = insort if sort else list.append
+        if isinstance(node, Document):
+            for order in TIME_ORDERS:
+                add(self._recent[order], keys[order][1:])
+        if node.pinned:
+            add(self._pinned, keys["name"])
+        for order in ORDERS:
+            children = self._children.get((keys["parent"][0], order))
+            if children is not None:
+                insort(children, keys[order])
+        self._by_parent.setdefault(keys["parent"][0], set()).add(node.uuid)
+        self._nodes[node.uuid] = node
+        self._keys[node.uuid] = keys
+
+    def _remove(self, node: DocumentOrCollection) -> None:
+        if self._nodes.get(node.uuid) is not node:
+            return
+        del self._nodes[node.uuid]
+        keys = self._keys.pop(node.uuid)
+        self._by_parent[keys["parent"][0]].discard(node.uuid)
+        if isinstance(node, Document):
+            for order in TIME_ORDERS:
+                _discard(self._recent[order], keys[order][1:])
+        _discard(self._pinned, keys["name"])
+        for order in ORDERS:
+            children = self._children.get((keys["parent"][0], order))
+            if children is not None:
+                _discard(children, keys[order])
+
+    def copy(self) -> 'SortedViews':
+        """An independent copy, sharing the items."""
+        with self._lock:
+            views = SortedViews()
+            views._nodes = dict(self._nodes)
+            views._keys = dict(self._keys)
+            views._recent = {order: list(keys) for order, keys in self._recent.items()}
+            views._pinned = list(self._pinned)
+            views._by_parent = {parent: set(uuids) for parent, uuids in self._by_parent.items()}
+            views._children = {key: list(keys) for key, keys in self._children.items()}
+        return views
+
+    def update(self, added: Iterable[DocumentOrCollection] = (),
+               removed: Iterable[DocumentOrCollection] = ()) -> None:
+        """Remove and add items, e.g. the orphans and creates of a
+        reconcile. A changed item is removed in its old version and added
+        in its new one."""
+        with self._lock:
+            for node in removed:
+                self._remove(node)
+            for node in added:
+                self._add(node)
+
+    def recent(self, k: int = 20, by: str = "lastOpened") -> List[Document]:
+        """The k documents opened, or modified, most recently."""
+        if by not in TIME_ORDERS:
+            raise ValueError(f"Unknown order: {by}")
+        with self._lock:
+            return [self._nodes[uuid] for _, uuid in self._recent[by][:k]]
+
+    def pinned(self) -> List[DocumentOrCollection]:
+        """Pinned documents and collections, by name, folders first."""
+        with self._lock:
+            return [self._nodes[key[-1]] for key in self._pinned]
+
+    def children(self, parent: Optional[str] = None, by: str = "name",
+                 k: Optional[int] = None) -> List[DocumentOrCollection]:
+        """The items in a folder, folders first.
+
+        Args:
+            parent: The uuid of the collection, or None for the root.
+            by: "name", or "lastOpened" or "lastModified" for the newest
+                first.
+            k: Return at most this many items.
+        """
+        if by not in ORDERS:
+            raise ValueError(f"Unknown order: {by}")
+        parent = parent or ""
+        with self._lock:
+            children = self._children.get((parent, by))
+            if children is None:
+                children = sorted(self._keys[uuid][by]
+                                  for uuid in self._by_parent.get(parent, ()))
+                self._children[(parent, by)] = children
+            return [self._nodes[key[-1]] for key in children[:k]]
+
+
+def _discard(keys: List[Key], key: Key) -> None:
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
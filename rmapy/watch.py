@@ -0,0 +1,166 @@
+"""Watching the library for changes.
+
+A :class:`Watcher` polls the root hash, conditionally where the server
+sends an ETag, so an unchanged library costs one small request per poll.
+Polls are frequent right after a change and back off while the library is
+idle. Only when the root hash changes is the new root index fetched and
+compared with the previous one by uuid and hash, giving the created,
+changed and deleted items without fetching any of them::
+
+    for change in client.watch():
+        log.info(f"{change.changed} changed")
+
+Given a traversed :class:`rmapy.types.RootFolder`, the tree is reconciled
+before each change is emitted. Without one, a watcher only ever holds the
+root index, so a single thread can watch many accounts by calling
+:meth:`Watcher.poll` on each watcher once it is :attr:`Watcher.due`.
+"""
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from logging import getLogger
+from typing import Callable, Dict, Iterator, List, Optional, TYPE_CHECKING
+
+from .scheduler import BACKGROUND, priority
+from .types import FileMetaListBlob, RootFolder
+
+if TYPE_CHECKING:
+    from .api import Client
+
+log = getLogger("rmapy")
+
+
+@dataclass
+class RootChange:
+    hash: str
+    previous: str
+    # The uuids of the items that were created, changed and deleted.
+    created: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    index: Optional[FileMetaListBlob] = field(default=None, repr=False)
+
+
+def diff_index(old: FileMetaListBlob, new: FileMetaListBlob) -> Dict[str, List[str]]:
+    """Compare two root indexes by uuid and hash."""
+    before = {f.name: f.hash for f in old.files}
+    diff: Dict[str, List[str]] = {"created": [], "changed": [], "deleted": []}
+    for f in new.files:
+        previous = before.pop(f.name, None)
+        if previous is None:
+            diff["created"].append(f.name)
+        elif previous != f.hash:
+            diff["changed"].append(f.name)
+    diff["deleted"] = list(before)
+    return diff
+
+
+class Watcher(object):
+    """Polls the root hash of an account with an adaptive interval.
+
+    Args:
+        client: The account to watch.
+        root: A traversed tree to reconcile on every change.
+        min_interval: Seconds between polls right after a change.
+        max_interval: Seconds between polls when idle for long.
+        backoff: Factor the interval grows by after every poll without a
+            change, or a failed one.
+        jitter: Fraction of the interval polls are randomly moved by, so
+            that many watchers don't poll in lockstep.
+    """
+
+    def __init__(self, client: 'Client', root: Optional[RootFolder] = None,
+                 min_interval: float = 2.0, max_interval: float = 60.0,
+                 backoff: float = 1.5, jitter: float = 0.1):
+        self.client = client
+        self.root = root
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.interval = min_interval
+        self.due = time.monotonic()
+        self._hash = root.hash if root is not None else None
+        self._index = root.list_blob if root is not None else None
+        self._callbacks: List[Callable[[RootChange], None]] = []
+
+    def subscribe(self, callback: Callable[[RootChange], None]) -> None:
+        """Call callback with every change found by poll()."""
+        self._callbacks.append(callback)
+
+    def _schedule(self, changed: bool) -> None:
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        delay = self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+        self.due = time.monotonic() + delay
+
+    def _index_of(self, root_hash: str) -> FileMetaListBlob:
+        index = self.client.get_blob(root_hash)
+        if not isinstance(index, FileMetaListBlob):
+            raise ValueError(f"{root_hash} is not a root index")
+        return index
+
+    def poll(self) -> Optional[RootChange]:
+        """Poll once, and return the change if the root hash changed.
+
+        The first poll of a watcher without a tree only records the current
+        root index.
+        """
+
+        try:
+            root_hash = self.client.get_root_hash()
+            if root_hash == self._hash:
+                self._schedule(False)
+                return None
+            if self._index is None:
+                self._hash, self._index = root_hash, self._index_of(root_hash)
+                self._schedule(False)
+                return None
+            if self.root is not None:
+                self.root.reconcile(root_hash=root_hash)
+                index = self.root.list_blob
+            else:
+                index = self._index_of(root_hash)
+        except Exception:
+            self._schedule(False)
+            raise
+
+        change = RootChange(hash=root_hash, previous=self._hash, index=index,
+                            **diff_index(self._index, index))
+        self._hash, self._index = root_hash, index
+        self._schedule(True)
+        log.info(f"Root changed to {root_hash}: {len(change.created)} created, "
+                 f"{len(change.changed)} changed, {len(change.deleted)} deleted")
+        for callback in self._callbacks:
+            try:
+                callback(change)
+            except Exception:
+                log.exception(f"Watch callback {callback} failed")
+        return change
+
+    def watch(self, stop: Optional[threading.Event] = None) -> Iterator[RootChange]:
+        """Poll until stop is set, yielding every change.
+
+        Failed polls are logged and retried after the backed off interval.
+        """
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            stop.wait(max(0.0, self.due - time.monotonic()))
+            if stop.is_set():
+                return
+            try:
+                with priority(BACKGROUND):
+                    change = self.poll()
+            except Exception as e:
+                log.warning(f"Watch poll failed, retrying in {self.interval:.0f}s: {e}")
+                metrics = getattr(self.client, 'metrics', None)
+                if metrics:
+                    metrics.incr("watch_errors")
+                continue
+            if change is not None:
+                yield change
+
+    __iter__ = watch
@@ -150,6 +150,9 @@ setup(
     # Similar to `install_requires` above, these must be valid existing
     # projects.
     extras_require={  # Optional
+        'fast': [
+            'orjson',
+        ],
         'doc': [
             'sphinx==2.2.0',
             'sphinx-autodoc-typehints==1.8.0',
@@ -180,12 +183,11 @@ setup(
     #
     # For example, the following would provide a command called `sample` which
     # executes the function `main` from this package when invoked:
-    # TODO Create a command line tool
-    # entry_points={  # Optional
-    #     'console_scripts': [
-    #         'sample=sample:main',
-    #     ],
-    # },
+    entry_points={  # Optional
+        'console_scripts': [
+            'rmapy=rmapy.cli:main',
+        ],
+    },
 
     # List additional URLs that are relevant to your project as a dict.
     #
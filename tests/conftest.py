@@ -0,0 +1,122 @@
+import hashlib
+import threading
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from rmapy import codec
+from rmapy.api import Client
+from rmapy.retry import RetryPolicy
+
+
+def _response(url, status, content=b"", content_type="text/plain; charset=UTF-8"):
+    r = requests.Response()
+    r.status_code = status
+    r._content = content
+    r.headers["content-type"] = content_type
+    r.url = url
+    return r
+
+
+class Cloud(object):
+    """An in-memory sync API, used as a client transport.
+
+    Serves the root and the blobs, takes blob and root uploads, and
+    answers a root replaced at a stale generation with 412.
+    """
+
+    def __init__(self):
+        self.blobs = {}
+        self.root = ""
+        self.generation = 0
+        self.requests = []
+        # Roots replaced by "another device" before each of the next PUTs
+        # of the root.
+        self.races = 0
+        self._lock = threading.Lock()
+
+    def put(self, content: bytes) -> str:
+        _hash = hashlib.sha256(content).hexdigest()
+        self.blobs[_hash] = content
+        return _hash
+
+    def index(self, *lines: str) -> str:
+        return self.put(("3\n" + "".join(f"{line}\n" for line in lines)).encode())
+
+    def set_root(self, _hash: str) -> None:
+        with self._lock:
+            self.root = _hash
+            self.generation += 1
+
+    def add(self, uuid: str, metadata: dict, files=()) -> str:
+        """Add an item with files, (name, content) pairs, to the root and
+        return its index line."""
+        meta = codec.dumps(metadata)
+        lines = [f"{self.put(meta)}:0:{uuid}.metadata:0:{len(meta)}"]
+        lines += [f"{self.put(content)}:0:{uuid}{name}:0:{len(content)}" for name, content in files]
+        index = self.index(*lines)
+        entry = f"{index}:80000000:{uuid}:{len(lines)}:0"
+        entries = self.entries()
+        entries[uuid] = entry
+        self.set_root(self.index(*entries.values()))
+        return entry
+
+    def remove(self, uuid: str) -> None:
+        entries = self.entries()
+        del entries[uuid]
+        self.set_root(self.index(*entries.values()))
+
+    def entries(self) -> dict:
+        if not self.root:
+            return {}
+        lines = self.blobs[self.root].decode().splitlines()[1:]
+        return {line.split(":")[2]: line for line in lines}
+
+    def paths(self, method: str) -> list:
+        return [path for m, path in self.requests if m == method]
+
+    def request(self, method, url, json=None, data=None, headers=None, **kwargs):
+        path = urlsplit(url).path
+        with self._lock:
+            self.requests.append((method, path))
+        if path == "/sync/v4/root" and method == "GET":
+            body = {"hash": self.root, "generation": self.generation}
+            return _response(url, 200, codec.dumps(body), "application/json")
+        if path == "/sync/v3/root" and method == "PUT":
+            with self._lock:
+                if self.races:
+                    self.races -= 1
+                    self.generation += 1
+                if json["generation"] != self.generation or json["hash"] not in self.blobs:
+                    return _response(url, 412)
+                self.root = json["hash"]
+                self.generation += 1
+                body = {"hash": self.root, "generation": self.generation}
+            return _response(url, 200, codec.dumps(body))
+        if path.startswith("/sync/v3/files/"):
+            _hash = path.rsplit("/", 1)[1]
+            if method == "PUT":
+                if hashlib.sha256(data).hexdigest() != _hash:
+                    return _response(url, 400)
+                self.blobs[_hash] = data
+                return _response(url, 200)
+            content = self.blobs.get(_hash)
+            if content is None:
+                return _response(url, 404)
+            return _response(url, 200, b"" if method == "HEAD" else content)
+        return _response(url, 404)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def cloud():
+    return Cloud()
+
+
+@pytest.fixture
+def client(cloud):
+    return Client(transport=cloud, token_set={"devicetoken": "", "usertoken": ""},
+                  retry_policy=RetryPolicy(total=0))
@@ -0,0 +1,22 @@
+import pytest
+
+from rmapy.types import FileMetaListBlob, RawFileBlob, RawJsonBlob
+
+
+@pytest.mark.parametrize("content", [
+    b"\xff\xfe\x00binary",
+    "caf\xe9\nau lait\n".encode("latin-1"),
+    b"3\n\x80",
+])
+def test_text_blobs_that_are_not_utf8(cloud, client, content):
+    blob = client.get_blob(cloud.put(content))
+    assert isinstance(blob, RawFileBlob)
+    assert blob.content == content
+
+
+def test_text_blobs(cloud, client):
+    index = client.get_blob(cloud.index(f"{'a' * 64}:0:doc.content:0:12"))
+    assert isinstance(index, FileMetaListBlob)
+    assert [(f.hash, f.name, f.size) for f in index.files] == [("a" * 64, "doc.content", "12")]
+    assert isinstance(client.get_blob(cloud.put(b'{"a": 1}')), RawJsonBlob)
+    assert client.get_blob(cloud.put(b"plain\ntext")).content == b"plain\ntext"
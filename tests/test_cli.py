@@ -0,0 +1,49 @@
+import json
+
+import pytest
+import requests
+
+from rmapy import cli
+
+
+def test_errors_print_one_line_and_fail(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    (tmp_path / ".rmapi").write_text("devicetoken: abc\nusertoken: def\n")
+    # Offline, with an empty store: there is no snapshot to read.
+    status = cli.main(["--offline", "--store", str(tmp_path / "store"), "ls"])
+    assert status == 1
+    err = capsys.readouterr().err.splitlines()
+    assert err[0].startswith("rmapy: No snapshot in")
+    assert json.loads(err[1])["status"] == 1
+
+
+@pytest.mark.parametrize("error", [requests.ConnectionError("down"), requests.Timeout("slow")])
+def test_network_errors_print_one_line_and_fail(tmp_path, monkeypatch, capsys, error):
+    def request(self, method, url, **kwargs):
+        raise error
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    (tmp_path / ".rmapi").write_text("devicetoken: abc\nusertoken: def\n")
+    monkeypatch.setattr(requests.Session, "request", request)
+    monkeypatch.setattr("rmapy.retry.RetryPolicy.delay", lambda *args, **kwargs: None)
+    status = cli.main(["--store", str(tmp_path / "store"), "ls"])
+    assert status == 1
+    err = capsys.readouterr().err.splitlines()
+    assert err[0] == f"rmapy: {error}"
+    assert json.loads(err[1])["status"] == 1
+
+
+def test_get_file_skips_missing_blobs(tmp_path):
+    from rmapy.store import BlobStore
+
+    class Client(object):
+        def get_raw_blob(self, _hash):
+            return None
+
+    class FileMeta(object):
+        client = Client()
+        hash = "ab" * 32
+        name = "doc.pdf"
+
+    assert cli._get_file(BlobStore(str(tmp_path)), FileMeta(), str(tmp_path)) is None
+    assert not (tmp_path / "doc.pdf").exists()
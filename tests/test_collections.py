@@ -0,0 +1,125 @@
+import pytest
+
+from rmapy.collections import Collection
+from rmapy.document import Document
+from rmapy.exceptions import FolderNotFound
+from rmapy.folder import Folder
+from rmapy.types import Collection as TreeCollection
+from rmapy.types import Document as TreeDocument
+from rmapy.types import FileMetaListBlob, RawJsonBlob, RootFolder
+
+
+def _ids(items):
+    return [item.id for item in items]
+
+
+def _scan_children(collection, folder=None):
+    """children() as the collection used to compute it."""
+    return [i for i in collection.items if i.parent == (folder.id if folder else "")]
+
+
+@pytest.fixture
+def collection():
+    collection = Collection(Folder(id="work", name="Work"))
+    collection.add_all([
+        {"id": "a", "type": "DocumentType", "parent": "work", "visibleName": "alpha"},
+        {"id": "home", "type": "CollectionType", "visibleName": "Home"},
+        Document(id="b", parent=""),
+        Document(id="c", parent="work"),
+    ])
+    return collection
+
+
+def test_lookup(collection):
+    work = collection.get("work")
+    assert isinstance(work, Folder) and work.visibleName == "Work"
+    assert _ids(collection.children()) == ["work", "home", "b"]
+    assert _ids(collection.children(work)) == ["a", "c"]
+    assert collection.parent(collection.get("a")) is work
+    assert collection.get("missing") is None
+    assert collection.get("a") in collection
+    assert Document(id="a", parent="work") not in collection
+    assert _ids(collection) == ["work", "a", "home", "b", "c"]
+    assert len(collection) == 5 and collection[1].id == "a"
+
+
+@pytest.mark.parametrize("parent", ["", "missing", "b"])
+def test_parent_must_be_a_folder(collection, parent):
+    with pytest.raises(FolderNotFound):
+        collection.parent(Document(id="x", parent=parent))
+
+
+def test_add_keeps_order_and_duplicates(collection):
+    first = collection.get("a")
+    collection.add({"id": "a", "type": "DocumentType", "parent": "home"})
+    assert len(collection) == 6
+    assert collection.get("a") is first
+    assert _ids(collection.children(collection.get("home"))) == ["a"]
+    assert _ids(collection.children(collection.get("work"))) == ["a", "c"]
+    with pytest.raises(TypeError):
+        collection.add({"id": "x", "type": "Unknown"})
+
+
+def test_remove(collection):
+    first = collection.get("a")
+    collection.add({"id": "a", "type": "DocumentType", "parent": "home"})
+    collection.remove(first)
+    assert first not in collection
+    assert collection.get("a").parent == "home"
+    assert _ids(collection.children(collection.get("work"))) == ["c"]
+    collection.remove(collection.get("a"))
+    assert collection.get("a") is None
+    with pytest.raises(ValueError):
+        collection.remove(first)
+
+
+def test_items_changed_in_place(collection):
+    work = collection.get("work")
+    collection.children(work)
+    collection.items.remove(collection.get("c"))
+    collection.items.insert(0, Document(id="d", parent="work"))
+    collection.items[-1] = Folder(id="e", parent="work")
+    collection.items.append(Document(id="f", parent="work"))
+    assert _ids(collection.children(work)) == _ids(_scan_children(collection, work)) == [
+        "d", "a", "e", "f"]
+    assert collection.get("b") is None and collection.parent(collection.get("f")) is work
+    collection.items = [Document(id="g", parent="")]
+    assert _ids(collection.children()) == ["g"] and collection.get("a") is None
+
+
+def test_matches_a_scan(collection):
+    for i in range(50):
+        parent = ["", "work", "home", f"f{i // 2}"][i % 4]
+        if i % 3:
+            collection.add_item(Document(id=f"d{i}", parent=parent))
+        else:
+            collection.add_folder({"id": f"f{i}", "parent": parent})
+    for item in list(collection)[::4]:
+        collection.remove(item)
+    for folder in [None] + [i for i in collection if isinstance(i, Folder)]:
+        assert collection.children(folder) == _scan_children(collection, folder)
+
+
+def test_from_root():
+    def meta(name, parent):
+        return RawJsonBlob(json={"visibleName": name, "parent": parent, "pinned": True,
+                                 "lastModified": "5"})
+
+    document = TreeDocument(uuid="a", hash="ha", meta_blob=meta("alpha", "work"),
+                            meta_list_blob=FileMetaListBlob(files=[]))
+    work = TreeCollection(uuid="work", hash="hw", meta_blob=meta("Work", ""),
+                          contents=[document])
+    root = RootFolder(hash="root", list_blob=FileMetaListBlob(files=[]), lazy=True,
+                      contents=[work])
+    collection = Collection.from_root(root)
+    folder = collection.get("work")
+    assert isinstance(folder, Folder) and folder.visibleName == "Work" and folder.pinned
+    assert _ids(collection.children(folder)) == ["a"]
+    item = collection.get("a")
+    assert isinstance(item, Document)
+    assert (item.hash, item.lastModified, item.fileType) == ("ha", "5", "")
+    assert collection.parent(item) is folder
+
+    collection.add_item(TreeDocument(uuid="b", hash="hb", meta_blob=meta("beta", ""),
+                                     meta_list_blob=FileMetaListBlob(files=[])))
+    assert _ids(collection.children()) == ["work", "b"]
@@ -0,0 +1,75 @@
+import pytest
+import yaml
+
+from rmapy import config
+
+FLAT = [
+    "devicetoken: eyJhbGciOiJIUzI1NiJ9.e30.abc-_",
+    "usertoken:",
+    "usertoken: ",
+    "count: -1",
+    "path: /a/b:c/d",
+    "url: https://host:443/x?y=1",
+    "question: ?x",
+    "colon: :x",
+    "words: a b  c",
+    "trailing: value   ",
+]
+
+MALFORMED = [
+    "a: -",
+    "a: - b",
+    "a: ? x",
+    "a: ?",
+    "a: :",
+    "a: : b",
+    "a: b\tc",
+    "a:\tb",
+    "a: b\t",
+    "a: ,x",
+    "a: [x]",
+    "a: {x: y}",
+    "a: 'x'",
+    'a: "x"',
+    "a: &x y",
+    "a: *x",
+    "a: !x y",
+    "a: |",
+    "a: >",
+    "a: b # c",
+    "a: b: c",
+    "a: b:",
+    "a:b",
+    "  a: b",
+]
+
+
+@pytest.mark.parametrize("line", FLAT)
+def test_flat_lines_parse_as_yaml_does(line):
+    assert config._parse_flat(line) == yaml.load(line, Loader=yaml.BaseLoader)
+
+
+@pytest.mark.parametrize("line", MALFORMED)
+def test_other_lines_are_left_to_yaml(line):
+    assert config._parse_flat(f"devicetoken: x\n{line}\n") is None
+
+
+def test_comments_and_blank_lines():
+    assert config._parse_flat("# rmapi\n\ndevicetoken: x\n\nusertoken: y\n") == {
+        "devicetoken": "x", "usertoken": "y"}
+
+
+def test_load_falls_back_to_yaml_and_caches(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(config, "_cache", {})
+    path = tmp_path / ".rmapi"
+    assert config.load() == {}
+
+    path.write_text("devicetoken: a\nusertoken: '- b'\n")
+    assert config.load() == {"devicetoken": "a", "usertoken": "- b"}
+    path.write_text("devicetoken: abc\nusertoken: 'x'\n")
+    assert config.load() == {"devicetoken": "abc", "usertoken": "x"}
+
+    # Changed files are parsed again, unchanged ones come from the cache.
+    monkeypatch.setattr(config, "_parse_flat", None)
+    assert config.load() == {"devicetoken": "abc", "usertoken": "x"}
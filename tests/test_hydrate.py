@@ -0,0 +1,75 @@
+import pytest
+
+from rmapy import codec
+from rmapy.types import _UNLOADED, Collection, hydrate_contents
+
+
+def _document(cloud, uuid, parent="", content=True):
+    files = [(".content", codec.dumps({"fileType": "pdf", "pageCount": 1, "tag": uuid}))]
+    cloud.add(uuid, {"visibleName": uuid, "type": "DocumentType", "parent": parent},
+              files if content else [])
+
+
+@pytest.fixture
+def root(cloud, client):
+    cloud.add("work", {"visibleName": "Work", "type": "CollectionType", "parent": ""})
+    for uuid in ["a", "b", "c", "d"]:
+        _document(cloud, uuid, "work")
+    _document(cloud, "bare", "work", content=False)
+    _document(cloud, "top")
+    root = client.get_root_folder()
+    cloud.requests.clear()
+    return root
+
+
+def _nodes(root):
+    work = next(n for n in root.contents if isinstance(n, Collection))
+    return work, {n.uuid: n for n in work.contents}
+
+
+def test_only_unfetched_documents_are_fetched(cloud, root):
+    work, nodes = _nodes(root)
+    assert hydrate_contents([nodes["a"]]) == 1
+    cloud.requests.clear()
+
+    documents = [work, nodes["a"], nodes["b"], nodes["b"], nodes["c"]]
+    assert hydrate_contents(documents) == 2
+    assert len(cloud.paths("GET")) == 2
+    assert nodes["b"]._content["tag"] == "b" and nodes["c"]._content["tag"] == "c"
+    # Untouched documents are left for later.
+    assert nodes["d"]._content is _UNLOADED
+
+    cloud.requests.clear()
+    assert hydrate_contents(documents) == 0
+    assert cloud.requests == []
+
+
+def test_documents_without_content(cloud, root):
+    _, nodes = _nodes(root)
+    assert hydrate_contents([nodes["bare"]]) == 1
+    assert nodes["bare"].content is None and nodes["bare"].fileType is None
+    assert hydrate_contents([nodes["bare"]]) == 0
+    assert cloud.requests == []
+
+
+def test_reading_a_field_hydrates_the_rest_of_the_folder(cloud, root):
+    work, nodes = _nodes(root)
+    hydrate_contents([nodes["a"]])
+    cloud.requests.clear()
+
+    assert nodes["b"].fileType == "pdf"
+    # b, c and d in one round; a was fetched already and bare has no .content.
+    assert len(cloud.paths("GET")) == 3
+    assert all(n._content["tag"] == n.uuid for n in work.contents if n.uuid != "bare")
+    top = next(n for n in root.contents if n.uuid == "top")
+    assert top._content is _UNLOADED
+
+    cloud.requests.clear()
+    assert [n.pageCount for n in work.contents if n.uuid != "bare"] == [1] * 4
+    assert cloud.requests == []
+
+
+def test_collection_hydrates_its_documents(cloud, root):
+    work, _ = _nodes(root)
+    assert work.hydrate_contents() == 5
+    assert len(cloud.paths("GET")) == 4
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from rmapy.live import LiveRootFolder
+
+ROOT_PATH = "/sync/v4/root"
+
+
+def _add(cloud, uuid, name):
+    cloud.add(uuid, {"visibleName": name, "type": "DocumentType", "parent": ""})
+
+
+def _uuids(root):
+    return sorted(node.uuid for node in root.contents)
+
+
+@pytest.fixture
+def library(cloud):
+    _add(cloud, "a", "alpha")
+    return cloud
+
+
+def test_background_refresh_swaps_in_the_new_tree(library, client):
+    changes = []
+    changed = threading.Event()
+
+    def on_change(root, created, removed):
+        changes.append((root, [n.uuid for n in created], [n.uuid for n in removed]))
+        changed.set()
+
+    live = LiveRootFolder(client, interval=60, on_change=on_change)
+    old = live.root
+    with live:
+        _add(library, "b", "beta")
+        library.remove("a")
+        live.poll_now()
+        assert changed.wait(5)
+    root, created, removed = changes[-1]
+    assert live.root is root
+    assert (created, removed) == (["b"], ["a"])
+    assert _uuids(root) == ["b"]
+    # Readers holding the old tree never see it change.
+    assert _uuids(old) == ["a"]
+    assert not live._thread
+
+
+def test_background_refresh_survives_errors(library, client):
+    live = LiveRootFolder(client, root=client.get_root_folder(), interval=60)
+    polled = threading.Event()
+
+    def request(method, url, **kwargs):
+        polled.set()
+        raise OSError("down")
+
+    client.transport = type("Down", (), {"request": staticmethod(request)})()
+    with live:
+        assert polled.wait(5)
+    assert client.metrics.snapshot()["live_refresh_errors"] == 1
+    assert _uuids(live.root) == ["a"]
+
+
+def test_root_is_served_without_polling(library, client):
+    live = LiveRootFolder(client, root=client.get_root_folder())
+    before = len(library.paths("GET"))
+    _add(library, "b", "beta")
+    assert _uuids(live.root) == ["a"]
+    assert len(library.paths("GET")) == before
+
+
+def test_max_age_polls_before_serving(library, client):
+    live = LiveRootFolder(client, root=client.get_root_folder(), max_age=0.05)
+    _add(library, "b", "beta")
+    assert _uuids(live.root) == ["a"]
+    time.sleep(0.1)
+    assert _uuids(live.root) == ["a", "b"]
+    assert live.age < 0.05
+    polls = library.paths("GET").count(ROOT_PATH)
+    assert _uuids(live.root) == ["a", "b"]
+    assert library.paths("GET").count(ROOT_PATH) == polls
+
+
+def test_refresh_respects_max_age(library, client):
+    live = LiveRootFolder(client, root=client.get_root_folder())
+    _add(library, "b", "beta")
+    assert not live.refresh(max_age=60)
+    assert live.refresh()
+    assert not live.refresh()
+
+
+def test_first_access_traverses_once(library, client):
+    request = library.request
+
+    def slow_request(method, url, **kwargs):
+        # Keeps the first traversal running while the other readers arrive.
+        time.sleep(0.02)
+        return request(method, url, **kwargs)
+
+    library.request = slow_request
+    live = LiveRootFolder(client)
+    barrier = threading.Barrier(8)
+    roots = []
+
+    def read():
+        barrier.wait()
+        roots.append(live.root)
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(roots) == 8
+    assert all(root is roots[0] for root in roots)
+    assert library.paths("GET").count(ROOT_PATH) == 1
@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+import requests
+
+from rmapy.pool import ClientPool, FairExecutor
+from rmapy.retry import RetryPolicy, endpoint
+
+ROOT_URL = "https://host/sync/v4/root"
+
+
+def test_fair_executor_serves_keys_in_turn():
+    executor = FairExecutor(1)
+    gate = threading.Event()
+    order = []
+    try:
+        # Holds the only worker until everything is queued.
+        blocker = executor.submit("gate", gate.wait)
+        futures = [executor.submit("a", order.append, f"a{i}") for i in range(4)]
+        futures += [executor.submit("b", order.append, f"b{i}") for i in range(2)]
+        gate.set()
+        blocker.result(1)
+        for future in futures:
+            future.result(1)
+    finally:
+        executor.shutdown()
+    assert order == ["a0", "b0", "a1", "b1", "a2", "a3"]
+
+
+def test_fair_executor_views_and_errors():
+    executor = FairExecutor(2)
+    try:
+        view = executor.view("a")
+        assert view.submit(sum, [1, 2]).result(1) == 3
+        with pytest.raises(ZeroDivisionError):
+            view.submit(lambda: 1 / 0).result(1)
+    finally:
+        executor.shutdown()
+    with pytest.raises(RuntimeError):
+        executor.submit("a", print)
+
+
+def _response(status):
+    r = requests.Response()
+    r.status_code = status
+    r._content = b""
+    r.url = ROOT_URL
+    return r
+
+
+class Transport(object):
+    def __init__(self, status):
+        self.status = status
+        self.requests = 0
+
+    def request(self, method, url, **kwargs):
+        self.requests += 1
+        return _response(self.status)
+
+
+@pytest.fixture
+def pool():
+    with ClientPool(workers=2) as pool:
+        yield pool
+
+
+def _client(pool, account, status):
+    client = pool.client(account, {"devicetoken": "", "usertoken": ""})
+    client.transport = Transport(status)
+    client.retry_policy = RetryPolicy(total=0)
+    return client
+
+
+def test_clients_are_per_account(pool):
+    alice = _client(pool, "alice", 200)
+    assert pool.client("alice") is alice
+    assert pool.client("bob", {"devicetoken": "", "usertoken": ""}) is not alice
+    assert len(pool) == 2
+    pool.remove("bob")
+    with pytest.raises(KeyError):
+        pool.client("bob")
+
+
+def test_throttled_account_does_not_open_the_circuit_for_others(pool):
+    alice, bob = _client(pool, "alice", 429), _client(pool, "bob", 200)
+    for _ in range(pool.breakers.threshold * 2):
+        assert alice.request("GET", ROOT_URL).status_code == 429
+    assert pool.breakers[endpoint(ROOT_URL)].state == "closed"
+    assert bob.request("GET", ROOT_URL).status_code == 200
+    assert bob.transport.requests == 1
+
+
+def test_outages_are_shared(pool):
+    from rmapy.exceptions import CircuitOpenError
+
+    alice, bob = _client(pool, "alice", 503), _client(pool, "bob", 200)
+    for _ in range(pool.breakers.threshold):
+        alice.request("GET", ROOT_URL)
+    with pytest.raises(CircuitOpenError):
+        bob.request("GET", ROOT_URL)
+    assert bob.transport.requests == 0
@@ -0,0 +1,104 @@
+import pytest
+
+from rmapy import codec
+from rmapy.api import Client
+from rmapy.prefetch import Prefetcher
+from rmapy.retry import RetryPolicy
+
+PAGES = [f"p{i}" for i in range(8)]
+
+
+@pytest.fixture
+def prefetcher():
+    # One thread, so that queued work runs in order.
+    prefetcher = Prefetcher(pages=2, workers=1)
+    yield prefetcher
+    prefetcher.close()
+
+
+@pytest.fixture
+def document(cloud, prefetcher):
+    files = [(".content", codec.dumps({"fileType": "notebook", "pages": PAGES}))]
+    for page in PAGES:
+        files.append((f"/{page}.rm", f"page {page}".encode()))
+        files.append((f".thumbnails/{page}.png", f"thumbnail {page}".encode()))
+    cloud.add("doc", {"visibleName": "Notes", "type": "DocumentType", "parent": "",
+                      "lastOpenedPage": 5}, files)
+    client = Client(transport=cloud, token_set={"devicetoken": "", "usertoken": ""},
+                    retry_policy=RetryPolicy(total=0), prefetcher=prefetcher)
+    document = client.get_root_folder().contents[0]
+    cloud.requests.clear()
+    return document
+
+
+def _settle(prefetcher):
+    """Wait for every plan and fetch queued so far."""
+    while True:
+        with prefetcher._lock:
+            barrier = prefetcher._submit(lambda: None)
+        barrier.result(5)
+        with prefetcher._lock:
+            if not prefetcher._pending:
+                return
+
+
+def _fetched(cloud, document):
+    """The files fetched. The page being read may race with its prefetch
+    and be fetched twice."""
+    names = {f.hash: f.name[len(document.uuid):].lstrip("/")
+             for f in document.meta_list_blob.files}
+    return sorted({names[path.rsplit("/", 1)[1]] for path in cloud.paths("GET")})
+
+
+def _pages(*indexes, content=False, thumbnails=True):
+    names = [f"{PAGES[i]}.rm" for i in indexes]
+    if thumbnails:
+        names += [f".thumbnails/{PAGES[i]}.png" for i in indexes]
+    if content:
+        names.append(".content")
+    return sorted(names)
+
+
+def test_reading_a_page_prefetches_the_next_ones(cloud, prefetcher, document):
+    assert document.get_page(0).content == b"page p0"
+    _settle(prefetcher)
+    assert _fetched(cloud, document) == _pages(0, 1, 2, content=True)
+
+    cloud.requests.clear()
+    assert document.get_page(1).content == b"page p1"
+    _settle(prefetcher)
+    assert _fetched(cloud, document) == _pages(3)
+
+
+def test_cached_pages_are_not_fetched_again(cloud, prefetcher, document):
+    document.get_page(0)
+    _settle(prefetcher)
+    cloud.requests.clear()
+    for page in range(3):
+        document.get_page(page)
+    _settle(prefetcher)
+    assert _fetched(cloud, document) == _pages(3, 4)
+
+
+def test_content_starts_at_the_last_opened_page(cloud, prefetcher, document):
+    assert document.content["pages"] == PAGES
+    _settle(prefetcher)
+    assert _fetched(cloud, document) == _pages(5, 6, 7, content=True)
+
+
+def test_content_keeps_the_current_page(cloud, prefetcher, document):
+    document.get_page(2)
+    _settle(prefetcher)
+    cloud.requests.clear()
+    assert document.content["fileType"] == "notebook"
+    _settle(prefetcher)
+    assert cloud.requests == []
+    assert prefetcher._positions[document.uuid] == 2
+
+
+def test_without_thumbnails(cloud, document):
+    prefetcher = document._client().prefetcher
+    prefetcher.thumbnails = False
+    document.get_page(6)
+    _settle(prefetcher)
+    assert _fetched(cloud, document) == _pages(6, 7, content=True, thumbnails=False)
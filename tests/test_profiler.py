@@ -0,0 +1,70 @@
+import json
+
+from rmapy.profiler import PHASES, TraversalProfile
+
+
+def test_profile_of_a_traversal(cloud, client):
+    cloud.add("work", {"visibleName": "Work", "type": "CollectionType", "parent": ""})
+    for i in range(5):
+        cloud.add(f"d{i}", {"visibleName": f"d{i}", "type": "DocumentType", "parent": "work"})
+
+    root = client.get_root_folder(profile=True)
+    report = json.loads(root.profile.to_json())
+    assert set(report["phases"]) == {"root_hash", "root_index", "items", "organize"}
+    assert {kind: stats["count"] for kind, stats in report["fetches"].items()} == {
+        "index": 6, "metadata": 6}
+    assert sum(worker["items"] for worker in report["workers"].values()) == 6
+    assert len(report["slowest"]) == 10
+    assert report["bound"] in ("cpu", "network")
+    assert report["total"] >= sum(p["wall"] for p in report["phases"].values()) * 0.99
+
+    assert client.get_root_folder().profile is None
+
+
+def test_reconcile_profile(cloud, client):
+    cloud.add("a", {"visibleName": "a", "type": "DocumentType", "parent": ""})
+    root = client.get_root_folder()
+    cloud.add("b", {"visibleName": "b", "type": "DocumentType", "parent": ""})
+    root.reconcile(profile=True)
+    report = root.profile.to_dict()
+    assert set(report["phases"]) <= set(PHASES)
+    assert "diff" in report["phases"]
+    assert report["fetches"]["index"]["count"] == 1
+
+
+def test_report():
+    profile = TraversalProfile(slowest=2)
+    for i, seconds in enumerate([0.003, 0.001, 0.004, 0.002]):
+        profile.fetch("index", f"h{i}", f"n{i}", seconds)
+    profile.fetch("metadata", "h9", "n9", 0.0005)
+    profile.item(queue_wait=0.5, busy=1.0, cpu=0.75)
+    with profile.phase("items"):
+        pass
+    profile.finish()
+
+    report = profile.to_dict()
+    assert report["fetches"] == {
+        "index": {"count": 4, "total": 0.01, "max": 0.004},
+        "metadata": {"count": 1, "total": 0.0005, "max": 0.0005},
+    }
+    assert [(e["hash"], e["seconds"]) for e in report["slowest"]] == [
+        ("h2", 0.004), ("h0", 0.003)]
+    assert list(report["workers"].values()) == [
+        {"items": 1, "queue_wait": 0.5, "busy": 1.0, "cpu": 0.75}]
+    assert report["bound"] == "cpu"
+
+    lines = profile.summary().splitlines()
+    assert lines[0].startswith("Traversal took") and lines[0].endswith("cpu bound")
+    assert lines[1].split()[0] == "items"
+    assert "index blobs" in lines[2] and "4 fetches, mean 2.5ms, max 4.0ms" in lines[2]
+    assert "1 workers: 1.000s busy, of which 0.750s cpu; 0.500s queued" in lines[4]
+    assert lines[5:] == ["  slowest fetches:",
+                         "         4.0ms index     n2 (h2)",
+                         "         3.0ms index     n0 (h0)"]
+
+
+def test_network_bound():
+    profile = TraversalProfile()
+    profile.item(queue_wait=0.0, busy=1.0, cpu=0.1)
+    assert profile.bound() == "network"
+    assert "slowest" not in profile.summary()
@@ -0,0 +1,92 @@
+import pytest
+
+from rmapy.query import PathPattern, query
+from rmapy.types import Collection, Document, FileMetaListBlob, RawJsonBlob, RootFolder
+
+
+def matches(pattern, path):
+    path_pattern = PathPattern(pattern)
+    states, matched = path_pattern.start(), False
+    for name in path.strip("/").split("/"):
+        if not states:
+            return False
+        states, matched = path_pattern.step(states, name)
+    return matched
+
+
+@pytest.mark.parametrize("pattern, path, expected", [
+    ("/a/b", "/a/b", True),
+    ("/a/b", "/a", False),
+    ("/a/b", "/a/b/c", False),
+    ("/a/*.pdf", "/a/x.pdf", True),
+    ("/a/?", "/a/xy", False),
+    ("/[ab]", "/b", True),
+    ("/**", "/a", True),
+    ("/**", "/a/b/c", True),
+    ("/a/**/c", "/a/c", True),
+    ("/a/**/c", "/a/b/b/c", True),
+    ("/a/**/c", "/a/b/d", False),
+    ("/**/c", "/c", True),
+    ("/a/**/**/c", "/a/c", True),
+    # A trailing ** needs at least one component.
+    ("/a/**", "/a", False),
+    ("/a/**", "/a/b", True),
+    ("/a/**", "/a/b/c", True),
+    ("/a/**", "/b/c", False),
+])
+def test_path_pattern(pattern, path, expected):
+    assert matches(pattern, path) is expected
+
+
+def test_consecutive_globstars_collapse():
+    assert PathPattern("/a/**/**/b").parts.count("**") == 1
+
+
+@pytest.mark.parametrize("pattern", ["", "/", "//"])
+def test_empty_pattern_matches_nothing(pattern):
+    assert PathPattern(pattern).start() == set()
+
+
+def test_dead_state_stops_early():
+    pattern = PathPattern("/a/b")
+    states, matched = pattern.step(pattern.start(), "x")
+    assert states == set() and not matched
+
+
+def _meta(name, **fields):
+    return RawJsonBlob(json=dict(visibleName=name, **fields))
+
+
+def _document(name, **fields):
+    return Document(uuid=name, hash=name, meta_blob=_meta(name, **fields),
+                    meta_list_blob=FileMetaListBlob(files=[]))
+
+
+@pytest.fixture
+def root():
+    work = Collection(uuid="work", hash="work", meta_blob=_meta("Work"), contents=[
+        _document("Notes", pinned=True),
+        Collection(uuid="old", hash="old", meta_blob=_meta("Old"),
+                   contents=[_document("Draft")]),
+    ])
+    return RootFolder(hash="root", list_blob=FileMetaListBlob(files=[]), lazy=True,
+                      contents=[work, _document("Todo")])
+
+
+def test_query_paths(root):
+    assert [path for path, _ in query(root)] == [
+        "/Work", "/Work/Notes", "/Work/Old", "/Work/Old/Draft", "/Todo"]
+    assert [path for path, _ in query(root, "/Work/**")] == [
+        "/Work/Notes", "/Work/Old", "/Work/Old/Draft"]
+    assert [path for path, _ in query(root, "/**/D*")] == ["/Work/Old/Draft"]
+    assert list(query(root, "")) == []
+
+
+def test_query_predicates(root):
+    assert [path for path, _ in query(root, kind="collection")] == ["/Work", "/Work/Old"]
+    assert [path for path, _ in query(root, pinned=True)] == ["/Work/Notes"]
+    assert [path for path, _ in query(root, visibleName=("Todo", "Draft"))] == [
+        "/Work/Old/Draft", "/Todo"]
+    assert [path for path, _ in query(root, where=lambda n: n.uuid == "old")] == ["/Work/Old"]
+    with pytest.raises(ValueError):
+        list(query(root, kind="folder"))
@@ -0,0 +1,82 @@
+import pytest
+
+from rmapy import ratelimit
+from rmapy.ratelimit import FileTokenBucket, RateLimiter, TokenBucket
+
+
+class Clock(object):
+    """Stands in for time.time and time.sleep."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, "time", clock.time)
+    monkeypatch.setattr(ratelimit.time, "sleep", clock.sleep)
+    return clock
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_rejects_non_positive_rate(rate, tmp_path):
+    with pytest.raises(ValueError):
+        TokenBucket(rate)
+    with pytest.raises(ValueError):
+        FileTokenBucket(str(tmp_path / "bucket"), rate)
+    with pytest.raises(ValueError):
+        RateLimiter(requests_per_second=rate)
+
+
+def test_burst_is_free_then_waits(clock):
+    bucket = TokenBucket(rate=10, capacity=5)
+    for _ in range(5):
+        assert bucket.acquire() == 0
+    assert bucket.acquire() == pytest.approx(0.1)
+    assert clock.slept == [pytest.approx(0.1)]
+
+
+def test_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=5)
+    for _ in range(5):
+        bucket.acquire()
+    clock.now += 60
+    for _ in range(5):
+        assert bucket.acquire() == 0
+    assert bucket.acquire() > 0
+
+
+def test_consume_goes_into_debt(clock):
+    bucket = TokenBucket(rate=100, capacity=100)
+    bucket.consume(300)
+    assert clock.slept == []
+    assert bucket.acquire(0) == pytest.approx(2.0)
+
+
+def test_file_bucket_shares_state(clock, tmp_path):
+    path = str(tmp_path / "bucket")
+    first = FileTokenBucket(path, rate=1, capacity=2)
+    second = FileTokenBucket(path, rate=1, capacity=2)
+    try:
+        assert first.acquire() == 0
+        assert second.acquire() == 0
+        assert first.acquire() == pytest.approx(1.0)
+    finally:
+        first.close()
+        second.close()
+
+
+def test_rate_limiter_charges_bandwidth_after_response(clock):
+    limiter = RateLimiter(requests_per_second=1000, bytes_per_second=100)
+    assert limiter.before_request() == 0
+    limiter.after_response(200)
+    assert limiter.before_request() == pytest.approx(1.0)
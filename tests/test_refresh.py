@@ -0,0 +1,119 @@
+import os
+from io import BytesIO
+
+import pytest
+
+from rmapy import codec
+from rmapy.document import Highlight, RmPage, ZipDocument
+from rmapy.refresh import diff_files, refresh_document
+from rmapy.store import BlobStore
+from rmapy.types import FileMetaBlob
+
+META = {"visibleName": "Notes", "type": "DocumentType", "parent": ""}
+
+
+def _content(*pages):
+    return codec.dumps({"cPages": {"pages": [{"id": p} for p in pages]}})
+
+
+def _highlight(text):
+    return codec.dumps({"highlights": [[{"text": text}]]})
+
+
+V1 = [(".content", _content("p1", "p2")), (".pagedata", b"Blank\nBlank"),
+      ("/p1.rm", b"p1 v1"), ("/p2.rm", b"p2 v1"), (".highlights/p1.json", _highlight("old"))]
+
+
+@pytest.fixture
+def old(cloud, client):
+    cloud.add("doc", META, V1)
+    document, = client.get_root_folder().contents
+    return document
+
+
+def _update(cloud, client, files, meta=META):
+    cloud.add("doc", meta, files)
+    root_index = client.get_blob(cloud.root)
+    file_meta, = [f for f in root_index.files if f.name == "doc"]
+    return file_meta
+
+
+def _zip_of_v1():
+    zip_document = ZipDocument("doc")
+    zip_document.content = codec.loads(_content("p1", "p2"))
+    zip_document.metadata = dict(META)
+    zip_document.pagedata = str(b"Blank\nBlank")
+    zip_document.rm = [RmPage(BytesIO(b"p1 v1"), order=0, _id="doc"),
+                       RmPage(BytesIO(b"p2 v1"), order=1, _id="doc")]
+    zip_document.highlights = [Highlight("p1", _highlight("old"))]
+    return zip_document
+
+
+def _round_trip(zip_document):
+    data = BytesIO()
+    zip_document.dump(data)
+    loaded = ZipDocument("doc", file=data)
+    pages = {page.order: page.page.read() for page in loaded.rm}
+    highlights = {h.page_id: h.highlight_data for h in loaded.highlights}
+    return loaded.content, pages, highlights
+
+
+def test_diff_files():
+    def files(**hashes):
+        return [FileMetaBlob(hash=h, name=name, size=0) for name, h in hashes.items()]
+
+    diff = diff_files(files(a="1", b="2", c="3"), files(a="1", b="9", d="4"))
+    assert [f.name for f in diff.added] == ["d"]
+    assert [f.name for f in diff.changed] == ["b"]
+    assert [f.name for f in diff.removed] == ["c"]
+    assert diff.unchanged == 1
+
+
+def test_unchanged_document_patches_nothing(cloud, client, old):
+    zip_document = _zip_of_v1()
+    before = _round_trip(zip_document)
+    file_meta = _update(cloud, client, V1 + [(".thumbnails/p9.png", b"thumb")])
+    cloud.requests.clear()
+    new, diff = refresh_document(old, file_meta, zip_document=zip_document)
+    assert (len(diff.added), len(diff.changed), diff.unchanged) == (1, 0, 6)
+    # Only the new index and the new thumbnail were fetched.
+    assert len(cloud.paths("GET")) == 2
+    assert _round_trip(zip_document) == before
+    assert new.hash == file_meta.hash
+
+
+def test_changed_and_added_members(cloud, client, old):
+    zip_document = _zip_of_v1()
+    meta = dict(META, visibleName="Renamed")
+    file_meta = _update(cloud, client, [
+        (".content", _content("p1", "p3", "p2")), (".pagedata", b"Blank\nBlank"),
+        ("/p1.rm", b"p1 v1"), ("/p2.rm", b"p2 v2"), ("/p3.rm", b"p3 v1"),
+        (".highlights/p3.json", _highlight("new"))], meta)
+    new, diff = refresh_document(old, file_meta, zip_document=zip_document)
+
+    assert sorted(f.name for f in diff.changed) == ["doc.content", "doc.metadata", "doc/p2.rm"]
+    assert sorted(f.name for f in diff.added) == ["doc.highlights/p3.json", "doc/p3.rm"]
+    assert [f.name for f in diff.removed] == ["doc.highlights/p1.json"]
+    assert new.visibleName == "Renamed" and zip_document.metadata == meta
+    assert zip_document.pagedata == str(b"Blank\nBlank")
+    content, pages, highlights = _round_trip(zip_document)
+    assert content == codec.loads(_content("p1", "p3", "p2"))
+    assert pages == {0: b"p1 v1", 1: b"p3 v1", 2: b"p2 v2"}
+    assert highlights == {"p3": codec.loads(_highlight("new"))}
+
+
+def test_mirror_is_patched(cloud, client, old, tmp_path):
+    from rmapy.mirror import mirror
+
+    root = client.get_root_folder()
+    store = BlobStore(str(tmp_path / "blobs"))
+    dest = tmp_path / "mirror"
+    mirror(root, str(dest), store, mode="copy", workers=2)
+    unchanged = os.stat(dest / "doc" / "p1.rm").st_mtime_ns
+
+    file_meta = _update(cloud, client, [f for f in V1 if f[0] != ".highlights/p1.json"]
+                        + [("/p2.rm", b"p2 v2")])
+    refresh_document(old, file_meta, store=store, mirror_dest=str(dest), mode="copy")
+    assert (dest / "doc" / "p2.rm").read_bytes() == b"p2 v2"
+    assert not (dest / "doc.highlights" / "p1.json").exists()
+    assert os.stat(dest / "doc" / "p1.rm").st_mtime_ns == unchanged
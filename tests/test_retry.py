@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+
+from rmapy import retry
+from rmapy.exceptions import CircuitOpenError
+from rmapy.retry import CircuitBreaker, CircuitBreakers, RetryPolicy, endpoint, parse_retry_after
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(retry.time, "monotonic", clock)
+    return clock
+
+
+def test_endpoint_replaces_hashes():
+    url = "https://host/sync/v3/files/" + "ab" * 32
+    assert endpoint(url) == "host/sync/v3/files/{hash}"
+    assert endpoint("https://host/sync/v4/root") == "host/sync/v4/root"
+
+
+def test_is_retryable():
+    policy = RetryPolicy()
+    assert policy.is_retryable("GET")
+    assert policy.is_retryable("get", 503)
+    assert not policy.is_retryable("GET", 404)
+    assert not policy.is_retryable("POST", 503)
+    assert policy.is_retryable("POST", 429)
+
+
+def test_delay_is_bounded_and_stops_after_total():
+    policy = RetryPolicy(total=3, backoff_factor=1, max_backoff=2)
+    for attempt in range(3):
+        assert 0 <= policy.delay(attempt) <= min(2, 2 ** attempt)
+    assert policy.delay(3) is None
+
+
+def test_delay_honours_retry_after():
+    policy = RetryPolicy(max_retry_after=10)
+    assert policy.delay(0, "5") == 5
+    assert policy.delay(0, "60") is None
+    assert parse_retry_after("not a date") is None
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker("root", threshold=3, reset_timeout=30)
+    assert not breaker.record_failure()
+    assert not breaker.record_failure()
+    assert breaker.state == "closed"
+    assert breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_success_resets_failures(clock):
+    breaker = CircuitBreaker("root", threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    assert not breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker("root", threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == "half-open"
+    assert breaker.before_request() is True
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_request() is False
+
+
+def test_probe_failure_reopens(clock):
+    breaker = CircuitBreaker("root", threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.before_request()
+    assert breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_end_probe_lets_another_request_probe(clock):
+    breaker = CircuitBreaker("root", threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.before_request()
+    # The probe was interrupted without an outcome.
+    breaker.end_probe()
+    assert breaker.before_request()
+
+
+def test_requests_wait_for_the_probe(clock):
+    breaker = CircuitBreaker("root", threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.before_request()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(breaker.before_request()))
+    waiter.start()
+    waiter.join(0.05)
+    assert waiter.is_alive()
+    breaker.record_success()
+    waiter.join(1)
+    assert results == [False]
+
+
+def test_breakers_are_per_endpoint():
+    breakers = CircuitBreakers(threshold=1)
+    assert breakers["a"] is breakers["a"]
+    breakers["a"].record_failure()
+    assert breakers.states() == {"a": "open"}
+    breakers["b"]
+    assert breakers.states()["b"] == "closed"
+
+
+def test_interrupted_probe_does_not_block_the_breaker(clock):
+    from rmapy.api import Client
+
+    class Interrupted(object):
+        def request(self, method, url, **kwargs):
+            raise KeyboardInterrupt
+
+    client = Client(transport=Interrupted(), token_set={"devicetoken": "", "usertoken": ""})
+    breaker = client.breakers[endpoint("https://host/sync/v4/root")]
+    breaker.threshold = 1
+    breaker.record_failure()
+    clock.now += breaker.reset_timeout
+    with pytest.raises(KeyboardInterrupt):
+        client.request("GET", "https://host/sync/v4/root")
+    assert breaker.before_request()
@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+
+import pytest
+
+from rmapy.scheduler import (BACKGROUND, INTERACTIVE, PREFETCH, RequestScheduler,
+                             current_priority, priority)
+
+
+def test_priority_blocks_nest():
+    assert current_priority() == INTERACTIVE
+    assert current_priority(BACKGROUND) == BACKGROUND
+    with priority(PREFETCH):
+        assert current_priority(BACKGROUND) == PREFETCH
+        with priority(BACKGROUND):
+            assert current_priority() == BACKGROUND
+        assert current_priority() == PREFETCH
+    assert current_priority() == INTERACTIVE
+
+
+def test_default_limits_keep_reserved_slots():
+    scheduler = RequestScheduler(slots=10, reserved=4)
+    assert scheduler.limits == {INTERACTIVE: 10, PREFETCH: 3, BACKGROUND: 6}
+
+
+def _hold(scheduler, level, entered, release):
+    def run():
+        with scheduler.slot(level):
+            entered.append(level)
+            release.wait(5)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_reserved_slots_admit_interactive_work():
+    scheduler = RequestScheduler(slots=2, reserved=1)
+    entered, release = [], threading.Event()
+    threads = [_hold(scheduler, BACKGROUND, entered, release) for _ in range(2)]
+    _wait_for(lambda: entered == [BACKGROUND] and scheduler.waiting[BACKGROUND] == 1)
+    # The second background request waits at its limit; this one doesn't.
+    with scheduler.slot(INTERACTIVE) as waited:
+        assert waited < 1
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert entered == [BACKGROUND, BACKGROUND]
+
+
+def test_interactive_work_is_admitted_first():
+    scheduler = RequestScheduler(slots=1, reserved=0)
+    entered, release, go = [], threading.Event(), threading.Event()
+    holder = _hold(scheduler, INTERACTIVE, entered, release)
+    _wait_for(lambda: entered == [INTERACTIVE])
+    # Queued in the worst order: background first.
+    waiters = [_hold(scheduler, BACKGROUND, entered, go)]
+    _wait_for(lambda: scheduler.waiting[BACKGROUND] == 1)
+    waiters.append(_hold(scheduler, PREFETCH, entered, go))
+    _wait_for(lambda: scheduler.waiting[PREFETCH] == 1)
+    waiters.append(_hold(scheduler, INTERACTIVE, entered, go))
+    _wait_for(lambda: scheduler.waiting[INTERACTIVE] == 1)
+    go.set()
+    release.set()
+    for thread in [holder] + waiters:
+        thread.join(5)
+    assert entered == [INTERACTIVE, INTERACTIVE, PREFETCH, BACKGROUND]
+
+
+@pytest.mark.parametrize("slots, reserved", [(1, 0), (4, 2), (8, 8)])
+def test_no_deadlock_at_the_limits(slots, reserved):
+    scheduler = RequestScheduler(slots=slots, reserved=reserved)
+    peak = {level: 0 for level in scheduler.limits}
+    lock = threading.Lock()
+    done = []
+
+    def run(level):
+        for _ in range(20):
+            with scheduler.slot(level):
+                with lock:
+                    assert sum(scheduler.in_flight.values()) <= slots
+                    peak[level] = max(peak[level], scheduler.in_flight[level])
+                time.sleep(random.random() / 10000)
+        done.append(level)
+
+    threads = [threading.Thread(target=run, args=(level,))
+               for level in (INTERACTIVE, PREFETCH, BACKGROUND) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert len(done) == len(threads)
+    assert all(peak[level] <= scheduler.limits[level] for level in peak)
+    assert scheduler.in_flight == {level: 0 for level in scheduler.limits}
+
+
+def test_priorities_reach_the_fetch_threads(cloud, client):
+    from rmapy.types import hydrate_contents
+
+    seen = []
+    request = cloud.request
+
+    def recording(method, url, **kwargs):
+        seen.append(current_priority())
+        return request(method, url, **kwargs)
+
+    cloud.request = recording
+    for uuid in "ab":
+        cloud.add(uuid, {"visibleName": uuid, "type": "DocumentType", "parent": ""},
+                  [(".content", b"{}")])
+    root = client.get_root_folder()
+    # The root hash at the default priority, the items in the background.
+    assert seen[0] == INTERACTIVE and set(seen[2:]) == {BACKGROUND}
+    seen.clear()
+    with priority(PREFETCH):
+        hydrate_contents(root.contents)
+    assert seen == [PREFETCH, PREFETCH]
@@ -0,0 +1,95 @@
+import pytest
+
+from rmapy import codec
+from rmapy.search import SearchIndex, highlight_text, tokenize
+
+
+def test_tokenize():
+    assert tokenize("Über-Notes, 2024_q1!") == ["über", "notes", "2024_q1"]
+    assert tokenize("  ") == []
+
+
+def test_highlight_text():
+    data = {"highlights": [[{"text": "Mitochondria", "start": 1},
+                            {"text": "powerhouse", "nested": {"text": "cell"}}]]}
+    assert highlight_text(data) == ["Mitochondria", "powerhouse", "cell"]
+    assert highlight_text({"text": 3}) == []
+
+
+def _document(cloud, uuid, name, parent="", highlights=()):
+    files = [(f".highlights/p{i}.json", codec.dumps({"highlights": [[{"text": text}]]}))
+             for i, text in enumerate(highlights)]
+    cloud.add(uuid, {"visibleName": name, "type": "DocumentType", "parent": parent}, files)
+
+
+@pytest.fixture
+def library(cloud):
+    cloud.add("bio", {"visibleName": "Biology", "type": "CollectionType", "parent": ""})
+    _document(cloud, "cell", "Cell notes", "bio", ["The mitochondria is the powerhouse"])
+    _document(cloud, "mito", "Mitochondria", "")
+    _document(cloud, "misc", "Misc", "", ["biology homework"])
+    return cloud
+
+
+def _paths(results):
+    return [result.path for result in results]
+
+
+def test_search_ranks_name_then_path_then_highlights(library, client):
+    index = SearchIndex()
+    assert index.update(client.get_root_folder()) == (4, 0)
+    assert _paths(index.search("biology")) == ["/Biology", "/Biology/Cell notes", "/Misc"]
+    results = index.search("mitochondria")
+    assert _paths(results) == ["/Mitochondria", "/Biology/Cell notes"]
+    assert results[1].fields == ["highlights"]
+    assert results[1].highlights == ["The mitochondria is the powerhouse"]
+
+
+def test_search_needs_every_word(library, client):
+    index = SearchIndex()
+    index.update(client.get_root_folder())
+    assert _paths(index.search("CELL Biology")) == ["/Biology/Cell notes"]
+    assert index.search("cell homework") == []
+    assert index.search("") == []
+
+
+def test_prefix_search(library, client):
+    index = SearchIndex()
+    index.update(client.get_root_folder())
+    assert index.search("mito") == []
+    assert _paths(index.search("mito", prefix=True)) == ["/Mitochondria", "/Biology/Cell notes"]
+    # Only the last word is a prefix.
+    assert _paths(index.search("power cell", prefix=True)) == []
+    assert _paths(index.search("powerhouse ce", prefix=True)) == ["/Biology/Cell notes"]
+
+
+def test_fields_and_limit(library, client):
+    index = SearchIndex()
+    index.update(client.get_root_folder())
+    assert _paths(index.search("biology", fields=("highlights",))) == ["/Misc"]
+    assert _paths(index.search("biology", limit=1)) == ["/Biology"]
+
+
+def test_update_after_reconcile(library, client):
+    root = client.get_root_folder()
+    index = SearchIndex()
+    index.update(root)
+
+    _document(library, "mito", "Organelles", "bio")                     # renamed, moved
+    _document(library, "cell", "Cell notes", "bio",
+              ["The mitochondria is the powerhouse", "ribosomes"])      # new highlight
+    library.remove("misc")
+    _document(library, "new", "Ribosomes")
+    root.reconcile()
+    library.requests.clear()
+    assert index.update(root) == (3, 1)
+    # Only the new highlight file was fetched.
+    assert len(library.paths("GET")) == 1
+    assert len(index) == 4
+
+    assert _paths(index.search("mitochondria")) == ["/Biology/Cell notes"]
+    assert _paths(index.search("organelles")) == ["/Biology/Organelles"]
+    assert _paths(index.search("ribosomes")) == ["/Ribosomes", "/Biology/Cell notes"]
+    assert index.search("homework") == []
+    # An unchanged tree is left alone.
+    assert index.update(root) == (0, 0)
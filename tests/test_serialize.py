@@ -0,0 +1,101 @@
+import marshal
+
+import pytest
+
+from rmapy import serialize
+from rmapy.exceptions import SerializationError
+from rmapy.types import (Collection, Document, FileMetaBlob, FileMetaListBlob, RawJsonBlob,
+                         RootFolder)
+
+
+def _files(uuid, names):
+    return FileMetaListBlob(files=[FileMetaBlob(hash=f"{uuid}{i:02}" * 4, name=f"{uuid}{name}",
+                                                size=i) for i, name in enumerate(names)])
+
+
+def _document(uuid, name, parent="", **meta):
+    json = dict(visibleName=name, type="DocumentType", parent=parent, **meta)
+    return Document(uuid=uuid, hash=f"{uuid}-hash", meta_blob=RawJsonBlob(json=json),
+                    meta_list_blob=_files(uuid, [".metadata", ".content", "/page.rm"]))
+
+
+def _collection(uuid, name, contents, parent=""):
+    json = {"visibleName": name, "type": "CollectionType", "parent": parent, "pinned": True}
+    return Collection(uuid=uuid, hash=f"{uuid}-hash", meta_blob=RawJsonBlob(json=json),
+                      contents=contents)
+
+
+@pytest.fixture
+def root():
+    inner = _collection("c2", "Inner", [_document("d2", "Deep", "c2")], parent="c1")
+    outer = _collection("c1", "Outer", [_document("d1", "Notes", "c1"), inner])
+    empty = _collection("c3", "Empty", [])
+    top = _document("d3", "Top", lastOpenedPage=2, tags=["x"], custom={"a": 1})
+    return RootFolder(hash="root-hash", list_blob=_files("root", [".docSchema"]),
+                      contents=[outer, empty, top], lazy=True)
+
+
+def _shape(nodes):
+    return [(type(n).__name__, n.uuid, n.hash, n.meta_blob.json,
+             _shape(n.contents) if isinstance(n, Collection) else
+             [(f.hash, f.name, f.size) for f in n.meta_list_blob.files])
+            for n in nodes]
+
+
+def test_round_trip(root):
+    loaded = serialize.loads(serialize.dumps(root))
+    assert loaded.hash == root.hash
+    assert [f.name for f in loaded.list_blob.files] == ["root.docSchema"]
+    assert _shape(loaded.contents) == _shape(root.contents)
+    assert serialize.dumps(loaded) == serialize.dumps(root)
+
+
+def test_loaded_nodes_are_complete(root):
+    loaded = serialize.loads(serialize.dumps(root))
+    outer, empty, top = loaded.contents
+    assert outer.visibleName == "Outer" and outer.pinned and outer.parentUuid == ""
+    assert empty.contents == []
+    assert top.lastOpenedPage == 2 and top.createdTime is None
+    assert top.meta_list_blob.metadata is top.meta_blob
+    assert top._siblings is loaded.contents
+    assert outer.contents[0]._siblings is outer.contents
+
+
+def test_client_is_attached(root):
+    client = object()
+    loaded = serialize.loads(serialize.dumps(root), client)
+    document = loaded.contents[0].contents[0]
+    assert loaded.client is client
+    assert document._client() is client
+    assert document.meta_list_blob.files[0].client is client
+
+
+@pytest.mark.parametrize("data", [b"", b"RMTREE", b"NOTATREE" + bytes(16)])
+def test_rejects_foreign_data(data):
+    with pytest.raises(SerializationError):
+        serialize.loads(data)
+
+
+def test_rejects_other_versions(root):
+    data = serialize.dumps(root)
+    other_schema = serialize._HEADER.pack(serialize.MAGIC, serialize.SCHEMA_VERSION + 1,
+                                          marshal.version)
+    with pytest.raises(SerializationError, match="schema"):
+        serialize.loads(other_schema + data[serialize._HEADER.size:])
+
+
+def test_rejects_truncated_data(root):
+    data = serialize.dumps(root)
+    with pytest.raises(SerializationError, match="Corrupt"):
+        serialize.loads(data[:len(data) // 2])
+
+
+def test_trash_and_collection_indexes_round_trip(root):
+    inner = root.contents[0]
+    inner.meta_list_blob = _files("c1", [".metadata"])
+    root._detached = [_document("d9", "Binned", "trash")]
+    loaded = serialize.loads(serialize.dumps(root))
+    assert [f.name for f in loaded.contents[0].meta_list_blob.files] == ["c1.metadata"]
+    assert loaded.contents[1].meta_list_blob is None
+    assert _shape(loaded._detached) == _shape(root._detached)
+    assert loaded.live_hashes() == root.live_hashes()
@@ -0,0 +1,96 @@
+import hashlib
+
+import pytest
+import requests
+
+from rmapy.api import Client
+from rmapy.exceptions import ApiError
+from rmapy.retry import RetryPolicy
+from rmapy.snapshot import Snapshot
+from rmapy.store import BlobStore
+
+
+def response(status, content=b"", headers=None):
+    r = requests.Response()
+    r.status_code = status
+    r._content = content
+    r.headers.update(headers or {})
+    r.url = "https://host/"
+    return r
+
+
+class Transport(object):
+    """Answers every request with the next of responses, or raises it."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def request(self, method, url, **kwargs):
+        r = self.responses.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+
+def client(tmp_path, *responses, offline=False):
+    return Client(transport=Transport(*responses),
+                  token_set={"devicetoken": "", "usertoken": ""},
+                  retry_policy=RetryPolicy(total=0),
+                  snapshot=Snapshot(BlobStore(str(tmp_path))), offline=offline)
+
+
+def test_polling_does_not_record(tmp_path):
+    c = client(tmp_path, response(200, b'{"hash": "abc", "generation": 1}'))
+    assert c.get_root_hash() == "abc"
+    assert c.snapshot.age() is None
+
+
+def test_record_needs_a_confirmed_root(tmp_path):
+    c = client(tmp_path, response(200, b'{"hash": "abc", "generation": 1}'))
+    c._snapshot_complete("abc")
+    assert c.snapshot_age is None
+    c.get_root_hash()
+    c._snapshot_complete("abc")
+    assert c.snapshot.root()[0] == "abc"
+
+
+@pytest.mark.parametrize("error", [
+    requests.ConnectionError("down"),
+    requests.Timeout("slow"),
+    response(503),
+])
+def test_unavailable_cloud_falls_back(tmp_path, error):
+    c = client(tmp_path, error, offline="fallback")
+    c.snapshot.record("abc")
+    assert c.get_root_hash() == "abc"
+    assert c._falling_back
+
+
+def test_client_errors_do_not_fall_back(tmp_path):
+    c = client(tmp_path, response(403), offline="fallback")
+    c.snapshot.record("abc")
+    with pytest.raises(ApiError):
+        c.get_root_hash()
+    assert not c._falling_back
+
+
+def test_recovery_ends_the_fallback(tmp_path):
+    c = client(tmp_path, requests.ConnectionError("down"),
+               response(200, b'{"hash": "def", "generation": 2}'), offline="fallback")
+    c.snapshot.record("abc")
+    assert c.get_root_hash() == "abc"
+    assert c.get_root_hash() == "def"
+    assert not c._falling_back
+
+
+def test_cached_blobs_reach_the_snapshot(tmp_path):
+    from rmapy.cache import BlobCache
+
+    cache = BlobCache()
+    content = b"{}"
+    _hash = hashlib.sha256(content).hexdigest()
+    cache.put(_hash, "application/octet-stream", content)
+    c = Client(transport=Transport(), token_set={"devicetoken": "", "usertoken": ""},
+               blob_cache=cache, snapshot=Snapshot(BlobStore(str(tmp_path))))
+    c.get_blob(_hash)
+    assert _hash in c.snapshot.store
@@ -0,0 +1,190 @@
+import errno
+import hashlib
+import os
+
+import pytest
+
+from rmapy import store as store_module
+from rmapy.mirror import mirror
+from rmapy.store import BlobStore
+from rmapy.types import Document, FileMetaBlob, FileMetaListBlob, RawJsonBlob, RootFolder
+
+
+def _hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+def _failing(code):
+    def fail(*args, **kwargs):
+        raise OSError(code, os.strerror(code))
+    return fail
+
+
+def test_put_and_get(store):
+    h = _hash(b"data")
+    store.put(h, b"data")
+    assert h in store
+    assert store.get(h) == b"data"
+    assert list(store) == [h]
+    assert store.get(_hash(b"other")) is None
+
+
+def test_link_falls_back_when_unsupported(store, tmp_path, monkeypatch):
+    h = _hash(b"data")
+    store.put(h, b"data")
+    monkeypatch.setattr(store_module, "_reflink", _failing(errno.EOPNOTSUPP))
+    monkeypatch.setattr(store_module.os, "link", _failing(errno.EXDEV))
+    assert store.link(h, str(tmp_path / "out" / "a"), "auto") == "copy"
+    assert store._unsupported == {"reflink", "hardlink"}
+    with open(tmp_path / "out" / "a", "rb") as f:
+        assert f.read() == b"data"
+
+
+@pytest.mark.parametrize("code", [errno.ENOSPC, errno.EACCES])
+def test_link_raises_transient_errors(store, tmp_path, monkeypatch, code):
+    h = _hash(b"data")
+    store.put(h, b"data")
+    monkeypatch.setattr(store_module, "_reflink", _failing(code))
+    with pytest.raises(OSError):
+        store.link(h, str(tmp_path / "a"), "auto")
+    assert store._unsupported == set()
+    assert not os.path.exists(tmp_path / "a")
+
+
+def test_link_of_missing_blob_raises(store, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        store.link(_hash(b"missing"), str(tmp_path / "a"), "auto")
+    assert store._unsupported == set()
+
+
+@pytest.mark.parametrize("mode", ["hardlink", "copy"])
+def test_in_place(store, tmp_path, mode):
+    h = _hash(b"data")
+    store.put(h, b"data")
+    dest = str(tmp_path / "a")
+    assert not store.in_place(h, dest)
+    store.link(h, dest, mode)
+    assert store.in_place(h, dest)
+    if mode == "copy":
+        with open(dest, "wb") as f:
+            f.write(b"edit")
+        assert not store.in_place(h, dest)
+
+
+def test_gc(store):
+    keep, drop = _hash(b"keep"), _hash(b"drop")
+    store.put(keep, b"keep")
+    store.put(drop, b"drop")
+    assert store.gc([keep]) == (1, 4)
+    assert list(store) == [keep]
+
+
+class BlobClient(object):
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def get_raw_blob(self, h):
+        return self.blobs.get(h)
+
+
+def _root(client, files):
+    metas = [FileMetaBlob(client=client, hash=_hash(content), name=name, size=len(content))
+             for name, content in files.items()]
+    meta = RawJsonBlob(client=client, json={"visibleName": "Doc", "type": "DocumentType",
+                                            "parent": ""})
+    doc = Document(client=client, uuid="doc", hash="index", meta_blob=meta,
+                   meta_list_blob=FileMetaListBlob(client=client, files=metas))
+    return RootFolder(client=client, hash="root", contents=[doc], lazy=True,
+                      list_blob=FileMetaListBlob(client=client, files=[]))
+
+
+def test_mirror_skips_files_in_place_and_keeps_foreign_files(store, tmp_path):
+    files = {"doc.content": b"{}", "doc/0.rm": b"page"}
+    client = BlobClient({_hash(c): c for c in files.values()})
+    root = _root(client, files)
+    dest = tmp_path / "mirror"
+    os.makedirs(dest)
+    (dest / "notes.txt").write_bytes(b"mine")
+
+    first = mirror(root, str(dest), store, mode="copy", workers=2)
+    assert (first.fetched, first.linked, first.unchanged) == (2, 2, 0)
+    second = mirror(root, str(dest), store, mode="copy", workers=2)
+    assert (second.fetched, second.linked, second.unchanged) == (0, 0, 2)
+    assert (dest / "notes.txt").exists()
+
+    pruned = mirror(root, str(dest), store, mode="copy", prune=True, workers=2)
+    assert pruned.removed == 1
+    assert not (dest / "notes.txt").exists()
+    assert (dest / "doc" / "0.rm").read_bytes() == b"page"
+
+
+def test_concurrent_puts_of_the_same_blob(store):
+    import threading
+
+    for trial in range(20):
+        content = b"shared %d" % trial
+        h = _hash(content)
+        barrier = threading.Barrier(8)
+        errors = []
+
+        def put():
+            barrier.wait()
+            try:
+                store.put(h, content)
+            except OSError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=put) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert store.get(h) == content
+
+
+def _library(snapshot, items):
+    """Stores a root index of items, uuid -> metadata, in snapshot."""
+    from rmapy import codec
+
+    def put(content):
+        h = _hash(content)
+        snapshot.put(h, content)
+        return h
+
+    lines = []
+    for uuid, metadata in items.items():
+        meta = codec.dumps(metadata)
+        index = f"3\n{put(meta)}:0:{uuid}.metadata:0:{len(meta)}\n".encode()
+        lines.append(f"{put(index)}:80000000:{uuid}:1:{len(index)}")
+    root_hash = put(("3\n" + "\n".join(lines) + "\n").encode())
+    snapshot.record(root_hash)
+
+
+def test_gc_keeps_collections_and_trash_for_offline_use(store):
+    from rmapy.api import Client
+    from rmapy.snapshot import Snapshot
+
+    snapshot = Snapshot(store)
+    _library(snapshot, {
+        "work": {"visibleName": "Work", "type": "CollectionType", "parent": ""},
+        "old": {"visibleName": "Old", "type": "CollectionType", "parent": "work"},
+        "gone": {"visibleName": "Gone", "type": "CollectionType", "parent": "trash"},
+        "doc": {"visibleName": "Doc", "type": "DocumentType", "parent": "old"},
+        "bin": {"visibleName": "Bin", "type": "DocumentType", "parent": "trash"},
+    })
+    client = Client(token_set={"devicetoken": "", "usertoken": ""}, snapshot=snapshot,
+                    offline=True)
+    root = client.get_root_folder()
+    assert store.gc(root.live_hashes())[0] == 0
+
+    again = client.get_root_folder()
+    assert client.metrics.snapshot().get("traversal_dropped.offline_miss") is None
+    work, = again.contents
+    assert work.contents[0].contents[0].visibleName == "Doc"
+    assert {node.uuid for node in again._detached} == {"gone", "bin"}
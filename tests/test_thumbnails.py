@@ -0,0 +1,32 @@
+from rmapy import codec
+from rmapy.store import BlobStore
+from rmapy.thumbnails import fetch_thumbnails, first_thumbnail
+
+
+def _document(cloud, uuid, pages=None, thumbnails=()):
+    files = [(".content", codec.dumps({"cPages": {"pages": [{"id": p} for p in pages]}}
+                                      if pages is not None else {}))]
+    files += [(f".thumbnails/{page}.png", f"png {uuid} {page}".encode())
+              for page in thumbnails]
+    cloud.add(uuid, {"visibleName": uuid, "type": "DocumentType", "parent": ""}, files)
+
+
+def test_first_page_thumbnail(cloud, client, tmp_path):
+    # Listed before the first page's, as an index sorted by hash may be.
+    _document(cloud, "ordered", pages=["p2", "p1"], thumbnails=["p1", "p2"])
+    _document(cloud, "unordered", thumbnails=["p9", "p8"])
+    _document(cloud, "blank", pages=["p1"])
+    cloud.add("folder", {"visibleName": "folder", "type": "CollectionType", "parent": ""})
+    root = client.get_root_folder()
+    documents = {node.uuid: node for node in root.contents}
+    assert first_thumbnail(documents["ordered"]).name == "ordered.thumbnails/p2.png"
+    # Without a page list, the first one listed.
+    assert first_thumbnail(documents["unordered"]).name == "unordered.thumbnails/p9.png"
+    assert first_thumbnail(documents["blank"]) is None
+
+    store = BlobStore(str(tmp_path))
+    expected = {"ordered": b"png ordered p2", "unordered": b"png unordered p9", "blank": None}
+    assert fetch_thumbnails(root.contents, store) == expected
+    cloud.requests.clear()
+    assert fetch_thumbnails(root.contents, store) == expected
+    assert cloud.requests == []
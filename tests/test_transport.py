@@ -0,0 +1,105 @@
+import pytest
+import requests
+
+from rmapy.api import Client
+from rmapy.exceptions import ReplayError
+from rmapy.retry import RetryPolicy
+from rmapy.transport import RecordingTransport, ReplayTransport
+
+URL = "https://host/sync/v3/files/abc"
+
+
+def _response(url, status, content=b""):
+    r = requests.Response()
+    r.status_code = status
+    r._content = content
+    r.headers["content-type"] = "text/plain; charset=UTF-8"
+    r.url = url
+    return r
+
+
+def _client(transport):
+    return Client(transport=transport, token_set={"devicetoken": "", "usertoken": ""},
+                  retry_policy=RetryPolicy(total=0))
+
+
+def _tree(nodes):
+    return [(node.uuid, node.visibleName, _tree(getattr(node, "contents", [])))
+            for node in nodes]
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    return str(tmp_path / "run.cassette")
+
+
+def test_replay_serves_a_recorded_traversal(cloud, cassette):
+    cloud.add("work", {"visibleName": "Work", "type": "CollectionType", "parent": ""})
+    cloud.add("a", {"visibleName": "alpha", "type": "DocumentType", "parent": "work"},
+              [(".content", b"{}")])
+    cloud.add("b", {"visibleName": "beta", "type": "DocumentType", "parent": ""})
+
+    with RecordingTransport(cloud, cassette) as recording:
+        recorded = _tree(_client(recording).get_root_folder().contents)
+    sent = len(cloud.requests)
+
+    replayed = _tree(_client(ReplayTransport(cassette)).get_root_folder().contents)
+    assert replayed == recorded
+    assert [uuid for uuid, _, _ in replayed] == ["work", "b"]
+    assert len(cloud.requests) == sent
+
+
+def test_unrecorded_request_is_an_error(cloud, cassette):
+    known = cloud.put(b"known")
+    with RecordingTransport(cloud, cassette) as recording:
+        _client(recording).get_blob(known)
+
+    client = _client(ReplayTransport(cassette))
+    assert client.get_blob(known).content == b"known"
+    with pytest.raises(ReplayError, match="No recorded response for GET"):
+        client.get_blob(cloud.put(b"unknown"))
+
+
+class Sequence(object):
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def request(self, method, url, **kwargs):
+        return self.responses.pop(0)
+
+    def close(self):
+        pass
+
+
+def test_repeated_requests_replay_in_order(cassette):
+    inner = Sequence(_response(URL, 503), _response(URL, 200, b"ok"))
+    with RecordingTransport(inner, cassette) as recording:
+        recording.request("GET", URL)
+        recording.request("GET", URL)
+
+    replay = ReplayTransport(cassette)
+    assert replay.request("GET", URL).status_code == 503
+    for _ in range(2):
+        response = replay.request("GET", URL)
+        assert (response.status_code, response.content) == (200, b"ok")
+        assert response.headers["Content-Type"] == "text/plain; charset=UTF-8"
+    with pytest.raises(ReplayError):
+        replay.request("PUT", URL)
+
+
+def test_params_are_part_of_the_key(cassette):
+    inner = Sequence(_response(URL, 200, b"one"), _response(URL, 200, b"two"))
+    with RecordingTransport(inner, cassette) as recording:
+        recording.request("GET", URL, params={"page": 1})
+        recording.request("GET", URL, params={"page": 2})
+
+    replay = ReplayTransport(cassette)
+    assert replay.request("GET", URL, params={"page": 2}).content == b"two"
+    assert replay.request("GET", URL, params={"page": 1}).content == b"one"
+
+
+def test_token_bodies_are_not_recorded(cassette):
+    url = "https://host/token/json/2/user/new"
+    with RecordingTransport(Sequence(_response(url, 200, b"secret")), cassette) as recording:
+        assert recording.request("POST", url).content == b"secret"
+    assert ReplayTransport(cassette).request("POST", url).content == b""
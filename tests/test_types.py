@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from rmapy.types import _iter_bounded
+
+
+class Counter(object):
+    """Counts running calls and the items taken from the input. Calls for
+    positive items wait for release, if given; negative items fail."""
+
+    def __init__(self, release=None):
+        self.lock = threading.Lock()
+        self.running = self.peak = self.calls = self.taken = 0
+        self.release = release
+
+    def items(self, n):
+        for i in range(n):
+            self.taken += 1
+            yield i
+
+    def __call__(self, item):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if item > 0 and self.release is not None:
+                self.release.wait(5)
+            if item < 0:
+                raise ValueError(item)
+            return item * 2
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@pytest.mark.parametrize("window", [1, 3, 8])
+def test_window_bounds_the_calls_in_flight(window):
+    counter = Counter()
+    with ThreadPoolExecutor(4) as executor:
+        results = list(_iter_bounded(counter, counter.items(20), window, executor))
+    assert sorted(results) == [i * 2 for i in range(20)]
+    assert counter.peak <= min(window, 4)
+
+
+def test_closing_early_cancels_the_window():
+    release = threading.Event()
+    counter = Counter(release)
+    with ThreadPoolExecutor(1) as executor:
+        results = _iter_bounded(counter, counter.items(100), 5, executor)
+        assert next(results) == 0
+        results.close()
+        release.set()
+    # The first window and one replacement were taken, not the rest.
+    assert counter.taken == 6
+    # At most the call running when the iterator closed ran after the first.
+    assert counter.calls <= 2
+
+
+def test_errors_cancel_the_window():
+    release = threading.Event()
+    counter = Counter(release)
+    with ThreadPoolExecutor(1) as executor:
+        results = _iter_bounded(counter, [-1, 1, 2, 3, 4, 5], 4, executor)
+        with pytest.raises(ValueError):
+            next(results)
+        release.set()
+    # At most the call running when the first one failed ran after it.
+    assert counter.calls <= 2
+
+
+def test_owns_a_pool_without_an_executor():
+    counter = Counter()
+    assert sorted(_iter_bounded(counter, counter.items(10), window=2)) == [
+        i * 2 for i in range(10)]
+    assert counter.peak <= 2
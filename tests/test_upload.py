@@ -0,0 +1,170 @@
+import hashlib
+from io import BytesIO
+
+import pytest
+
+from rmapy import upload
+from rmapy.document import ZipDocument
+from rmapy.exceptions import ApiError, RootConflict
+from rmapy.upload import (DOCUMENT_INDEX_TYPE, TEXT_TYPE, Component, Uploader, build_index,
+                          components, index_line)
+
+
+def test_index_line():
+    assert index_line("ab" * 32, DOCUMENT_INDEX_TYPE, "doc.pdf", 0, 42) == \
+        f"{'ab' * 32}:0:doc.pdf:0:42"
+
+
+def test_build_index_is_sorted_by_name():
+    lines = [index_line("b" * 64, "0", "doc.pdf", 0, 2),
+             index_line("c" * 64, "0", "doc.content", 0, 3),
+             index_line("a" * 64, "0", "doc.metadata", 0, 1)]
+    index = build_index(lines)
+    assert index.decode().splitlines() == ["3", lines[1], lines[2], lines[0]]
+    assert index.endswith(b"\n")
+    assert build_index(list(reversed(lines))) == index
+
+
+def test_build_index_parses_back():
+    from rmapy.api import Client
+
+    client = Client(token_set={"devicetoken": "", "usertoken": ""})
+    index = build_index([index_line("a" * 64, "0", "doc.metadata", 0, 1),
+                         index_line("b" * 64, "0", "doc.pdf", 0, 2)])
+    blob = client._parse_blob(TEXT_TYPE, index)
+    assert [(f.hash, f.name) for f in blob.files] == [("a" * 64, "doc.metadata"),
+                                                      ("b" * 64, "doc.pdf")]
+
+
+def test_build_index_of_nothing():
+    assert build_index([]) == b"3\n"
+
+
+def test_components_of_a_pdf(tmp_path):
+    pdf = tmp_path / "Paper.pdf"
+    pdf.write_bytes(b"%PDF-1.4 test")
+    doc = ZipDocument("doc", doc=str(pdf))
+    parts = {part.name: part for part in components(doc)}
+    assert set(parts) == {"doc.metadata", "doc.content", "doc.pagedata", "doc.pdf"}
+    # Read from its stream only when hashed, on the upload threads.
+    assert parts["doc.pdf"].data is None
+    assert parts["doc.pdf"].content_type == "application/pdf"
+    assert parts["doc.metadata"].content_type == TEXT_TYPE
+    # The old API's spelling isn't uploaded.
+    assert b"VissibleName" not in parts["doc.metadata"].data
+    assert b'"visibleName"' in parts["doc.metadata"].data
+    assert all(part.hash is None for part in parts.values())
+    parts["doc.pdf"].digest()
+    assert parts["doc.pdf"].data == b"%PDF-1.4 test"
+
+
+def test_component_digest():
+    part = components(ZipDocument("doc"))[0]
+    assert part.digest() == hashlib.sha256(part.data).hexdigest()
+    assert part.hash == part.digest()
+    assert part.size == len(part.data)
+
+
+def test_streams_are_hashed_a_chunk_at_a_time(monkeypatch):
+    monkeypatch.setattr(upload, "CHUNK_SIZE", 3)
+    data = b"0123456789"
+    stream = BytesIO(data)
+    stream.seek(4)
+    part = Component("doc.pdf", stream=stream)
+    assert part.digest() == hashlib.sha256(data).hexdigest()
+    assert part.data == data and part.size == 10 and part.stream is None
+
+
+def _pdf(tmp_path, content=b"%PDF-1.4 " + bytes(100), name="Paper"):
+    pdf = tmp_path / f"{name}.pdf"
+    pdf.write_bytes(content)
+    return ZipDocument("doc", doc=str(pdf))
+
+
+def _puts(cloud):
+    return [path.rsplit("/", 1)[1] for path in cloud.paths("PUT")]
+
+
+def test_upload_creates_the_document(cloud, client, tmp_path):
+    other = cloud.add("other", {"visibleName": "Other", "type": "DocumentType"})
+    result = client.upload(_pdf(tmp_path))
+    entries = cloud.entries()
+    assert set(entries) == {"doc", "other"} and entries["other"] == other
+    assert cloud.root == result.root_hash
+    assert entries["doc"].split(":")[0] == result.hash
+    assert result.skipped == []
+    assert sorted(result.uploaded) == sorted(
+        ["doc.metadata", "doc.content", "doc.pagedata", "doc.pdf", "doc.index",
+         "root.docSchema"])
+    # The root is written last.
+    assert _puts(cloud)[-1] == "root"
+
+
+def test_reupload_sends_only_what_changed(cloud, client, tmp_path):
+    client.upload(_pdf(tmp_path))
+    cloud.requests.clear()
+    doc = _pdf(tmp_path)
+    doc.metadata["VissibleName"] = "Renamed"
+    result = client.upload(doc)
+    assert sorted(result.skipped) == ["doc.content", "doc.pagedata", "doc.pdf"]
+    assert sorted(result.uploaded) == ["doc.index", "doc.metadata", "root.docSchema"]
+    assert cloud.paths("HEAD") == []
+    assert len(_puts(cloud)) == 4
+
+
+def test_unchanged_document_writes_nothing(cloud, client, tmp_path):
+    client.upload(_pdf(tmp_path))
+    root = cloud.root
+    cloud.requests.clear()
+    result = client.upload(_pdf(tmp_path))
+    assert cloud.paths("PUT") == [] and cloud.root == root
+    assert "doc.pdf" in result.skipped
+
+
+def test_large_blobs_are_probed_first(cloud, client, tmp_path):
+    content = b"%PDF-1.4 " + bytes(100)
+    # On the server already, e.g. uploaded as another document.
+    pdf_hash = cloud.put(content)
+    result = Uploader(client, probe_size=50).upload(_pdf(tmp_path, content))
+    heads = [path.rsplit("/", 1)[1] for path in cloud.paths("HEAD")]
+    assert pdf_hash in heads
+    # Small blobs are sent without asking.
+    assert all(len(cloud.blobs[h]) >= 50 for h in heads)
+    assert "doc.pdf" in result.skipped
+    assert pdf_hash not in _puts(cloud)
+
+
+def test_small_blobs_are_sent_without_probing(cloud, client, tmp_path):
+    cloud.put(b"%PDF-1.4 " + bytes(100))
+    result = Uploader(client, probe_size=1 << 20).upload(_pdf(tmp_path))
+    assert cloud.paths("HEAD") == []
+    assert "doc.pdf" in result.uploaded
+
+
+def test_root_conflicts_are_retried(cloud, client, tmp_path):
+    cloud.add("other", {"visibleName": "Other", "type": "DocumentType"})
+    cloud.races = 2
+    result = Uploader(client, attempts=3).upload(_pdf(tmp_path))
+    assert cloud.root == result.root_hash
+    assert set(cloud.entries()) == {"doc", "other"}
+    assert client.metrics.snapshot()["upload_root_conflicts"] == 2
+
+
+def test_root_that_keeps_changing_raises(cloud, client, tmp_path):
+    root = cloud.root
+    cloud.races = 3
+    with pytest.raises(RootConflict):
+        Uploader(client, attempts=3).upload(_pdf(tmp_path))
+    assert cloud.root == root
+
+
+@pytest.mark.parametrize("offline", [True, "fallback"])
+def test_no_upload_offline(cloud, client, tmp_path, offline):
+    from rmapy.snapshot import Snapshot
+    from rmapy.store import BlobStore
+
+    client.snapshot = Snapshot(BlobStore(str(tmp_path / "snapshot")))
+    client.offline = offline
+    with pytest.raises(ApiError, match="offline"):
+        client.upload(_pdf(tmp_path))
+    assert cloud.requests == []
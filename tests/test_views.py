@@ -0,0 +1,102 @@
+import pytest
+
+from rmapy.views import ORDERS, TIME_ORDERS, SortedViews, timestamp
+
+
+def _item(cloud, uuid, name, parent="", kind="DocumentType", opened=0, modified=0,
+          pinned=False):
+    cloud.add(uuid, {"visibleName": name, "type": kind, "parent": parent,
+                     "lastOpened": str(opened), "lastModified": str(modified),
+                     "pinned": pinned})
+
+
+def _folder(cloud, uuid, name, parent="", **fields):
+    _item(cloud, uuid, name, parent, kind="CollectionType", **fields)
+
+
+def _uuids(nodes):
+    return [node.uuid for node in nodes]
+
+
+def _state(views, folders):
+    return {
+        "recent": {by: _uuids(views.recent(100, by)) for by in TIME_ORDERS},
+        "pinned": _uuids(views.pinned()),
+        "children": {(folder, by): _uuids(views.children(folder, by))
+                     for folder in folders for by in ORDERS},
+    }
+
+
+def _rebuilt(root):
+    root._views = None
+    return root.views
+
+
+@pytest.fixture
+def library(cloud):
+    _folder(cloud, "work", "Work", modified=5)
+    _folder(cloud, "home", "home", pinned=True)
+    _item(cloud, "a", "alpha", "work", opened=30, modified=3)
+    _item(cloud, "b", "Beta", "work", opened=10, modified=9, pinned=True)
+    _item(cloud, "c", "gamma", "home", opened=20)
+    _item(cloud, "d", "delta", opened=40, modified=1)
+    _item(cloud, "t", "trashed", "trash", opened=50)
+    return cloud
+
+
+FOLDERS = [None, "work", "home", "new"]
+
+
+def test_views_of_a_tree(library, client):
+    views = client.get_root_folder().views
+    assert len(views) == 6
+    assert _uuids(views.recent(3)) == ["d", "a", "c"]
+    assert _uuids(views.recent(2, by="lastModified")) == ["b", "a"]
+    assert _uuids(views.pinned()) == ["home", "b"]
+    assert _uuids(views.children(None)) == ["home", "work", "d"]
+    assert _uuids(views.children("work", by="lastOpened")) == ["a", "b"]
+    assert _uuids(views.children("work", k=1)) == ["a"]
+    with pytest.raises(ValueError):
+        views.recent(by="name")
+
+
+def test_reconcile_matches_a_rebuild(library, client):
+    root = client.get_root_folder()
+    views = root.views
+    # Build every lazily kept list, so that all are updated in place.
+    _state(views, FOLDERS)
+
+    _item(library, "e", "epsilon", "work", opened=60)          # added
+    _folder(library, "new", "New", "home")                      # added folder
+    _item(library, "a", "alpha", "home", opened=30, modified=3)  # moved
+    _item(library, "b", "Aardvark", "work", opened=70)          # renamed, reopened, unpinned
+    library.remove("d")                                          # deleted
+    _item(library, "c", "gamma", "trash", opened=20)            # trashed
+    root.reconcile()
+
+    assert root.views is views
+    assert _state(views, FOLDERS) == _state(_rebuilt(root), FOLDERS)
+    assert _uuids(views.recent(2)) == ["b", "e"]
+    assert _uuids(views.children("home")) == ["new", "a"]
+
+
+def test_copy_is_independent(library, client):
+    root = client.get_root_folder()
+    before = _state(root.views, FOLDERS)
+    copy = root.copy()
+    library.remove("d")
+    copy.reconcile()
+    assert _state(root.views, FOLDERS) == before
+    assert "d" not in _uuids(copy.views.children(None))
+
+
+def test_update_with_unknown_items_is_harmless(library, client):
+    root = client.get_root_folder()
+    views = SortedViews()
+    views.update(removed=root.contents)
+    assert len(views) == 0
+
+
+@pytest.mark.parametrize("value, expected", [("123", 123), (None, 0), ("", 0), ("x", 0)])
+def test_timestamp(value, expected):
+    assert timestamp(value) == expected
@@ -0,0 +1,20 @@
+from rmapy.types import FileMetaBlob, FileMetaListBlob
+from rmapy.watch import diff_index
+
+
+def index(**hashes):
+    return FileMetaListBlob(files=[FileMetaBlob(hash=h, name=name, size=0)
+                                   for name, h in hashes.items()])
+
+
+def test_diff_index():
+    old = index(a="1", b="2", c="3")
+    new = index(a="1", b="20", d="4")
+    assert diff_index(old, new) == {"created": ["d"], "changed": ["b"], "deleted": ["c"]}
+
+
+def test_diff_index_unchanged_and_empty():
+    same = index(a="1", b="2")
+    assert diff_index(same, index(a="1", b="2")) == {"created": [], "changed": [], "deleted": []}
+    assert diff_index(index(), same) == {"created": ["a", "b"], "changed": [], "deleted": []}
+    assert diff_index(same, index()) == {"created": [], "changed": [], "deleted": ["a", "b"]}